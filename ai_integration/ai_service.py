@@ -1,13 +1,59 @@
 # ai_integration/ai_service.py
 
 import google.generativeai as genai
+import json
 import os
 
+from ai_integration import cache_respuestas
+from ai_integration.historial_chat import HistorialChat
+from ai_integration.pool_sesiones import PoolSesiones
+
+MODELO = 'gemini-2.0-flash'
+
+# Tarea del chat con Brainy: sus respuestas dependen de la conversación, así que nunca se cachean.
+TAREA_CHAT = 'chat'
+
+_DIA = 24 * 3600
+
+
+_TIPOS_ESQUEMA = {'STRING': str, 'INTEGER': int, 'NUMBER': (int, float), 'BOOLEAN': bool, 'ARRAY': list, 'OBJECT': dict}
+
+
+def leer_json(texto: str):
+    """El JSON del texto (sin las marcas ```json), o None si no es JSON válido."""
+    try:
+        return json.loads(texto.strip().replace("```json", "").replace("```", ""))
+    except ValueError:
+        return None
+
+def cumple_esquema(valor, esquema: dict) -> bool:
+    """Comprobación ligera contra un esquema de respuesta de Gemini: 'type', 'items', 'properties' y 'required'."""
+    tipo = _TIPOS_ESQUEMA.get(str(esquema.get('type', '')).upper())
+    if tipo is not None and not isinstance(valor, tipo):
+        return False
+    if isinstance(valor, list):
+        return all(cumple_esquema(elemento, esquema.get('items', {})) for elemento in valor)
+    if isinstance(valor, dict):
+        propiedades = esquema.get('properties', {})
+        return (all(campo in valor for campo in esquema.get('required', []))
+                and all(cumple_esquema(valor[campo], sub) for campo, sub in propiedades.items() if campo in valor))
+    return True
+
+
 class AIService:
     _instance = None
     _initialized = False
-    _chat_session = None
+    _sesiones = None  # PoolSesiones: un historial de chat por usuario
     _model = None
+    _cache = None
+
+    # Cuánto vale una respuesta cacheada, por tarea. Las tareas que no están aquí no se cachean: los quizzes
+    # de práctica ('quiz') y los exámenes de módulo ('examen') deben salir distintos en cada intento.
+    TTL_POR_TAREA = {
+        'silabo': 30 * _DIA,
+        'teoria': 30 * _DIA,
+        'quiz_nivelacion': 7 * _DIA,
+    }
 
     SYSTEM_INSTRUCTION = (
         "Eres 'Brainy', el tutor universal de IA de la plataforma de aprendizaje 'BrainCourse'. Tienes dos roles principales:\n"
@@ -37,17 +83,16 @@ class AIService:
                 with open(api_key_path, 'r') as f:
                     API_KEY = f.read().strip()
                 genai.configure(api_key=API_KEY)
-                self._model = genai.GenerativeModel('gemini-2.0-flash')
-                self._chat_session = self._model.start_chat(history=[
-                    {'role': 'user', 'parts': [self.SYSTEM_INSTRUCTION]},
-                    {'role': 'model', 'parts': ["¡Entendido! Soy Brainy."]}
-                ])
+                self._model = genai.GenerativeModel(MODELO)
+                if cache_respuestas.MAX_BYTES > 0:
+                    self._cache = cache_respuestas.CacheRespuestas()
+                self._sesiones = PoolSesiones(self._nuevo_historial)
                 self._initialized = True
                 print("Gemini API configurada y sesión de chat iniciada.")
             except Exception as e:
                 print(f"Error al cargar la API Key o configurar Gemini: {e}")
                 self._model = None
-                self._chat_session = None
+                self._sesiones = None
                 raise e
 
     def get_model(self):
@@ -55,21 +100,83 @@ class AIService:
             raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
         return self._model
 
-    def get_chat_session(self):
+    def get_chat_session(self, user_email: str = None) -> HistorialChat:
+        """
+        El historial acotado del chat de ese usuario (ver ai_integration/historial_chat.py y pool_sesiones.py).
+        Sin correo se usa una sesión anónima compartida.
+        """
         if not self._initialized:
             raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
-        if not self._chat_session and self._model:
-            self._chat_session = self._model.start_chat(history=[
-                {'role': 'user', 'parts': [self.SYSTEM_INSTRUCTION]},
-                {'role': 'model', 'parts': ["¡Entendido! Soy Brainy."]}
-            ])
-        return self._chat_session
-
-    def send_message(self, prompt_text: str, user_level: int = 1, user_profile_data: dict = None, current_topic: str = None, current_question_text: str = None, course_context: dict = None):
+        if self._sesiones is None:
+            self._sesiones = PoolSesiones(self._nuevo_historial)
+        return self._sesiones.obtener(user_email)
+
+    def cerrar_chat(self, user_email: str) -> bool:
+        """Descarta la conversación del usuario, p. ej. al cerrar sesión."""
+        return self._sesiones.cerrar(user_email) if self._sesiones is not None else False
+
+    def _nuevo_historial(self) -> HistorialChat:
+        return HistorialChat(self.SYSTEM_INSTRUCTION, self._resumir_conversacion)
+
+    def _resumir_conversacion(self, resumen: str, turnos: list):
+        """Pliega 'turnos' en el resumen anterior; lo usa HistorialChat para acotar el historial."""
+        conversacion = "\n".join(f"Estudiante: {usuario}\nBrainy: {respuesta}" for usuario, respuesta in turnos)
+        prompt = (
+            "Resume en español y en menos de 150 palabras la siguiente conversación entre un estudiante y Brainy, "
+            "su tutor de IA. Conserva lo que el estudiante quiere aprender, los temas vistos, las dudas que sigan "
+            "abiertas y cualquier dato que haya dado sobre sí mismo. Devuelve solo el resumen.\n\n"
+            f"Resumen previo: {resumen or '(ninguno)'}\n\nConversación:\n{conversacion}"
+        )
+        return self.generate_text(prompt)
+
+    def send_message(self, prompt_text: str, user_level: int = 1, user_profile_data: dict = None, current_topic: str = None, current_question_text: str = None, course_context: dict = None,
+                     tarea: str = TAREA_CHAT, usar_cache: bool = True, validar=None, user_email: str = None):
+        """
+        Envía el mensaje con su contexto a Gemini. Si la tarea tiene TTL en TTL_POR_TAREA y usar_cache es True,
+        una petición idéntica (mismo modelo, tarea, prompt y contexto) se responde desde la caché en disco.
+        Solo se cachean las respuestas correctas y, si se da 'validar', las que lo cumplen.
+        El bloque de contexto va solo en el mensaje actual; al historial pasa únicamente lo que escribió el usuario.
+        Cada 'user_email' tiene su propia conversación.
+        """
+        historial, full_prompt, turno = self._preparar_chat(prompt_text, user_level, user_profile_data, current_topic,
+                                                            current_question_text, course_context, user_email)
+
+        def generar():
+            respuesta = self._model.generate_content(historial.contenidos(full_prompt)).text.strip()
+            historial.agregar_turno(turno, respuesta)
+            return respuesta
+
+        try:
+            return self._con_cache(tarea, usar_cache, (self.SYSTEM_INSTRUCTION, full_prompt), generar, validar)
+        except Exception as e:
+            print(f"Error al enviar mensaje a Gemini: {e}")
+            return f"Lo siento, tuve un problema al procesar tu solicitud: {e}"
+
+    def stream_message(self, prompt_text: str, user_level: int = 1, user_profile_data: dict = None, current_topic: str = None, current_question_text: str = None, course_context: dict = None,
+                       user_email: str = None):
+        """
+        Como send_message, pero devuelve la respuesta por partes a medida que Gemini la genera (stream=True),
+        para mostrarla sin esperar al texto completo. El turno se anota en el historial al terminar.
+        """
+        historial, full_prompt, turno = self._preparar_chat(prompt_text, user_level, user_profile_data, current_topic,
+                                                            current_question_text, course_context, user_email)
+        partes = []
+        try:
+            for parte in self._partes(self._model.generate_content(historial.contenidos(full_prompt), stream=True)):
+                partes.append(parte)
+                yield parte
+        except Exception as e:
+            print(f"Error al recibir la respuesta de Gemini: {e}")
+            yield ("\n\n" if partes else "") + f"Lo siento, tuve un problema al procesar tu solicitud: {e}"
+            return
+        historial.agregar_turno(turno, "".join(partes).strip())
+
+    def _preparar_chat(self, prompt_text, user_level, user_profile_data, current_topic, current_question_text, course_context, user_email):
+        """(historial del usuario, mensaje con el bloque de contexto, texto que se anota como turno)."""
         if not self._initialized:
             raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
         
-        chat_session = self.get_chat_session()
+        historial = self.get_chat_session(user_email)
 
         contexto = "[INICIO DEL CONTEXTO PARA LA IA]\n"
         contexto += f"Eres 'Brainy', el asistente de IA integrado en la plataforma de aprendizaje 'BrainCourse'.\n"
@@ -92,14 +199,104 @@ class AIService:
         contexto += "[FIN DEL CONTEXTO]\n\n"
         
         full_prompt = f"{contexto}PREGUNTA DEL USUARIO: '{prompt_text}'"
+        turno = f"{prompt_text} (sobre la pregunta: '{current_question_text}')" if current_question_text else prompt_text
+        return historial, full_prompt, turno
 
+    def generate_structured(self, prompt: str, schema: dict, tarea: str = None, usar_cache: bool = True):
+        """
+        Generación de una sola vez con generate_content, sin pasar por la sesión de chat ni alargar su historial.
+        'schema' es un esquema de respuesta de Gemini ({'type': 'ARRAY', 'items': {...}}); devuelve el JSON ya
+        decodificado, o None si la IA falla o la respuesta no cumple el esquema.
+        """
+        if not self._initialized:
+            raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
+        configuracion = {'response_mime_type': 'application/json', 'response_schema': schema}
+        valida = lambda texto: cumple_esquema(leer_json(texto), schema)
         try:
-            response = chat_session.send_message(full_prompt)
-            return response.text.strip()
+            texto = self._con_cache(tarea, usar_cache, (json.dumps(schema, sort_keys=True), prompt),
+                                    lambda: self._model.generate_content(prompt, generation_config=configuracion).text.strip(),
+                                    valida)
         except Exception as e:
-            print(f"Error al enviar mensaje a Gemini: {e}")
-            return f"Lo siento, tuve un problema al procesar tu solicitud: {e}"
-    
+            print(f"Error en la generación estructurada con Gemini: {e}")
+            return None
+        if not valida(texto):
+            print(f"La respuesta de la IA no cumple el esquema: {texto[:200]}")
+            return None
+        return leer_json(texto)
+
+    def generate_text(self, prompt: str, tarea: str = None, usar_cache: bool = True):
+        """Como generate_structured pero para texto libre (p. ej. la teoría de un subtema). None si la IA falla."""
+        if not self._initialized:
+            raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
+        try:
+            return self._con_cache(tarea, usar_cache, (prompt,), lambda: self._model.generate_content(prompt).text.strip())
+        except Exception as e:
+            print(f"Error al generar texto con Gemini: {e}")
+            return None
+
+    def stream_text(self, prompt: str, tarea: str = None, usar_cache: bool = True):
+        """
+        Como generate_text, pero por partes (stream=True). Una respuesta cacheada llega de una vez y la completa
+        se cachea al terminar. Los errores de la IA se propagan al que itera.
+        """
+        if not self._initialized:
+            raise Exception("AIService no ha sido inicializado. Llama a initialize() primero.")
+        clave, ttl = self._clave_cache(tarea, usar_cache, (prompt,))
+        if clave:
+            respuesta = self._cache.obtener(clave)
+            if respuesta is not None:
+                yield respuesta
+                return
+        partes = []
+        for parte in self._partes(self._model.generate_content(prompt, stream=True)):
+            partes.append(parte)
+            yield parte
+        if clave:
+            self._guardar_en_cache(clave, tarea, "".join(partes).strip(), ttl)
+
+    @staticmethod
+    def _partes(respuesta):
+        """El texto de cada parte de una respuesta en streaming; las partes sin texto se saltan."""
+        for parte in respuesta:
+            try:
+                texto = parte.text
+            except ValueError:
+                continue
+            if texto:
+                yield texto
+
+    def _con_cache(self, tarea: str, usar_cache: bool, partes: tuple, generar, validar=None) -> str:
+        """
+        Resultado de generar(), o la respuesta cacheada si la tarea tiene TTL y ya se pidió lo mismo
+        (mismo modelo, tarea y partes). Las excepciones de generar() se propagan sin cachear nada.
+        """
+        clave, ttl = self._clave_cache(tarea, usar_cache, partes)
+        if clave:
+            respuesta = self._cache.obtener(clave)
+            if respuesta is not None:
+                return respuesta
+        respuesta = generar()
+        if clave and (validar is None or validar(respuesta)):
+            self._guardar_en_cache(clave, tarea, respuesta, ttl)
+        return respuesta
+
+    def _clave_cache(self, tarea: str, usar_cache: bool, partes: tuple):
+        """(clave, ttl) si la respuesta se puede cachear, (None, None) si no."""
+        ttl = self.TTL_POR_TAREA.get(tarea) if usar_cache and self._cache is not None else None
+        if not ttl:
+            return None, None
+        return cache_respuestas.clave(MODELO, tarea, *partes), ttl
+
+    def _guardar_en_cache(self, clave: str, tarea: str, respuesta: str, ttl: float):
+        try:
+            self._cache.guardar(clave, tarea, respuesta, ttl)
+        except Exception as e:
+            print(f"No se pudo guardar la respuesta en la caché de IA: {e}")
+
+    def estadisticas_cache(self) -> dict:
+        """Aciertos, fallos, entradas y bytes de la caché de respuestas (vacío si está desactivada)."""
+        return self._cache.estadisticas() if self._cache is not None else {}
+
     def stub_send_message(self, prompt, **kwargs):
         # Método stub para evitar errores de importación y permitir integración real.
         return "Respuesta generada por IA para: " + prompt
\ No newline at end of file
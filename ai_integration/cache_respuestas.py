@@ -0,0 +1,120 @@
+# ai_integration/cache_respuestas.py
+#
+# Caché persistente de respuestas de la IA en SQLite (data/cache_ia.db), para no repetir una
+# generación idéntica (mismo modelo, misma tarea, mismo prompt con su contexto): el quiz de
+# nivelación de "Primaria" o la teoría de un subtema común se piden a Gemini una sola vez.
+# Cada entrada caduca según el TTL de su tarea (ver AIService.TTL_POR_TAREA) y, si el total
+# supera el máximo de bytes, se desalojan primero las usadas hace más tiempo (LRU).
+#
+# BRAINCOURSE_CACHE_IA_MB fija el tamaño máximo (50 MB por defecto; 0 desactiva la caché).
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+RUTA_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'cache_ia.db')
+MAX_BYTES = int(float(os.environ.get('BRAINCOURSE_CACHE_IA_MB', 50)) * 2**20)
+
+# Al desalojar se baja hasta esta fracción del máximo, para no desalojar en cada escritura.
+_FRACCION_TRAS_DESALOJO = 0.9
+
+
+def clave(*partes: str) -> str:
+    """Hash de las partes, con los espacios normalizados (un salto de línea de más no cambia la clave)."""
+    texto = '\x1f'.join(' '.join(str(parte).split()) for parte in partes)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheRespuestas:
+    def __init__(self, ruta: str = RUTA_CACHE, max_bytes: int = MAX_BYTES):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._bytes = None  # total de las respuestas guardadas; se calcula en la primera escritura
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _conexion(self):
+        """Una conexión por hilo (las respuestas de la IA llegan desde hilos de fondo)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas (clave TEXT PRIMARY KEY, tarea TEXT, respuesta TEXT NOT NULL,"
+                " expira REAL NOT NULL, usada REAL NOT NULL, tamano INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_usada ON respuestas (usada)")
+            self._local.conn = conn
+        return conn
+
+    def obtener(self, clave_respuesta: str):
+        """La respuesta guardada con esa clave, o None si no está o caducó."""
+        conn = self._conexion()
+        ahora = time.time()
+        with conn:
+            fila = conn.execute("SELECT respuesta, expira FROM respuestas WHERE clave = ?", (clave_respuesta,)).fetchone()
+            if fila is not None and fila[1] >= ahora:
+                conn.execute("UPDATE respuestas SET usada = ? WHERE clave = ?", (ahora, clave_respuesta))
+        with self._lock:
+            if fila is None or fila[1] < ahora:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+        return fila[0]
+
+    def guardar(self, clave_respuesta: str, tarea: str, respuesta: str, ttl: float):
+        tamano = len(respuesta.encode('utf-8'))
+        if tamano > self.max_bytes:
+            return
+        conn = self._conexion()
+        ahora = time.time()
+        with conn:
+            anterior = conn.execute("SELECT tamano FROM respuestas WHERE clave = ?", (clave_respuesta,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, tarea, respuesta, expira, usada, tamano) VALUES (?, ?, ?, ?, ?, ?)",
+                (clave_respuesta, tarea, respuesta, ahora + ttl, ahora, tamano)
+            )
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+            else:
+                self._bytes += tamano - (anterior[0] if anterior else 0)
+            if self._bytes > self.max_bytes:
+                self._desalojar(conn)
+
+    def _desalojar(self, conn):
+        """Borra las caducadas y luego las usadas hace más tiempo hasta bajar del objetivo. Llamar con _lock."""
+        objetivo = self.max_bytes * _FRACCION_TRAS_DESALOJO
+        with conn:
+            conn.execute("DELETE FROM respuestas WHERE expira < ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+            borrar = []
+            for clave_respuesta, tamano in conn.execute("SELECT clave, tamano FROM respuestas ORDER BY usada"):
+                if total <= objetivo:
+                    break
+                borrar.append((clave_respuesta,))
+                total -= tamano
+            conn.executemany("DELETE FROM respuestas WHERE clave = ?", borrar)
+        self._bytes = total
+
+    def vaciar(self):
+        conn = self._conexion()
+        with conn:
+            conn.execute("DELETE FROM respuestas")
+        with self._lock:
+            self._bytes = 0
+
+    def estadisticas(self) -> dict:
+        """Aciertos y fallos de este proceso, y entradas y bytes guardados."""
+        entradas, total = self._conexion().execute("SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {'aciertos': self.aciertos, 'fallos': self.fallos,
+                    'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+                    'entradas': entradas, 'bytes': total}
@@ -0,0 +1,119 @@
+# ai_integration/historial_chat.py
+#
+# Historial acotado del chat con Brainy. La sesión de chat de Gemini crecía durante toda la vida del
+# proceso y cada mensaje enviaba la conversación entera. Aquí se conservan literalmente la instrucción
+# de sistema y los últimos turnos; los anteriores se pliegan, con la propia IA y en un hilo de fondo, en
+# un resumen acumulado, de modo que lo enviado en cada mensaje se mantiene dentro del presupuesto de tokens.
+#
+# Mientras se resume un lote, esos turnos se siguen enviando tal cual: el presupuesto se puede superar
+# como mucho en un lote y nunca se pierde contexto. Los tokens se estiman por caracteres, sin llamar a
+# count_tokens (sería una petición más por mensaje).
+
+import threading
+
+CARACTERES_POR_TOKEN = 4
+PRESUPUESTO_TOKENS = 4000
+TURNOS_RECIENTES = 8
+
+_RESPUESTA_INICIAL = "¡Entendido! Soy Brainy."
+
+
+def estimar_tokens(texto: str) -> int:
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+def _mensaje(rol: str, texto: str) -> dict:
+    return {'role': rol, 'parts': [texto]}
+
+
+class HistorialChat:
+    def __init__(self, instruccion_sistema: str, resumir, presupuesto_tokens: int = PRESUPUESTO_TOKENS,
+                 turnos_recientes: int = TURNOS_RECIENTES, en_segundo_plano: bool = True):
+        """
+        resumir(resumen_anterior, turnos) -> nuevo resumen, o None si falla. 'turnos' es una lista de
+        (mensaje del usuario, respuesta). Se llama sin el lock tomado, en un hilo de fondo salvo que
+        en_segundo_plano sea False.
+        """
+        self.instruccion_sistema = instruccion_sistema
+        self.presupuesto_tokens = presupuesto_tokens
+        self.turnos_recientes = turnos_recientes
+        self.resumen = ""
+        self._resumir = resumir
+        self._en_segundo_plano = en_segundo_plano
+        self._turnos = []  # [(mensaje, respuesta)], del más antiguo al más reciente
+        self._resumiendo = 0  # cuántos de los primeros turnos se están plegando en el resumen
+        self._lock = threading.Lock()
+
+    def contenidos(self, mensaje: str) -> list:
+        """Los 'contents' de generate_content: instrucción de sistema, resumen, turnos recientes y el mensaje nuevo."""
+        with self._lock:
+            contenidos = [_mensaje('user', self.instruccion_sistema), _mensaje('model', _RESPUESTA_INICIAL)]
+            if self.resumen:
+                contenidos.append(_mensaje('user', f"Resumen de nuestra conversación hasta ahora: {self.resumen}"))
+                contenidos.append(_mensaje('model', "Entendido, lo tendré en cuenta."))
+            for usuario, respuesta in self._turnos:
+                contenidos.append(_mensaje('user', usuario))
+                contenidos.append(_mensaje('model', respuesta))
+        contenidos.append(_mensaje('user', mensaje))
+        return contenidos
+
+    def agregar_turno(self, mensaje: str, respuesta: str):
+        """Anota el turno y, si sobran turnos o tokens, pliega los más antiguos en el resumen."""
+        with self._lock:
+            self._turnos.append((mensaje, respuesta))
+            lote = self._elegir_lote()
+        if lote:
+            if self._en_segundo_plano:
+                threading.Thread(target=self._plegar, args=(lote,), daemon=True).start()
+            else:
+                self._plegar(lote)
+
+    def tokens_estimados(self) -> int:
+        with self._lock:
+            return self._tokens()
+
+    def _tokens(self) -> int:
+        return (estimar_tokens(self.instruccion_sistema) + estimar_tokens(self.resumen)
+                + sum(estimar_tokens(usuario) + estimar_tokens(respuesta) for usuario, respuesta in self._turnos))
+
+    def _elegir_lote(self):
+        """
+        Llamar con el lock. Se resume por lotes (no en cada turno): cuando hay el doble de turnos recientes
+        o se pasa el presupuesto, se marcan todos menos los recientes, y más si aún no cabe (salvo el último).
+        """
+        if self._resumiendo:
+            return None
+        tokens = self._tokens()
+        if len(self._turnos) < 2 * self.turnos_recientes and tokens <= self.presupuesto_tokens:
+            return None
+        n = max(0, len(self._turnos) - self.turnos_recientes)
+        tokens -= sum(estimar_tokens(u) + estimar_tokens(r) for u, r in self._turnos[:n])
+        while tokens > self.presupuesto_tokens and n < len(self._turnos) - 1:
+            tokens -= estimar_tokens(self._turnos[n][0]) + estimar_tokens(self._turnos[n][1])
+            n += 1
+        if n == 0:
+            return None
+        self._resumiendo = n
+        return self._turnos[:n]
+
+    def _plegar(self, lote: list):
+        while lote:
+            lote = self._plegar_lote(lote)
+
+    def _plegar_lote(self, lote: list):
+        """Pliega el lote en el resumen y retorna el siguiente, si mientras tanto llegaron turnos de sobra."""
+        nuevo = None
+        try:
+            nuevo = self._resumir(self.resumen, lote)
+        except Exception as e:
+            print(f"No se pudo resumir el historial del chat: {e}")
+        if not nuevo:
+            # Sin resumen de la IA se conserva un extracto de cada turno en lugar de perderlos
+            extracto = " ".join(f"Usuario: {u[:120]} / Brainy: {r[:120]}" for u, r in lote)
+            nuevo = f"{self.resumen} {extracto}".strip()
+        # El resumen ocupa como mucho una cuarta parte del presupuesto; si no cabe se queda lo más reciente
+        maximo = self.presupuesto_tokens // 4 * CARACTERES_POR_TOKEN
+        with self._lock:
+            self.resumen = nuevo[-maximo:]
+            del self._turnos[:len(lote)]
+            self._resumiendo = 0
+            return self._elegir_lote()
@@ -0,0 +1,59 @@
+# ai_integration/pool_sesiones.py
+#
+# Sesiones de chat por usuario. AIService es un singleton del proceso y antes tenía una única sesión
+# de chat, compartida por todos los alumnos: la conversación de uno se mezclaba con la de otro y todos
+# esperaban sobre el mismo objeto. El pool guarda un HistorialChat por correo, con:
+#   - un máximo de sesiones abiertas; al superarlo se cierra la usada hace más tiempo (LRU),
+#   - un tiempo de inactividad tras el que la sesión se descarta (se revisa en cada acceso),
+#   - un lock solo para el diccionario: cada historial tiene el suyo, así que los chats de alumnos
+#     distintos nunca se esperan entre sí.
+#
+# Una sesión desalojada mientras alguien la usa sigue funcionando para ese mensaje; el siguiente
+# mensaje de ese usuario empieza una sesión nueva.
+
+import threading
+import time
+from collections import OrderedDict
+
+MAXIMO_SESIONES = 200
+INACTIVIDAD_SEGUNDOS = 30 * 60
+
+
+class PoolSesiones:
+    def __init__(self, crear_sesion, maximo: int = MAXIMO_SESIONES, inactividad: float = INACTIVIDAD_SEGUNDOS):
+        """crear_sesion() -> una sesión nueva (HistorialChat); se llama con el lock del pool tomado, debe ser barata."""
+        self._crear_sesion = crear_sesion
+        self.maximo = maximo
+        self.inactividad = inactividad
+        self._sesiones = OrderedDict()  # correo -> (sesión, último uso), del uso más antiguo al más reciente
+        self._lock = threading.Lock()
+
+    def obtener(self, correo: str):
+        """La sesión del usuario, creándola si no existe o si caducó por inactividad."""
+        correo = (correo or '').lower()
+        ahora = time.monotonic()
+        with self._lock:
+            self._descartar_inactivas(ahora)
+            entrada = self._sesiones.pop(correo, None)
+            sesion = entrada[0] if entrada is not None else self._crear_sesion()
+            self._sesiones[correo] = (sesion, ahora)
+            while len(self._sesiones) > self.maximo:
+                self._sesiones.popitem(last=False)
+            return sesion
+
+    def cerrar(self, correo: str) -> bool:
+        """Descarta la sesión del usuario (p. ej. al cerrar sesión en la aplicación)."""
+        with self._lock:
+            return self._sesiones.pop((correo or '').lower(), None) is not None
+
+    def _descartar_inactivas(self, ahora: float):
+        """Llamar con el lock. Las más antiguas están al principio, así que basta con mirar desde ahí."""
+        while self._sesiones:
+            correo, (_, ultimo_uso) = next(iter(self._sesiones.items()))
+            if ahora - ultimo_uso < self.inactividad:
+                break
+            del self._sesiones[correo]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sesiones)
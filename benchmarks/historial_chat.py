@@ -0,0 +1,95 @@
+# benchmarks/historial_chat.py
+#
+# Latencia por mensaje a lo largo de una sesión de chat de 200 turnos:
+#   - sin límite: la sesión de chat anterior, que enviaba la conversación entera (con el bloque de
+#     contexto de cada mensaje) en cada petición.
+#   - acotado: HistorialChat (ai_integration/historial_chat.py), con la instrucción de sistema, un
+#     resumen acumulado y los últimos turnos.
+# No llama a Gemini: la latencia de cada petición se modela como un costo fijo más un costo por token
+# de entrada (LATENCIA_BASE_MS + MS_POR_TOKEN * tokens), y se suma el tiempo real de armar los contents.
+# El resumidor es sintético y síncrono para que los resultados sean reproducibles.
+#
+#     python -m benchmarks.historial_chat [turnos]
+
+import random
+import statistics
+import sys
+import time
+
+from ai_integration.ai_service import AIService
+from ai_integration.historial_chat import HistorialChat, estimar_tokens
+
+LATENCIA_BASE_MS = 400
+MS_POR_TOKEN = 0.05
+
+_CONTEXTO = (
+    "[INICIO DEL CONTEXTO PARA LA IA]\nEres 'Brainy', el asistente de IA integrado en la plataforma de aprendizaje "
+    "'BrainCourse'.\nEstás hablando con un usuario (Nivel de dificultad 4).\nSu objetivo principal es: 'Pasar un "
+    "examen'\nSu autoevaluacion es: 'Necesito mucha ayuda'\nEl usuario está enfocado en el tema 'álgebra'.\n"
+    "[FIN DEL CONTEXTO]\n\n"
+)
+
+
+def generar_conversacion(turnos: int, semilla: int = 0):
+    """[(pregunta, respuesta)] con longitudes parecidas a las de un chat de tutoría."""
+    rnd = random.Random(semilla)
+    palabras = "ecuación variable despejar término fracción potencia raíz vector función gráfica ejemplo paso".split()
+    texto = lambda n: " ".join(rnd.choice(palabras) for _ in range(n))
+    return [(texto(rnd.randint(10, 40)), texto(rnd.randint(120, 260))) for _ in range(turnos)]
+
+def _resumen_sintetico(resumen, turnos):
+    return (resumen + " " + " ".join(usuario[:60] for usuario, _ in turnos))[-600:]
+
+def _tokens_contenidos(contenidos):
+    return sum(estimar_tokens(parte) for mensaje in contenidos for parte in mensaje['parts'])
+
+
+def sin_limite(conversacion):
+    """Tokens de entrada y ms de armado por mensaje con el historial completo."""
+    historial = [AIService.SYSTEM_INSTRUCTION, "¡Entendido! Soy Brainy."]
+    resultados = []
+    for pregunta, respuesta in conversacion:
+        inicio = time.perf_counter()
+        mensaje = f"{_CONTEXTO}PREGUNTA DEL USUARIO: '{pregunta}'"
+        tokens = sum(estimar_tokens(parte) for parte in historial) + estimar_tokens(mensaje)
+        armado = (time.perf_counter() - inicio) * 1000
+        historial += [mensaje, respuesta]
+        resultados.append((tokens, armado))
+    return resultados
+
+def acotado(conversacion):
+    historial = HistorialChat(AIService.SYSTEM_INSTRUCTION, _resumen_sintetico, en_segundo_plano=False)
+    resultados = []
+    for pregunta, respuesta in conversacion:
+        inicio = time.perf_counter()
+        contenidos = historial.contenidos(f"{_CONTEXTO}PREGUNTA DEL USUARIO: '{pregunta}'")
+        armado = (time.perf_counter() - inicio) * 1000
+        historial.agregar_turno(pregunta, respuesta)
+        resultados.append((_tokens_contenidos(contenidos), armado))
+    return resultados
+
+
+def _latencia(tokens, armado):
+    return LATENCIA_BASE_MS + MS_POR_TOKEN * tokens + armado
+
+
+if __name__ == '__main__':
+    turnos = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    conversacion = generar_conversacion(turnos)
+    resultados = {"sin límite": sin_limite(conversacion), "acotado": acotado(conversacion)}
+
+    print(f"Latencia modelada por mensaje ({LATENCIA_BASE_MS} ms + {MS_POR_TOKEN} ms/token de entrada), {turnos} turnos")
+    print(f"{'turno':>6}" + "".join(f"{nombre + ' tokens':>20}{nombre + ' ms':>16}" for nombre in resultados))
+    for turno in sorted({0, 9, 24, 49, 99, 149, turnos - 1} & set(range(turnos))):
+        fila = f"{turno + 1:>6}"
+        for filas in resultados.values():
+            tokens, armado = filas[turno]
+            fila += f"{tokens:>20,}{_latencia(tokens, armado):>16,.0f}"
+        print(fila)
+
+    print()
+    for nombre, filas in resultados.items():
+        latencias = [_latencia(tokens, armado) for tokens, armado in filas]
+        ultimos = latencias[-max(1, turnos // 4):]
+        print(f"{nombre:<12} mediana {statistics.median(latencias):,.0f} ms, último cuarto {statistics.median(ultimos):,.0f} ms, "
+              f"máximo {max(latencias):,.0f} ms, tokens totales {sum(t for t, _ in filas):,}")
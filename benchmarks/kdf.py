@@ -0,0 +1,75 @@
+# benchmarks/kdf.py
+#
+# Calibra el costo del KDF de contraseñas (data/contrasenas.py) para un presupuesto de latencia:
+# mide scrypt con n creciente y PBKDF2-SHA256 por iteraciones, y propone el valor de BRAINCOURSE_KDF
+# más costoso que cabe en el presupuesto. Un login o un registro pagan este tiempo una vez
+# (en un hilo aparte, ver main.LoginWindow); un atacante lo paga por cada contraseña que prueba.
+#
+#     python -m benchmarks.kdf [presupuesto_ms]
+
+import statistics
+import sys
+import time
+
+from data import contrasenas
+
+_SAL = b'\x00' * 16
+
+
+def _ms(algoritmo, parametros, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        contrasenas.derivar("contraseña de prueba", _SAL, algoritmo, parametros)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def calibrar_scrypt(presupuesto_ms, r=8, p=1):
+    """Retorna (parámetros, ms) con el mayor n (potencia de 2) que cabe en el presupuesto, o (None, None)."""
+    elegido = (None, None)
+    print(f"\nscrypt (r={r}, p={p})")
+    print(f"{'n':>10}{'memoria (MB)':>14}{'ms':>10}")
+    for exponente in range(10, 21):
+        parametros = {'n': 2 ** exponente, 'r': r, 'p': p}
+        ms = _ms(contrasenas.ALGORITMO_SCRYPT, parametros)
+        print(f"{2 ** exponente:>10}{128 * r * 2 ** exponente / 2**20:>14.0f}{ms:>10.1f}")
+        if ms > presupuesto_ms:
+            break
+        elegido = (parametros, ms)
+    return elegido
+
+
+def calibrar_pbkdf2(presupuesto_ms):
+    """Extrapola las iteraciones desde una medición corta y comprueba el resultado."""
+    muestra = 50_000
+    ms_muestra = _ms(contrasenas.ALGORITMO_PBKDF2, {'i': muestra})
+    iteraciones = max(10_000, int(muestra * presupuesto_ms / ms_muestra) // 10_000 * 10_000)
+    parametros = {'i': iteraciones}
+    ms = _ms(contrasenas.ALGORITMO_PBKDF2, parametros)
+    print(f"\npbkdf2_sha256: {muestra:,} iteraciones en {ms_muestra:.1f} ms -> {iteraciones:,} iteraciones en {ms:.1f} ms")
+    return parametros, ms
+
+
+def _configuracion(algoritmo, parametros):
+    return f"{algoritmo}${','.join(f'{k}={v}' for k, v in parametros.items())}"
+
+
+if __name__ == '__main__':
+    presupuesto_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+    print(f"Presupuesto: {presupuesto_ms:.0f} ms por verificación")
+
+    algoritmo, parametros = contrasenas._configuracion_actual()
+    print(f"Configuración actual: {_configuracion(algoritmo, parametros)} ({_ms(algoritmo, parametros):.1f} ms)")
+
+    candidatos = []
+    if contrasenas.scrypt_disponible():
+        parametros, ms = calibrar_scrypt(presupuesto_ms)
+        if parametros is not None:
+            candidatos.append((contrasenas.ALGORITMO_SCRYPT, parametros, ms))
+    parametros, ms = calibrar_pbkdf2(presupuesto_ms)
+    candidatos.append((contrasenas.ALGORITMO_PBKDF2, parametros, ms))
+
+    # scrypt primero: además de CPU exige memoria, lo que encarece los ataques con GPU
+    algoritmo, parametros, ms = candidatos[0]
+    print(f"\nRecomendado ({ms:.1f} ms): BRAINCOURSE_KDF='{_configuracion(algoritmo, parametros)}'")
@@ -0,0 +1,125 @@
+# benchmarks/login.py
+#
+# Latencia de login (buscar un único registro y comprobar la contraseña) con 1k, 10k y 100k usuarios:
+#   - json.load: el usuarios.json monolítico anterior, parseado entero en cada login.
+#   - índice + mmap: el mismo archivo con un índice lateral correo -> (offset, longitud);
+#     se mapea el archivo y solo se decodifica el registro buscado.
+#   - por usuario: el almacenamiento actual (un archivo por usuario, ver data/gestion_usuarios.py),
+#     consultando solo la tabla de credenciales como hace AuthService.verificar_usuario.
+# Las tres comparan el mismo hash barato: el costo del KDF es igual en todas y se mide en benchmarks/kdf.py.
+#
+#     python -m benchmarks.login [n_usuarios ...]
+
+import json
+import mmap
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.modelo_compacto import generar_datos
+from data import gestion_credenciales, gestion_usuarios, serializacion
+
+CONTRASENA = "clave-de-prueba"
+
+
+def escribir_monolitico(ruta, usuarios):
+    """Escribe usuarios.json como lo hacía el DAO anterior y retorna el índice correo -> (offset, longitud)."""
+    indice = {}
+    with open(ruta, 'wb') as f:
+        f.write(b'{')
+        for i, (correo, datos) in enumerate(usuarios.items()):
+            f.write((',' if i else '').encode() + json.dumps(correo).encode() + b':')
+            registro = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+            indice[correo] = (f.tell(), len(registro))
+            f.write(registro)
+        f.write(b'}')
+    with open(ruta + '.idx', 'w', encoding='utf-8') as f:
+        json.dump(indice, f)
+    return indice
+
+
+def login_json_load(ruta, correo):
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.load(f).get(correo)
+    return datos is not None and datos['contrasena_hash'] == gestion_usuarios.hashear_contrasena(CONTRASENA)
+
+def login_indice_mmap(ruta, indice, correo):
+    posicion = indice.get(correo)
+    if posicion is None:
+        return False
+    offset, longitud = posicion
+    with open(ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        datos = json.loads(m[offset:offset + longitud])
+    return datos['contrasena_hash'] == gestion_usuarios.hashear_contrasena(CONTRASENA)
+
+
+def _medir(funcion, correos):
+    """Mediana y p95 en milisegundos de funcion(correo) sobre cada correo."""
+    tiempos = []
+    for correo in correos:
+        inicio = time.perf_counter()
+        if not funcion(correo):
+            raise RuntimeError(f"Login fallido para {correo}")
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+
+
+def comparar(n_usuarios: int, muestras: int = 200):
+    registros, _, _ = generar_datos(n_usuarios)
+    hash_contrasena = gestion_usuarios.hashear_contrasena(CONTRASENA)
+    usuarios = {}
+    for registro in registros:
+        datos = {k: v for k, v in registro.items() if k != 'email'}
+        datos['contrasena_hash'] = hash_contrasena
+        usuarios[registro['email']] = datos
+    rnd = random.Random(1)
+    correos = rnd.sample(list(usuarios), min(muestras, n_usuarios))
+
+    directorio = tempfile.mkdtemp(prefix='bench_login_')
+    rutas_originales = (gestion_usuarios.RUTA_USUARIOS, gestion_usuarios.DIR_USUARIOS, gestion_credenciales.RUTA_CREDENCIALES)
+    try:
+        ruta = os.path.join(directorio, 'usuarios.json')
+        escribir_monolitico(ruta, usuarios)
+        tamano_mb = os.path.getsize(ruta) / 2**20
+        inicio = time.perf_counter()
+        with open(ruta + '.idx', 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        carga_indice = (time.perf_counter() - inicio) * 1000
+
+        gestion_usuarios.RUTA_USUARIOS = os.path.join(directorio, 'no-existe.json')
+        gestion_usuarios.DIR_USUARIOS = os.path.join(directorio, 'usuarios')
+        gestion_credenciales.RUTA_CREDENCIALES = os.path.join(directorio, 'credenciales.jsonl')
+        os.makedirs(gestion_usuarios.DIR_USUARIOS)
+        with open(gestion_credenciales.RUTA_CREDENCIALES, 'w', encoding='utf-8') as f:
+            for correo, datos in usuarios.items():
+                serializacion.escribir(gestion_usuarios._ruta_registro(correo), datos)
+                f.write(serializacion.a_linea({'email': correo, 'hash': datos['contrasena_hash'], 'salt': None,
+                                               'rol': datos['rol'], 'perfil_completo': datos['perfil_completo']}) + '\n')
+        gestion_usuarios._cache.descartar()
+        gestion_credenciales.obtener(correos[0])  # la tabla se lee una vez al arrancar, como en la aplicación
+
+        # json.load es O(n) por login: con pocas muestras basta para ver la tendencia
+        resultados = [
+            ("json.load", _medir(lambda c: login_json_load(ruta, c), correos[:max(3, 2_000_000 // (n_usuarios * 100))])),
+            ("índice + mmap", _medir(lambda c: login_indice_mmap(ruta, indice, c), correos)),
+            ("por usuario", _medir(lambda c: gestion_usuarios.obtener_credenciales(c)['hash'] == gestion_usuarios.hashear_contrasena(CONTRASENA), correos)),
+        ]
+    finally:
+        gestion_usuarios.RUTA_USUARIOS, gestion_usuarios.DIR_USUARIOS, gestion_credenciales.RUTA_CREDENCIALES = rutas_originales
+        gestion_usuarios._cache.descartar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"\n{n_usuarios:,} usuarios (usuarios.json de {tamano_mb:.1f} MB; índice cargado una vez en {carga_indice:.1f} ms)")
+    print(f"{'estrategia':<16}{'mediana (ms)':>14}{'p95 (ms)':>12}")
+    for nombre, (mediana, p95) in resultados:
+        print(f"{nombre:<16}{mediana:>14.3f}{p95:>12.3f}")
+
+
+if __name__ == '__main__':
+    for n in (map(int, sys.argv[1:]) if len(sys.argv) > 1 else (1_000, 10_000, 100_000)):
+        comparar(n)
@@ -0,0 +1,113 @@
+# benchmarks/modelo_compacto.py
+#
+# Memoria y velocidad de (de)serialización de los modelos con __slots__ (User, Course con
+# Membership/Module, Activity) frente al modelo anterior basado en dicts, sobre datos sintéticos.
+#
+#     python -m benchmarks.modelo_compacto [n_usuarios]
+
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from models.course_model import Course
+from models.user_model import User, Activity
+
+
+class _ModeloDict:
+    """Modelo anterior: una instancia con __dict__ que referencia los dicts del registro tal cual."""
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def generar_datos(n_usuarios: int, semilla: int = 0):
+    """Retorna (usuarios, cursos, actividades) como listas de dicts con la forma de los archivos de data/."""
+    rnd = random.Random(semilla)
+    temas = [f"tema_{i}" for i in range(40)]
+
+    def modulo(i):
+        return {"id_modulo": f"mod_{i:06x}", "titulo": f"Módulo {i}", "subtemas": [f"Subtema {i}.{j}" for j in range(4)],
+                "completado": rnd.random() < 0.5, "calificacion_examen": round(rnd.uniform(5, 10), 2),
+                "teoria_generada": {}}
+
+    cursos = []
+    for c in range(max(1, n_usuarios // 10)):
+        cursos.append({"id_curso": f"curso_{c:08x}", "tema_general": rnd.choice(temas), "creador_email": f"profesor{c}@ejemplo.com",
+                       "miembros": [{"email": f"profesor{c}@ejemplo.com", "rol": "profesor"}] +
+                                   [{"email": f"alumno{rnd.randrange(n_usuarios)}@ejemplo.com", "rol": "alumno"} for _ in range(20)],
+                       "modulos": [modulo(c * 10 + m) for m in range(5)], "progreso_general": 0.0, "calificacion_promedio": None})
+
+    usuarios = []
+    for u in range(n_usuarios):
+        usuarios.append({
+            "email": f"alumno{u}@ejemplo.com", "nombre": f"Alumno {u}", "contrasena_hash": "%064x" % rnd.getrandbits(256),
+            "rol": "alumno", "perfil_completo": True, "datos_perfil": {"nivel_estudios": "Universidad"},
+            "progreso": {"nivel": rnd.randint(1, 10), "racha_correctas": rnd.randint(0, 5)},
+            "historial_temas": rnd.sample(temas, 5),
+            "logros": {"primer_quiz": "2025-01-01T00:00:00", "mente_brillante": None, "racha_5": None, "polimata_5": None},
+            "estadisticas": {"preguntas_totales": 50, "aciertos_totales": 30,
+                             "rendimiento_por_tema": {t: {"aciertos": 3, "total": 5} for t in rnd.sample(temas, 6)}},
+            "cursos": [], "profesores_vinculados": ["profesor1@ejemplo.com"], "solicitudes_enviadas": [],
+            "invitaciones_profesor": [], "notificaciones": [{"id": f"notif_{u}_{n}", "fecha": "2025-01-01T00:00:00",
+                                                              "texto": "Aviso", "leida": True} for n in range(3)],
+        })
+
+    actividades = [{"fecha": f"2025-01-01T00:00:{i % 60:02d}", "tipo": "Quiz de Práctica", "tema": rnd.choice(temas),
+                    "resultado": "Correcta", "pregunta": "¿Cuánto es 2 + 2?", "respuesta_usuario": "4",
+                    "respuesta_correcta_ia": "4", "fue_correcta": True, "id": i}
+                   for i in range(n_usuarios * 5)]
+    return usuarios, cursos, actividades
+
+
+def _construir(texto_json, desde_dict):
+    return [desde_dict(d) for d in json.loads(texto_json)]
+
+def _memoria(texto_json, desde_dict):
+    """Bytes retenidos por los objetos construidos (incluye los dicts anidados que siguen referenciando)."""
+    gc.collect()
+    tracemalloc.start()
+    objetos = _construir(texto_json, desde_dict)
+    gc.collect()
+    retenidos = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retenidos, objetos
+
+def _por_segundo(funcion, n_elementos, repeticiones=3):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return n_elementos / mejor
+
+
+def comparar(nombre, registros, desde_dict_compacto):
+    texto = json.dumps(registros)
+    print(f"\n{nombre} ({len(registros)} registros)")
+    print(f"{'modelo':<10}{'memoria (MB)':>14}{'from_dict/s':>14}{'to_dict/s':>14}{'json ida y vuelta/s':>22}")
+    for etiqueta, desde_dict in (("dicts", _ModeloDict.from_dict), ("slots", desde_dict_compacto)):
+        memoria, objetos = _memoria(texto, desde_dict)
+        cargados = json.loads(texto)
+        carga = _por_segundo(lambda: [desde_dict(d) for d in cargados], len(cargados))
+        volcado = _por_segundo(lambda: [o.to_dict() for o in objetos], len(objetos))
+        ida_vuelta = _por_segundo(lambda: [desde_dict(d) for d in json.loads(json.dumps([o.to_dict() for o in objetos]))], len(objetos))
+        print(f"{etiqueta:<10}{memoria / 2**20:>14.2f}{carga:>14,.0f}{volcado:>14,.0f}{ida_vuelta:>22,.0f}")
+        del objetos
+
+
+if __name__ == '__main__':
+    n_usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    usuarios, cursos, actividades = generar_datos(n_usuarios)
+    comparar("Usuarios", usuarios, lambda d: User.from_dict(d.get('email'), d))
+    comparar("Cursos", cursos, Course.from_dict)
+    comparar("Actividades", actividades, Activity.from_dict)
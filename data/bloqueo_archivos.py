@@ -0,0 +1,80 @@
+# data/bloqueo_archivos.py
+#
+# Bloqueo exclusivo entre procesos sobre un archivo auxiliar (<algo>.lock), con fcntl en POSIX
+# y msvcrt en Windows, combinado con un RLock para los hilos del mismo proceso.
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _bloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        return
+    archivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)  # reintenta ~10 s antes de fallar
+            return
+        except OSError:
+            time.sleep(0.05)
+
+def _desbloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BloqueoArchivo:
+    """
+    Context manager reentrante: el primer 'with' del hilo toma el RLock y el bloqueo del archivo,
+    los anidados solo incrementan la profundidad. Así un hilo puede llamar a funciones que vuelven
+    a bloquear el mismo registro sin quedarse esperándose a sí mismo.
+    """
+
+    def __init__(self, ruta_lock: str):
+        self.ruta_lock = ruta_lock
+        self._hilo = threading.RLock()
+        self._profundidad = 0
+        self._archivo = None
+
+    def __enter__(self):
+        self._hilo.acquire()
+        if self._profundidad == 0:
+            try:
+                os.makedirs(os.path.dirname(self.ruta_lock), exist_ok=True)
+                self._archivo = open(self.ruta_lock, 'a+b')
+                _bloquear(self._archivo)
+            except Exception:
+                if self._archivo is not None:
+                    self._archivo.close()
+                    self._archivo = None
+                self._hilo.release()
+                raise
+        self._profundidad += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            try:
+                _desbloquear(self._archivo)
+            finally:
+                self._archivo.close()
+                self._archivo = None
+        self._hilo.release()
+        return False
+
+    @property
+    def hilo(self):
+        """RLock solo entre hilos de este proceso (para lecturas, que no necesitan excluir a otros procesos)."""
+        return self._hilo
@@ -0,0 +1,102 @@
+# data/contrasenas.py
+#
+# Hash de contraseñas con un KDF lento y sal por usuario (scrypt; PBKDF2-SHA256 si el OpenSSL
+# de Python no trae scrypt). El hash guarda el algoritmo y sus parámetros:
+#     scrypt$n=16384,r=8,p=1$<hex>        pbkdf2_sha256$i=600000$<hex>
+# así que subir el costo no invalida los hashes existentes: se rehashean en el siguiente login
+# (ver necesita_rehash). Los hashes heredados (SHA-256 sin sal, sin '$') se siguen aceptando.
+# Para elegir el costo según la latencia que se quiere tolerar: python -m benchmarks.kdf
+#
+# BRAINCOURSE_KDF cambia los parámetros por defecto, con el mismo formato: "scrypt$n=32768,r=8,p=1".
+
+import hashlib
+import hmac
+import os
+
+ALGORITMO_SCRYPT = 'scrypt'
+ALGORITMO_PBKDF2 = 'pbkdf2_sha256'
+
+PARAMETROS_POR_DEFECTO = {
+    ALGORITMO_SCRYPT: {'n': 2 ** 14, 'r': 8, 'p': 1},
+    ALGORITMO_PBKDF2: {'i': 600_000},
+}
+
+_BYTES_SAL = 16
+_BYTES_HASH = 32
+
+
+def scrypt_disponible() -> bool:
+    return hasattr(hashlib, 'scrypt')
+
+def _leer_parametros(texto: str) -> dict:
+    return {clave: int(valor) for clave, valor in (par.split('=') for par in texto.split(',') if par)}
+
+def _escribir_parametros(parametros: dict) -> str:
+    return ','.join(f"{clave}={valor}" for clave, valor in parametros.items())
+
+def _parametros_validos(algoritmo: str, parametros: dict) -> bool:
+    """Las mismas claves que los parámetros por defecto, enteros positivos, y n potencia de 2 en scrypt."""
+    if parametros.keys() != PARAMETROS_POR_DEFECTO[algoritmo].keys() or any(v <= 0 for v in parametros.values()):
+        return False
+    return algoritmo != ALGORITMO_SCRYPT or (parametros['n'] > 1 and parametros['n'] & (parametros['n'] - 1) == 0)
+
+def _configuracion_actual():
+    """(algoritmo, parámetros) con los que se generan los hashes nuevos. Un BRAINCOURSE_KDF inválido se ignora."""
+    texto = os.environ.get('BRAINCOURSE_KDF')
+    if texto:
+        algoritmo, _, parametros = texto.partition('$')
+        if algoritmo in PARAMETROS_POR_DEFECTO and (algoritmo != ALGORITMO_SCRYPT or scrypt_disponible()):
+            try:
+                parametros = _leer_parametros(parametros)
+            except ValueError:
+                parametros = None
+            if parametros is not None and _parametros_validos(algoritmo, parametros):
+                return algoritmo, parametros
+        print(f"BRAINCOURSE_KDF inválido ({texto!r}); se usan los parámetros por defecto.")
+    algoritmo = ALGORITMO_SCRYPT if scrypt_disponible() else ALGORITMO_PBKDF2
+    return algoritmo, PARAMETROS_POR_DEFECTO[algoritmo]
+
+def derivar(contrasena: str, sal: bytes, algoritmo: str, parametros: dict) -> bytes:
+    datos = contrasena.encode('utf-8')
+    if algoritmo == ALGORITMO_SCRYPT:
+        n, r, p = parametros['n'], parametros['r'], parametros['p']
+        return hashlib.scrypt(datos, salt=sal, n=n, r=r, p=p, maxmem=256 * r * n * p + 2 ** 20, dklen=_BYTES_HASH)
+    if algoritmo == ALGORITMO_PBKDF2:
+        return hashlib.pbkdf2_hmac('sha256', datos, sal, parametros['i'], dklen=_BYTES_HASH)
+    raise ValueError(f"Algoritmo de contraseña desconocido: {algoritmo}")
+
+
+def hash_heredado(contrasena: str) -> str:
+    """SHA-256 sin sal de las versiones anteriores. Solo para comprobar hashes antiguos."""
+    return hashlib.sha256(contrasena.encode('utf-8')).hexdigest()
+
+def generar(contrasena: str):
+    """Retorna (hash, sal en hex) para guardar en 'contrasena_hash' y 'contrasena_salt'."""
+    algoritmo, parametros = _configuracion_actual()
+    sal = os.urandom(_BYTES_SAL)
+    derivado = derivar(contrasena, sal, algoritmo, parametros)
+    return f"{algoritmo}${_escribir_parametros(parametros)}${derivado.hex()}", sal.hex()
+
+def verificar(contrasena: str, hash_guardado: str, sal: str = None) -> bool:
+    """Compara en tiempo constante. Acepta hashes de cualquier configuración y los heredados."""
+    if not hash_guardado:
+        return False
+    if '$' not in hash_guardado:
+        return hmac.compare_digest(hash_heredado(contrasena), hash_guardado)
+    try:
+        algoritmo, parametros, esperado = hash_guardado.split('$')
+        if algoritmo == ALGORITMO_SCRYPT and not scrypt_disponible():
+            print("Hash scrypt sin soporte en este intérprete (hashlib.scrypt no disponible); no se puede verificar.")
+            return False
+        derivado = derivar(contrasena, bytes.fromhex(sal or ''), algoritmo, _leer_parametros(parametros))
+    except (ValueError, KeyError) as e:
+        print(f"Hash de contraseña ilegible: {e}")
+        return False
+    return hmac.compare_digest(derivado.hex(), esperado)
+
+def necesita_rehash(hash_guardado: str) -> bool:
+    """True si el hash es heredado o se generó con otro algoritmo o costo que el actual."""
+    if not hash_guardado or '$' not in hash_guardado:
+        return True
+    algoritmo, parametros = _configuracion_actual()
+    return not hash_guardado.startswith(f"{algoritmo}${_escribir_parametros(parametros)}$")
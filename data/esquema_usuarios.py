@@ -0,0 +1,68 @@
+# data/esquema_usuarios.py
+#
+# Formato de los registros de usuario. Cada registro lleva '_schema' con la versión de su formato;
+# al leer uno antiguo, el DAO le aplica en orden las migraciones registradas aquí y guarda el
+# resultado, así que cada registro se migra una sola vez y sin reescribir los demás.
+# Para cambiar el formato: subir VERSION_ESQUEMA y registrar la función que pasa de la anterior:
+#
+#     @migracion(desde=1)
+#     def _resumen_estadisticas(datos): ...   # modifica el dict in situ
+
+CAMPO_ESQUEMA = '_schema'
+VERSION_ESQUEMA = 1
+
+_MIGRACIONES = {}  # versión de origen -> función que lleva a la siguiente
+
+
+def migracion(desde: int):
+    def registrar(funcion):
+        _MIGRACIONES[desde] = funcion
+        return funcion
+    return registrar
+
+
+def registro_por_defecto(rol: str, nombre: str = None, contrasena_hash: str = None, contrasena_salt: str = None) -> dict:
+    """Registro completo de un usuario nuevo. Es la única definición de los valores por defecto."""
+    return {
+        CAMPO_ESQUEMA: VERSION_ESQUEMA,
+        'nombre': nombre,
+        'contrasena_hash': contrasena_hash,
+        'contrasena_salt': contrasena_salt,
+        'rol': rol,
+        'perfil_completo': False,
+        'datos_perfil': {},
+        'progreso': {'nivel': 1, 'racha_correctas': 0},
+        'historial_temas': [],
+        'logros': {"primer_quiz": None, "mente_brillante": None, "racha_5": None, "polimata_5": None},
+        'estadisticas': {"preguntas_totales": 0, "aciertos_totales": 0, "rendimiento_por_tema": {}},
+        'cursos': [],
+        'cursos_membresia': [],
+        # Alumno
+        'profesores_vinculados': [],
+        'solicitudes_enviadas': [],
+        'invitaciones_profesor': [],
+        'notificaciones': [],
+        # Profesor
+        'alumnos_vinculados': [],
+        'solicitudes_pendientes': [],
+    }
+
+
+@migracion(desde=0)
+def _completar_campos(datos):
+    """Registros anteriores al esquema: cada campo ausente o nulo toma su valor por defecto."""
+    for campo, valor in registro_por_defecto(datos.get('rol')).items():
+        if datos.get(campo) is None:
+            datos[campo] = valor
+
+
+def migrar(datos: dict) -> bool:
+    """Lleva el registro (in situ) a VERSION_ESQUEMA. Retorna True si hubo que cambiarlo."""
+    version = datos.get(CAMPO_ESQUEMA, 0)
+    if version >= VERSION_ESQUEMA:
+        return False
+    while version < VERSION_ESQUEMA:
+        _MIGRACIONES[version](datos)
+        version += 1
+    datos[CAMPO_ESQUEMA] = version
+    return True
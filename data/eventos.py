@@ -0,0 +1,97 @@
+# data/eventos.py
+#
+# Eventos de cambio (CDC) de la capa de datos. gestion_usuarios, gestion_cursos, gestion_reportes y
+# gestion_sqlite publican un evento tras cada escritura confirmada; quien necesite enterarse (cachés, índices de
+# búsqueda, estadísticas del profesor, paneles abiertos) se suscribe en lugar de releer los archivos
+# para ver si algo cambió:
+#
+#     cancelar = eventos.suscribir(lambda e: refrescar(e.email), eventos.UsuarioActualizado)
+#
+# Los suscriptores se llaman en el hilo que escribió, a veces con el registro aún bloqueado:
+# deben ser rápidos y no esperar a otros hilos (para trabajo pesado, encolarlo o usar root.after).
+# Con BRAINCOURSE_EVENTOS=<ruta> cada evento se anexa además como una línea JSON a ese archivo,
+# que otros procesos pueden seguir (tail -f) sin tocar los datos.
+
+import os
+import threading
+import time
+from dataclasses import dataclass, fields
+
+from data import serializacion
+
+RUTA_EVENTOS = os.environ.get('BRAINCOURSE_EVENTOS')
+
+
+@dataclass(slots=True, frozen=True)
+class UsuarioActualizado:
+    """Se escribió el registro de un usuario. campos=None si no se sabe qué campos cambiaron (registro completo)."""
+    email: str
+    campos: frozenset = None
+
+@dataclass(slots=True, frozen=True)
+class UsuarioEliminado:
+    email: str
+
+@dataclass(slots=True, frozen=True)
+class CursoActualizado:
+    id_curso: str
+
+@dataclass(slots=True, frozen=True)
+class CursoEliminado:
+    id_curso: str
+
+@dataclass(slots=True, frozen=True)
+class ReporteAgregado:
+    id_reporte: str
+    email_profesor: str = None
+
+@dataclass(slots=True, frozen=True)
+class EstadoReporteCambiado:
+    id_reporte: str
+    estado: str
+
+
+_lock = threading.Lock()
+_suscriptores = ()  # (tipo o None, funcion); se reemplaza entera al suscribir, así publicar no bloquea
+
+
+def suscribir(funcion, tipo=None):
+    """Llama a funcion(evento) por cada evento publicado (solo los de 'tipo', si se indica). Retorna la función para cancelar."""
+    global _suscriptores
+    entrada = (tipo, funcion)
+    with _lock:
+        _suscriptores = _suscriptores + (entrada,)
+
+    def cancelar():
+        global _suscriptores
+        with _lock:
+            _suscriptores = tuple(s for s in _suscriptores if s is not entrada)
+    return cancelar
+
+def publicar(evento):
+    """Entrega el evento a los suscriptores. Un suscriptor que falla no afecta a la escritura ni a los demás."""
+    for tipo, funcion in _suscriptores:
+        if tipo is None or isinstance(evento, tipo):
+            try:
+                funcion(evento)
+            except Exception as e:
+                print(f"Error en un suscriptor de {type(evento).__name__}: {e}")
+    if RUTA_EVENTOS:
+        _anexar_a_archivo(evento)
+
+
+def a_dict(evento) -> dict:
+    """{'tipo': nombre de la clase, 'fecha': epoch, ...campos} para serializar el evento."""
+    datos = {'tipo': type(evento).__name__, 'fecha': time.time()}
+    for campo in fields(evento):
+        valor = getattr(evento, campo.name)
+        datos[campo.name] = sorted(valor) if isinstance(valor, frozenset) else valor
+    return datos
+
+def _anexar_a_archivo(evento):
+    linea = serializacion.a_linea(a_dict(evento)) + '\n'
+    try:
+        with _lock, open(RUTA_EVENTOS, 'a', encoding='utf-8') as f:
+            f.write(linea)
+    except OSError as e:
+        print(f"Error al escribir el evento en {RUTA_EVENTOS}: {e}")
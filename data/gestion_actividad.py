@@ -0,0 +1,339 @@
+# data/gestion_actividad.py
+#
+# Historial de actividad de cada usuario en un log propio, de solo anexado:
+# data/actividad/<correo>.jsonl, una actividad por línea con un 'id' creciente.
+# El registro del usuario ya no contiene el historial, así que su tamaño no crece con el uso.
+# La lectura es paginada y empieza por el final del archivo (lo más reciente primero).
+#
+# Lo antiguo se archiva: las actividades de más de DIAS_RECIENTES días o más allá de las
+# MAXIMO_RECIENTES últimas pasan a segmentos mensuales comprimidos en
+# data/actividad/archivo/<correo>/<AAAA-MM>.jsonl.gz, con un índice de ids por segmento.
+# obtener_actividad sigue por el archivo cuando se acaba el log, así que paginar hacia atrás
+# (el 'Cargar más' del profesor) llega a todo el historial, pero solo descomprime lo que muestra.
+# Se archiva en segundo plano cuando el log pasa de ENTRADAS_ARCHIVADO entradas o su entrada más
+# antigua de DIAS_ARCHIVADO días (con margen sobre DIAS_RECIENTES y MAXIMO_RECIENTES, para que cada
+# archivado saque un lote y no se repita en cada anexado), o para todos con:
+#     python -m data.gestion_actividad archivar [días] [máximo]
+#
+# Las escrituras de un usuario (anexar, archivar, reemplazar, borrar) toman su bloqueo de archivo
+# (data/actividad/<correo>.lock), como los registros de gestion_usuarios, así que otro proceso no
+# pierde entradas anexadas mientras se reescribe el log. El último id se relee bajo ese bloqueo si
+# el log cambió desde la última escritura de este proceso, para no repetir ids.
+
+import gzip
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+from data import serializacion
+from data.bloqueo_archivos import BloqueoArchivo
+
+DIR_ACTIVIDAD = os.path.join(os.path.dirname(__file__), 'actividad')
+DIR_ARCHIVO = os.path.join(DIR_ACTIVIDAD, 'archivo')
+
+DIAS_RECIENTES = 90
+MAXIMO_RECIENTES = 500
+ENTRADAS_ARCHIVADO = 2 * MAXIMO_RECIENTES
+DIAS_ARCHIVADO = DIAS_RECIENTES + 30
+
+_TAM_BLOQUE = 64 * 1024
+_EXTENSION_SEGMENTO = '.jsonl.gz'
+_NOMBRE_INDICE = 'indice.json'
+
+_lock_bloqueos = threading.Lock()
+_bloqueos = {}  # correo -> BloqueoArchivo
+_ultimos_ids = {}  # correo -> (firma del log tras la última escritura, id de la última actividad escrita)
+_primeras = {}  # correo -> (id, fecha) de la entrada más antigua del log sin archivar
+_archivando = set()  # correos con un archivado en segundo plano en curso
+
+
+def ruta_actividad(correo: str) -> str:
+    """Log de actividad sin archivar de un usuario (solo se anexa; ver las copias de seguridad)."""
+    return os.path.join(DIR_ACTIVIDAD, quote(correo.lower(), safe='@.+-_') + '.jsonl')
+
+def _bloqueo(correo: str) -> BloqueoArchivo:
+    """Bloqueo de escritura del historial de un usuario, entre hilos y entre procesos."""
+    with _lock_bloqueos:
+        bloqueo = _bloqueos.get(correo)
+        if bloqueo is None:
+            bloqueo = _bloqueos[correo] = BloqueoArchivo(
+                os.path.join(DIR_ACTIVIDAD, quote(correo.lower(), safe='@.+-_') + '.lock'))
+        return bloqueo
+
+def _firma_log(correo: str):
+    try:
+        st = os.stat(ruta_actividad(correo))
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _dir_archivo(correo: str) -> str:
+    return os.path.join(DIR_ARCHIVO, quote(correo.lower(), safe='@.+-_'))
+
+def _lineas_desde_el_final(ruta: str):
+    """Recorre las líneas de un archivo de la última a la primera, leyendo bloques desde el final."""
+    try:
+        f = open(ruta, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        posicion = f.seek(0, os.SEEK_END)
+        resto = b''
+        while posicion > 0:
+            leer = min(_TAM_BLOQUE, posicion)
+            posicion -= leer
+            f.seek(posicion)
+            partes = (f.read(leer) + resto).split(b'\n')
+            resto = partes.pop(0)  # puede ser una línea cortada: se completa con el bloque anterior
+            for linea in reversed(partes):
+                if linea.strip():
+                    yield linea
+        if resto.strip():
+            yield resto
+
+def _entradas_calientes_desde_el_final(correo: str):
+    for linea in _lineas_desde_el_final(ruta_actividad(correo)):
+        try:
+            yield serializacion.de_linea(linea)
+        except ValueError:
+            continue  # última línea incompleta por una escritura cortada
+
+def _entradas_desde_el_final(correo: str, antes: int = None):
+    """Entradas con id menor que 'antes', de la más reciente a la más antigua: primero el log y luego el archivo."""
+    limite = antes
+    for entrada in _entradas_calientes_desde_el_final(correo):
+        if limite is not None and entrada['id'] >= limite:
+            continue
+        limite = entrada['id']
+        yield entrada
+    yield from _entradas_archivadas(correo, limite)
+
+def _ultima_entrada(correo: str):
+    return next(_entradas_desde_el_final(correo), None)
+
+def _ultimo_id(correo: str) -> int:
+    """Id de la última actividad. Llamar con el bloqueo del usuario: si otro proceso tocó el log, se relee."""
+    firma = _firma_log(correo)
+    recordado = _ultimos_ids.get(correo)
+    if recordado is not None and recordado[0] == firma:
+        return recordado[1]
+    ultima = _ultima_entrada(correo)
+    _ultimos_ids[correo] = (firma, ultima['id'] if ultima else 0)
+    return _ultimos_ids[correo][1]
+
+def _primera_entrada(correo: str):
+    """(id, fecha) de la primera entrada del log, o None si está vacío. Solo lee su primera línea, y se recuerda."""
+    if _primeras.get(correo) is None:
+        primera = None
+        try:
+            with open(ruta_actividad(correo), 'rb') as f:
+                for linea in f:
+                    try:
+                        entrada = serializacion.de_linea(linea)
+                    except ValueError:
+                        continue
+                    primera = (entrada['id'], entrada.get('fecha') or '')
+                    break
+        except FileNotFoundError:
+            pass
+        _primeras[correo] = primera
+    return _primeras[correo]
+
+def _hay_que_archivar(correo: str, ultimo_id: int) -> bool:
+    primera = _primera_entrada(correo)
+    if primera is None:
+        return False
+    id_primera, fecha_primera = primera
+    return (ultimo_id - id_primera + 1 > ENTRADAS_ARCHIVADO
+            or fecha_primera < (datetime.now() - timedelta(days=DIAS_ARCHIVADO)).isoformat())
+
+def _anexar(correo: str, actividades: list):
+    os.makedirs(DIR_ACTIVIDAD, exist_ok=True)
+    siguiente = _ultimo_id(correo)
+    lineas = []
+    for actividad in actividades:
+        siguiente += 1
+        lineas.append(serializacion.a_linea({**actividad, 'id': siguiente}) + '\n')
+    with open(ruta_actividad(correo), 'a', encoding='utf-8') as f:
+        f.writelines(lineas)
+    _ultimos_ids[correo] = (_firma_log(correo), siguiente)
+    if correo not in _archivando and _hay_que_archivar(correo, siguiente):
+        _archivando.add(correo)
+        threading.Thread(target=_archivar_en_segundo_plano, args=(correo,), daemon=True).start()
+
+
+# --- Archivo de actividad antigua ---
+
+def _leer_indice_archivo(correo: str) -> dict:
+    """{nombre del segmento: [id mínimo, id máximo]}."""
+    try:
+        return serializacion.leer(os.path.join(_dir_archivo(correo), _NOMBRE_INDICE))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _entradas_archivadas(correo: str, antes: int = None):
+    """Entradas archivadas con id menor que 'antes', de la más reciente a la más antigua. Solo abre los segmentos necesarios."""
+    segmentos = sorted(_leer_indice_archivo(correo).items(), key=lambda s: s[1][1], reverse=True)
+    for nombre, (minimo, _) in segmentos:
+        if antes is not None and minimo >= antes:
+            continue
+        try:
+            with gzip.open(os.path.join(_dir_archivo(correo), nombre), 'rb') as f:
+                entradas = [serializacion.de_linea(linea) for linea in f if linea.strip()]
+        except (OSError, ValueError) as e:
+            print(f"Error al leer el segmento {nombre} de {correo}: {e}")
+            continue
+        for entrada in reversed(entradas):
+            # un archivado interrumpido puede dejar la entrada en el log y en el archivo: se salta la repetida
+            if antes is None or entrada['id'] < antes:
+                antes = entrada['id']
+                yield entrada
+
+def archivar_actividad(correo: str, dias: int = DIAS_RECIENTES, maximo: int = MAXIMO_RECIENTES) -> int:
+    """
+    Pasa al archivo las actividades de más de 'dias' días y las que quedan más allá de las 'maximo'
+    más recientes. El log se reescribe solo con las que quedan. Retorna cuántas se archivaron.
+    """
+    correo = correo.lower()
+    with _bloqueo(correo):
+        entradas = list(_entradas_calientes_desde_el_final(correo))
+        entradas.reverse()
+        fecha_limite = (datetime.now() - timedelta(days=dias)).isoformat()
+        corte = max(0, len(entradas) - maximo)
+        while corte < len(entradas) and (entradas[corte].get('fecha') or '') < fecha_limite:
+            corte += 1
+        primera = (entradas[corte]['id'], entradas[corte].get('fecha') or '') if corte < len(entradas) else None
+        if corte == 0:
+            _primeras[correo] = primera
+            return 0
+        por_mes = {}
+        for entrada in entradas[:corte]:
+            por_mes.setdefault(((entrada.get('fecha') or '')[:7] or '0000-00') + _EXTENSION_SEGMENTO, []).append(entrada)
+        directorio = _dir_archivo(correo)
+        os.makedirs(directorio, exist_ok=True)
+        indice = _leer_indice_archivo(correo)
+        for nombre, lista in por_mes.items():
+            # cada archivado añade un miembro gzip al segmento del mes; gzip los lee como un solo flujo
+            with gzip.open(os.path.join(directorio, nombre), 'ab') as f:
+                f.write(''.join(serializacion.a_linea(e) + '\n' for e in lista).encode('utf-8'))
+            minimo, maximo_id = indice.get(nombre, (lista[0]['id'], lista[-1]['id']))
+            indice[nombre] = [min(minimo, lista[0]['id']), max(maximo_id, lista[-1]['id'])]
+        serializacion.escribir(os.path.join(directorio, _NOMBRE_INDICE), indice)
+        ruta = ruta_actividad(correo)
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(serializacion.a_linea(e) + '\n' for e in entradas[corte:])
+        os.replace(ruta + '.tmp', ruta)
+        _primeras[correo] = primera
+        return corte
+
+def _archivar_en_segundo_plano(correo: str):
+    try:
+        archivar_actividad(correo)
+    except OSError as e:
+        print(f"Error al archivar la actividad de {correo}: {e}")
+    finally:
+        _archivando.discard(correo)
+
+def archivos_archivados(correo: str) -> dict:
+    """{nombre: ruta} de los archivos del archivo de un usuario (segmentos e índice), para las copias de seguridad."""
+    directorio = _dir_archivo(correo)
+    try:
+        return {nombre: os.path.join(directorio, nombre) for nombre in os.listdir(directorio) if not nombre.endswith('.tmp')}
+    except FileNotFoundError:
+        return {}
+
+def reemplazar_archivados(correo: str, contenidos: dict):
+    """Sustituye el archivo de un usuario por {nombre: bytes} (al restaurar una copia de seguridad)."""
+    correo = correo.lower()
+    with _bloqueo(correo):
+        directorio = _dir_archivo(correo)
+        shutil.rmtree(directorio, ignore_errors=True)
+        if contenidos:
+            os.makedirs(directorio)
+            for nombre, contenido in contenidos.items():
+                with open(os.path.join(directorio, nombre), 'wb') as f:
+                    f.write(contenido)
+        _ultimos_ids.pop(correo, None)
+        _primeras.pop(correo, None)
+
+
+def registrar_actividad(correo: str, actividad: dict):
+    """Añade una actividad al final del log del usuario. El costo no depende del tamaño del historial."""
+    correo = correo.lower()
+    with _bloqueo(correo):
+        try:
+            _anexar(correo, [actividad])
+        except IOError as e:
+            print(f"Error al registrar actividad de {correo}: {e}")
+            return False
+    return True
+
+def obtener_actividad(correo: str, limite: int = 10, antes: int = None):
+    """
+    Devuelve una página del historial, de la más reciente a la más antigua: (actividades, cursor).
+    'antes' es el cursor devuelto por la página anterior (None para empezar por lo más reciente);
+    el cursor devuelto es None cuando no quedan más actividades.
+    Solo se leen del disco los bloques finales necesarios para llenar la página; al llegar al
+    principio del log se sigue por los segmentos archivados, abriendo solo los que hagan falta.
+    """
+    correo = correo.lower()
+    pagina = []
+    for entrada in _entradas_desde_el_final(correo, antes):
+        if len(pagina) == limite:
+            return pagina, pagina[-1]['id']
+        pagina.append(entrada)
+    return pagina, None
+
+def importar_historial(correo: str, historial: list):
+    """
+    Pasa un 'historial_actividad' heredado (lista con lo más reciente primero) al log del usuario.
+    Las actividades con fecha no posterior a la última ya registrada se omiten, de modo que
+    repetir la importación (p. ej. tras una interrupción) no duplica entradas.
+    """
+    correo = correo.lower()
+    with _bloqueo(correo):
+        ultima = _ultima_entrada(correo)
+        desde = ultima.get('fecha', '') if ultima else ''
+        nuevas = [a for a in reversed(historial) if a.get('fecha', '') > desde]
+        if nuevas:
+            _anexar(correo, nuevas)
+
+def reemplazar_log(correo: str, contenido: bytes):
+    """Sustituye el log completo de un usuario (al restaurar una copia de seguridad, ver data/respaldo.py)."""
+    correo = correo.lower()
+    with _bloqueo(correo):
+        _ultimos_ids.pop(correo, None)
+        _primeras.pop(correo, None)
+        os.makedirs(DIR_ACTIVIDAD, exist_ok=True)
+        ruta = ruta_actividad(correo)
+        with open(ruta + '.tmp', 'wb') as f:
+            f.write(contenido)
+        os.replace(ruta + '.tmp', ruta)
+
+def eliminar_actividad(correo: str):
+    """Borra el historial de un usuario (al eliminar su cuenta)."""
+    correo = correo.lower()
+    with _bloqueo(correo):
+        _ultimos_ids.pop(correo, None)
+        _primeras.pop(correo, None)
+        try:
+            os.remove(ruta_actividad(correo))
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(_dir_archivo(correo), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'archivar':
+        print("Uso: python -m data.gestion_actividad archivar [días] [máximo]")
+        sys.exit(1)
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else DIAS_RECIENTES
+    maximo = int(sys.argv[3]) if len(sys.argv) > 3 else MAXIMO_RECIENTES
+    total = 0
+    for nombre in os.listdir(DIR_ACTIVIDAD) if os.path.isdir(DIR_ACTIVIDAD) else []:
+        if nombre.endswith('.jsonl'):
+            total += archivar_actividad(unquote(nombre[:-len('.jsonl')]), dias, maximo)
+    print(f"{total} actividades archivadas en {DIR_ARCHIVO}.")
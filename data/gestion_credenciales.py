@@ -0,0 +1,136 @@
+# data/gestion_credenciales.py
+#
+# Tabla de credenciales separada de los perfiles: correo -> hash, sal, rol, perfil_completo.
+# El login solo consulta esta tabla; el perfil completo se carga después, si la contraseña es correcta.
+# Se guarda como log de solo anexado (data/credenciales.jsonl, una línea por alta, cambio o baja)
+# y se mantiene entera en memoria: cada consulta solo lee las líneas añadidas desde la anterior.
+# gestion_usuarios la sincroniza al escribir un registro; no hace falta llamarla desde los servicios.
+# Antes de escribir un registro que cambia sus credenciales se anexa (con fsync) una entrada 'pendiente':
+# si el proceso cae entre el registro y la entrada nueva, la pendiente hace que la próxima consulta
+# vuelva a copiarlas del registro en lugar de seguir aceptando la contraseña anterior.
+
+import os
+
+from data import serializacion
+from data.bloqueo_archivos import BloqueoArchivo
+
+RUTA_CREDENCIALES = os.path.join(os.path.dirname(__file__), 'credenciales.jsonl')
+
+# Campos del registro de usuario que se copian a la tabla
+CAMPOS_REGISTRO = ('contrasena_hash', 'contrasena_salt', 'rol', 'perfil_completo')
+# El log se reescribe cuando tiene más de este número de líneas obsoletas
+UMBRAL_COMPACTACION = 1000
+
+_bloqueo = BloqueoArchivo(RUTA_CREDENCIALES + '.lock')
+
+
+class _TablaCredenciales:
+    def __init__(self):
+        self.desplazamiento = 0  # bytes del archivo ya procesados
+        self.inodo = None
+        self.lineas = 0
+        self.por_correo = {}
+
+    def aplicar(self, entrada):
+        self.lineas += 1
+        correo = entrada.pop('email', None)
+        if entrada.pop('eliminado', False):
+            self.por_correo.pop(correo, None)
+        elif correo is not None:
+            self.por_correo[correo] = entrada
+
+
+_tabla = _TablaCredenciales()
+
+
+def _tabla_actualizada() -> _TablaCredenciales:
+    """Aplica las líneas completas añadidas desde la última lectura (también las de otros procesos)."""
+    global _tabla
+    try:
+        st = os.stat(RUTA_CREDENCIALES)
+    except FileNotFoundError:
+        return _tabla
+    if st.st_ino != _tabla.inodo or st.st_size < _tabla.desplazamiento:
+        _tabla = _TablaCredenciales()  # archivo nuevo o compactado: se reconstruye
+        _tabla.inodo = st.st_ino
+    if st.st_size == _tabla.desplazamiento:
+        return _tabla
+    with open(RUTA_CREDENCIALES, 'rb') as f:
+        f.seek(_tabla.desplazamiento)
+        nuevo = f.read(st.st_size - _tabla.desplazamiento)
+    completo = nuevo[:nuevo.rfind(b'\n') + 1]  # una línea a medio escribir se procesa en la próxima lectura
+    for linea in completo.splitlines():
+        try:
+            _tabla.aplicar(serializacion.de_linea(linea))
+        except ValueError:
+            continue
+    _tabla.desplazamiento += len(completo)
+    return _tabla
+
+def _anexar(entrada: dict, durable: bool = False):
+    with _bloqueo:
+        with open(RUTA_CREDENCIALES, 'a', encoding='utf-8') as f:
+            f.write(serializacion.a_linea(entrada) + '\n')
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        tabla = _tabla_actualizada()
+        if tabla.lineas - len(tabla.por_correo) > UMBRAL_COMPACTACION:
+            _compactar(tabla)
+
+def _compactar(tabla):
+    ruta_tmp = RUTA_CREDENCIALES + '.tmp'
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        f.writelines(serializacion.a_linea({'email': correo, **credenciales}) + '\n'
+                     for correo, credenciales in tabla.por_correo.items())
+    os.replace(ruta_tmp, RUTA_CREDENCIALES)
+    _tabla_actualizada()
+
+
+def obtener(correo: str):
+    """
+    Retorna {'hash', 'salt', 'rol', 'perfil_completo'} o None si el correo no está en la tabla
+    o su entrada quedó pendiente (hay que copiarla otra vez del registro).
+    """
+    with _bloqueo.hilo:
+        credenciales = _tabla_actualizada().por_correo.get(correo.lower())
+        if credenciales is None or credenciales.get('pendiente'):
+            return None
+        return dict(credenciales)
+
+def guardar(correo: str, hash_contrasena: str, salt, rol: str, perfil_completo: bool):
+    """Crea o reemplaza las credenciales de un correo. No escribe nada si no cambiaron."""
+    credenciales = {'hash': hash_contrasena, 'salt': salt, 'rol': rol, 'perfil_completo': bool(perfil_completo)}
+    correo = correo.lower()
+    with _bloqueo:
+        if _tabla_actualizada().por_correo.get(correo) != credenciales:
+            _anexar({'email': correo, **credenciales})
+
+def _desde_registro(datos: dict) -> dict:
+    return {'hash': datos.get('contrasena_hash'), 'salt': datos.get('contrasena_salt'), 'rol': datos.get('rol'),
+            'perfil_completo': bool(datos.get('perfil_completo', False))}
+
+def guardar_desde_registro(correo: str, datos: dict):
+    """Sincroniza la tabla con el registro completo de un usuario."""
+    guardar(correo, datos.get('contrasena_hash'), datos.get('contrasena_salt'), datos.get('rol'),
+            datos.get('perfil_completo', False))
+
+def marcar_pendiente(correo: str):
+    """
+    Llamar antes de escribir un registro cuyas credenciales cambian: deja la entrada pendiente, en disco,
+    hasta que guardar / guardar_desde_registro escriba la nueva.
+    """
+    _anexar({'email': correo.lower(), 'pendiente': True}, durable=True)
+
+def preparar_desde_registro(correo: str, datos: dict):
+    """Como marcar_pendiente, pero solo si las credenciales de 'datos' difieren de las de la tabla."""
+    correo = correo.lower()
+    with _bloqueo:
+        if _tabla_actualizada().por_correo.get(correo) != _desde_registro(datos):
+            marcar_pendiente(correo)
+
+def eliminar(correo: str):
+    correo = correo.lower()
+    with _bloqueo:
+        if correo in _tabla_actualizada().por_correo:
+            _anexar({'email': correo, 'eliminado': True})
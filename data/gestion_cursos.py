@@ -1,41 +1,131 @@
-import json
 import os
+from data import eventos
+from data import serializacion
+from data.bloqueo_archivos import BloqueoArchivo
+from data.indices import IndiceCursos, copia
 
 RUTA_CURSOS = os.path.join(os.path.dirname(__file__), 'cursos.json')
 
-def cargar_cursos():
-    """Carga todos los cursos desde el archivo JSON."""
+# Las escrituras toman también el bloqueo de archivo (otros procesos) y releen cursos.json si cambió,
+# así que cada una se aplica sobre la última versión del archivo; las lecturas solo excluyen hilos.
+_bloqueo = BloqueoArchivo(os.path.join(os.path.dirname(__file__), 'cursos.lock'))
+
+_indice = IndiceCursos()
+
+
+def firma_cursos():
+    """(inode, mtime, tamaño) de cursos.json, o None si no existe."""
+    try:
+        st = os.stat(RUTA_CURSOS)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _leer_archivo():
     if not os.path.exists(RUTA_CURSOS):
-        with open(RUTA_CURSOS, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=4, ensure_ascii=False)
+        serializacion.escribir(RUTA_CURSOS, [])
         return []
     try:
-        with open(RUTA_CURSOS, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+        return serializacion.leer(RUTA_CURSOS)
+    except (ValueError, FileNotFoundError):
         return []
 
+def _indice_actualizado():
+    """Devuelve el índice, recargando cursos.json solo si cambió desde la última lectura."""
+    firma = firma_cursos()
+    if firma is None or firma != _indice.firma:
+        cursos = _leer_archivo()
+        _indice.reconstruir(cursos, firma_cursos())
+    return _indice
+
+def _escribir_indice():
+    serializacion.escribir(RUTA_CURSOS, list(_indice.por_id.values()))
+    _indice.firma = firma_cursos()
+
+
+def cargar_cursos():
+    """Carga todos los cursos desde el archivo JSON."""
+    with _bloqueo.hilo:
+        return [copia(c) for c in _indice_actualizado().por_id.values()]
+
 def guardar_cursos(cursos):
     """Guarda la lista completa de cursos en el archivo JSON."""
-    with open(RUTA_CURSOS, 'w', encoding='utf-8') as f:
-        json.dump(cursos, f, indent=4, ensure_ascii=False)
+    with _bloqueo:
+        eliminados = _indice_actualizado().por_id.keys() - {c['id_curso'] for c in cursos}
+        _indice.reconstruir([copia(c) for c in cursos], None)
+        _escribir_indice()
+    for id_curso in eliminados:
+        eventos.publicar(eventos.CursoEliminado(id_curso))
+    for curso in cursos:
+        eventos.publicar(eventos.CursoActualizado(curso['id_curso']))
 
 def actualizar_curso(curso_dict):
     """Actualiza (o agrega) un curso en el archivo JSON."""
-    cursos = cargar_cursos()
-    idx = next((i for i, c in enumerate(cursos) if c['id_curso'] == curso_dict['id_curso']), None)
-    if idx is not None:
-        cursos[idx] = curso_dict
-    else:
-        cursos.append(curso_dict)
-    guardar_cursos(cursos)
+    with _bloqueo:
+        _indice_actualizado().poner(copia(curso_dict))
+        _escribir_indice()
+    eventos.publicar(eventos.CursoActualizado(curso_dict['id_curso']))
+
+def modificar_curso(id_curso, funcion):
+    """
+    Lectura-modificación-escritura atómica de un curso: funcion(curso_dict) recibe una copia del curso
+    actual y puede modificarla in situ o retornar el dict nuevo. Retorna el curso guardado, None si no existe.
+    """
+    with _bloqueo:
+        indice = _indice_actualizado()
+        curso = indice.por_id.get(id_curso)
+        if curso is None:
+            return None
+        curso = copia(curso)
+        resultado = funcion(curso)
+        if resultado is not None:
+            curso = resultado
+        indice.poner(curso)
+        _escribir_indice()
+    eventos.publicar(eventos.CursoActualizado(id_curso))
+    return copia(curso)
+
+def agregar_miembro(id_curso, email, rol):
+    """Agrega un miembro a un curso y lo persiste. Retorna False si el curso no existe."""
+    with _bloqueo:
+        indice = _indice_actualizado()
+        curso = indice.por_id.get(id_curso)
+        if curso is None:
+            return False
+        if not any(m['email'] == email for m in curso.get('miembros', [])):
+            curso.setdefault('miembros', []).append({'email': email, 'rol': rol})
+            indice.por_miembro.setdefault(email, {})[id_curso] = None
+            _escribir_indice()
+            eventos.publicar(eventos.CursoActualizado(id_curso))
+        return True
+
+def quitar_miembro(id_curso, email):
+    """Quita un miembro de un curso y lo persiste. Retorna False si el curso no existe."""
+    with _bloqueo:
+        indice = _indice_actualizado()
+        curso = indice.por_id.get(id_curso)
+        if curso is None:
+            return False
+        miembros = curso.get('miembros', [])
+        restantes = [m for m in miembros if m['email'] != email]
+        if len(restantes) != len(miembros):
+            curso['miembros'] = restantes
+            ids = indice.por_miembro.get(email, {})
+            ids.pop(id_curso, None)
+            if not ids:
+                indice.por_miembro.pop(email, None)
+            _escribir_indice()
+            eventos.publicar(eventos.CursoActualizado(id_curso))
+        return True
 
 def obtener_curso_por_id(id_curso):
     """Devuelve el dict del curso por su ID, o None si no existe."""
-    cursos = cargar_cursos()
-    return next((c for c in cursos if c['id_curso'] == id_curso), None)
+    with _bloqueo.hilo:
+        curso = _indice_actualizado().por_id.get(id_curso)
+        return copia(curso) if curso is not None else None
 
 def obtener_cursos_de_usuario(email):
-    """Devuelve una lista de cursos (dict) donde el usuario es miembro."""
-    cursos = cargar_cursos()
-    return [c for c in cursos if any(m['email'] == email for m in c.get('miembros', []))]
+    """Devuelve una lista de cursos (dict) donde el usuario es miembro. O(k) en sus membresías."""
+    with _bloqueo.hilo:
+        indice = _indice_actualizado()
+        return [copia(indice.por_id[id_curso]) for id_curso in indice.por_miembro.get(email, {})]
@@ -0,0 +1,139 @@
+# data/gestion_reportes.py
+#
+# Reportes de corrección de la IA en un log de solo anexado: data/correcciones.jsonl.
+# Cada línea es un evento: {'evento': 'reporte', ...reporte completo} al crearlo, o
+# {'evento': 'estado', 'id_reporte', 'estado', 'fecha'} al cambiar su estado. Crear un reporte
+# o revisarlo escribe una línea, sin releer ni reescribir los demás.
+# Los índices en memoria (por estado, por profesor y por hash de la pregunta) se construyen
+# una vez y luego solo se leen las líneas nuevas, también las escritas por otros procesos.
+
+import os
+import shutil
+
+from data import eventos
+from data import serializacion
+from data.bloqueo_archivos import BloqueoArchivo
+# hash_pregunta y los EVENTO_* se reexportan: forman parte de la interfaz de este módulo.
+from data.indices import (EVENTO_ESTADO, EVENTO_REPORTE, IndiceReportes, copia, hash_pregunta, pagina_reportes,
+                          posiciones_reportes)
+
+RUTA_REPORTES = os.path.join(os.path.dirname(__file__), 'correcciones.jsonl')
+# Formato anterior: una lista JSON reescrita entera en cada cambio. Se migra la primera vez; se deja en su
+# sitio (está versionado) y la copia correcciones.json.migrado marca que ya se migró. Si no se puede leer
+# se aparta a correcciones.json.invalido para no reintentarlo en cada lectura.
+RUTA_CORRECCIONES = os.path.join(os.path.dirname(__file__), 'correcciones.json')
+
+_bloqueo = BloqueoArchivo(RUTA_REPORTES + '.lock')
+
+
+_indice = IndiceReportes()
+
+
+def _migracion_pendiente() -> bool:
+    return (os.path.exists(RUTA_CORRECCIONES) and not os.path.exists(RUTA_CORRECCIONES + '.migrado')
+            and not os.path.exists(RUTA_CORRECCIONES + '.invalido'))
+
+def _migrar_json_heredado():
+    """
+    Pasa correcciones.json (más reciente primero) al log y deja la copia correcciones.json.migrado.
+    El log nuevo se escribe aparte y se cambia de una vez; los reportes que ya estén en el log no se
+    repiten, así que una caída antes de dejar la copia solo hace que la migración se repita sin efecto.
+    Llamar con _bloqueo.
+    """
+    try:
+        reportes = serializacion.leer(RUTA_CORRECCIONES)
+        if not isinstance(reportes, list):
+            raise ValueError("se esperaba una lista de reportes")
+    except ValueError as e:
+        print(f"Error al migrar correcciones.json, se aparta como correcciones.json.invalido: {e}")
+        os.replace(RUTA_CORRECCIONES, RUTA_CORRECCIONES + '.invalido')
+        return
+    existente = b''
+    if os.path.exists(RUTA_REPORTES):
+        with open(RUTA_REPORTES, 'rb') as f:
+            existente = f.read()
+    ya_migrados = set()
+    for linea in existente.splitlines():
+        try:
+            ya_migrados.add(serializacion.de_linea(linea).get('id_reporte'))
+        except ValueError:
+            continue
+    ruta_tmp = RUTA_REPORTES + '.tmp'
+    with open(ruta_tmp, 'wb') as f:
+        f.write(existente)
+        for reporte in reversed(reportes):
+            if reporte.get('id_reporte') not in ya_migrados:
+                f.write((serializacion.a_linea({'evento': EVENTO_REPORTE, **reporte}) + '\n').encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_tmp, RUTA_REPORTES)
+    shutil.copyfile(RUTA_CORRECCIONES, RUTA_CORRECCIONES + '.migrado')
+
+def _indice_actualizado() -> IndiceReportes:
+    """Aplica al índice las líneas completas añadidas desde la última lectura. Llamar con _bloqueo.hilo."""
+    global _indice
+    if _migracion_pendiente():
+        with _bloqueo:
+            if _migracion_pendiente():
+                _migrar_json_heredado()
+    try:
+        st = os.stat(RUTA_REPORTES)
+    except FileNotFoundError:
+        return _indice
+    if st.st_ino != _indice.inodo or st.st_size < _indice.desplazamiento:
+        _indice = IndiceReportes()  # archivo nuevo, reemplazado o truncado: se reconstruye
+        _indice.inodo = st.st_ino
+    tamano = st.st_size
+    if tamano == _indice.desplazamiento:
+        return _indice
+    with open(RUTA_REPORTES, 'rb') as f:
+        f.seek(_indice.desplazamiento)
+        nuevo = f.read(tamano - _indice.desplazamiento)
+    completo = nuevo[:nuevo.rfind(b'\n') + 1]  # una línea a medio escribir se procesa en la próxima lectura
+    for linea in completo.splitlines():
+        if not linea.strip():
+            continue
+        try:
+            _indice.aplicar(serializacion.de_linea(linea))
+        except ValueError:
+            continue
+    _indice.desplazamiento += len(completo)
+    return _indice
+
+def _anexar(evento: dict):
+    linea = serializacion.a_linea(evento) + '\n'
+    with _bloqueo:
+        with open(RUTA_REPORTES, 'a', encoding='utf-8') as f:
+            f.write(linea)
+        _indice_actualizado()
+
+
+def agregar_reporte(reporte: dict):
+    """Añade un reporte nuevo al final del log."""
+    _anexar({'evento': EVENTO_REPORTE, **reporte})
+    eventos.publicar(eventos.ReporteAgregado(reporte.get('id_reporte'), reporte.get('email_profesor')))
+
+def cambiar_estado(id_reporte: str, estado: str, fecha: str = None) -> bool:
+    """Registra un cambio de estado. Retorna False si el reporte no existe."""
+    with _bloqueo:
+        if id_reporte not in _indice_actualizado().posiciones:
+            return False
+        _anexar({'evento': EVENTO_ESTADO, 'id_reporte': id_reporte, 'estado': estado, 'fecha': fecha})
+    eventos.publicar(eventos.EstadoReporteCambiado(id_reporte, estado))
+    return True
+
+def obtener_reportes(estado: str = None, email_profesor: str = None, pregunta: str = None,
+                     limite: int = None, desplazamiento: int = 0):
+    """Reportes que cumplen los filtros, más reciente primero, desde 'desplazamiento' y hasta 'limite'."""
+    with _bloqueo.hilo:
+        return pagina_reportes(_indice_actualizado(), estado, email_profesor, pregunta, limite, desplazamiento)
+
+def contar_reportes(estado: str = None, email_profesor: str = None, pregunta: str = None) -> int:
+    with _bloqueo.hilo:
+        return len(posiciones_reportes(_indice_actualizado(), estado, email_profesor, pregunta))
+
+def obtener_reporte(id_reporte: str):
+    with _bloqueo.hilo:
+        indice = _indice_actualizado()
+        posicion = indice.posiciones.get(id_reporte)
+        return copia(indice.reportes[posicion]) if posicion is not None else None
@@ -0,0 +1,426 @@
+# data/gestion_sqlite.py
+#
+# Motor de almacenamiento opcional sobre SQLite. Expone las mismas funciones que
+# gestion_usuarios y gestion_cursos, así que se puede pasar como user_dao_module /
+# course_dao_module a los servicios. Se activa con BRAINCOURSE_STORAGE=sqlite (ver main.py).
+# Publica los mismos eventos de cambio (data/eventos.py), cuando la escritura ya está confirmada.
+#
+# Migración única desde los archivos JSON:
+#     python -m data.gestion_sqlite migrar
+
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from data import esquema_usuarios, eventos
+from data.gestion_usuarios import hashear_contrasena, aplicar_cambios
+from data.serializacion import a_linea as _serializar, de_linea as _deserializar
+
+RUTA_DB = os.path.join(os.path.dirname(__file__), 'braincourse.db')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    email TEXT PRIMARY KEY,
+    rol   TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usuarios_rol ON usuarios(rol);
+
+CREATE TABLE IF NOT EXISTS cursos (
+    id_curso      TEXT PRIMARY KEY,
+    creador_email TEXT,
+    datos         TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS curso_miembros (
+    id_curso TEXT NOT NULL REFERENCES cursos(id_curso) ON DELETE CASCADE,
+    email    TEXT NOT NULL,
+    rol      TEXT,
+    PRIMARY KEY (id_curso, email)
+);
+CREATE INDEX IF NOT EXISTS idx_curso_miembros_email ON curso_miembros(email);
+
+CREATE TABLE IF NOT EXISTS actividad (
+    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    fecha TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_actividad_email ON actividad(email, id);
+
+CREATE TABLE IF NOT EXISTS credenciales (
+    email           TEXT PRIMARY KEY,
+    hash            TEXT,
+    salt            TEXT,
+    rol             TEXT,
+    perfil_completo INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_local = threading.local()
+
+
+def _conexion():
+    """Devuelve la conexión del hilo actual (una por hilo), creándola en modo WAL si hace falta."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'ruta', None) != RUTA_DB:
+        conn = sqlite3.connect(RUTA_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_ESQUEMA)
+        _local.conn = conn
+        _local.ruta = RUTA_DB
+    return conn
+
+@contextmanager
+def _transaccion_escritura():
+    """
+    Transacción que toma el bloqueo de escritura antes de leer (BEGIN IMMEDIATE), para que un
+    SELECT + UPDATE no pierda cambios de otra conexión hecha entre ambos.
+    Los eventos anotados con _publicar se publican tras confirmarla; si se deshace, se descartan.
+    """
+    conn = _conexion()
+    if getattr(_local, 'en_transaccion', False):
+        yield conn  # dentro de transaccion(): se confirma al salir de la exterior
+        return
+    pendientes = []
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _local.en_transaccion = True
+        _local.eventos = pendientes
+        try:
+            yield conn
+        finally:
+            _local.en_transaccion = False
+            _local.eventos = None
+    for evento in pendientes:
+        eventos.publicar(evento)
+
+def _publicar(evento):
+    """Anota un evento para publicarlo cuando se confirme la transacción abierta del hilo."""
+    pendientes = getattr(_local, 'eventos', None)
+    if pendientes is None:
+        eventos.publicar(evento)
+    else:
+        pendientes.append(evento)
+
+def _campos_cambiados(anterior: dict, datos: dict):
+    """Campos distintos entre dos versiones de un registro, para UsuarioActualizado (None si no había registro)."""
+    if anterior is None:
+        return None
+    return frozenset(c for c in anterior.keys() | datos.keys() if anterior.get(c) != datos.get(c))
+
+@contextmanager
+def transaccion():
+    """
+    Como gestion_usuarios.transaccion: las escrituras hechas en este hilo dentro del bloque
+    se confirman juntas en una sola transacción de SQLite, o ninguna si el bloque lanza.
+    Todas las funciones que escriben pasan por _transaccion_escritura, así que se unen a ella.
+    """
+    with _transaccion_escritura():
+        yield
+
+# --- Actividad ---
+
+def _insertar_actividades(conn, correo, actividades):
+    conn.executemany(
+        "INSERT INTO actividad (email, fecha, datos) VALUES (?, ?, ?)",
+        [(correo, a.get('fecha'), _serializar(a)) for a in actividades]
+    )
+
+def _extraer_historial(conn, correo, datos):
+    """Pasa un 'historial_actividad' heredado del registro a la tabla de actividad (sin duplicar). Retorna True si estaba."""
+    if 'historial_actividad' not in datos:
+        return False
+    historial = datos.pop('historial_actividad') or []
+    fila = conn.execute("SELECT MAX(fecha) FROM actividad WHERE email = ?", (correo,)).fetchone()
+    desde = fila[0] or ''
+    _insertar_actividades(conn, correo, [a for a in reversed(historial) if a.get('fecha', '') > desde])
+    return True
+
+def registrar_actividad(correo: str, actividad: dict):
+    """Añade una actividad al historial del usuario."""
+    with _transaccion_escritura() as conn:
+        _insertar_actividades(conn, correo.lower(), [actividad])
+    return True
+
+def obtener_actividad(correo: str, limite: int = 10, antes: int = None):
+    """Página del historial (más reciente primero): (actividades, cursor). Ver gestion_actividad.obtener_actividad."""
+    filas = _conexion().execute(
+        "SELECT id, datos FROM actividad WHERE email = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (correo.lower(), antes if antes is not None else sys.maxsize, limite + 1)
+    ).fetchall()
+    pagina = [{**_deserializar(datos), 'id': id_actividad} for id_actividad, datos in filas[:limite]]
+    return pagina, (pagina[-1]['id'] if len(filas) > limite else None)
+
+
+# --- Credenciales ---
+
+def _guardar_credenciales(conn, correo, datos):
+    """Copia a la tabla de credenciales los campos del registro que necesita el login."""
+    conn.execute(
+        "INSERT OR REPLACE INTO credenciales (email, hash, salt, rol, perfil_completo) VALUES (?, ?, ?, ?, ?)",
+        (correo, datos.get('contrasena_hash'), datos.get('contrasena_salt'), datos.get('rol'), int(bool(datos.get('perfil_completo'))))
+    )
+
+def obtener_credenciales(correo: str):
+    """Credenciales del usuario sin cargar su perfil (ver gestion_usuarios.obtener_credenciales)."""
+    correo = correo.lower()
+    conn = _conexion()
+    consulta = "SELECT hash, salt, rol, perfil_completo FROM credenciales WHERE email = ?"
+    fila = conn.execute(consulta, (correo,)).fetchone()
+    if fila is None:
+        # Usuarios anteriores a la tabla: se añaden en su primera consulta
+        registro = conn.execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+        if registro is None:
+            return None
+        with _transaccion_escritura():
+            _guardar_credenciales(conn, correo, _deserializar(registro[0]))
+        fila = conn.execute(consulta, (correo,)).fetchone()
+    return {'hash': fila[0], 'salt': fila[1], 'rol': fila[2], 'perfil_completo': bool(fila[3])}
+
+
+# --- Usuarios ---
+
+def cargar_usuario(correo: str):
+    """Carga el registro de un único usuario. Retorna el diccionario o None si no existe."""
+    correo = correo.lower()
+    fila = _conexion().execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+    if fila is None:
+        return None
+    datos = _deserializar(fila[0])
+    migrado = esquema_usuarios.migrar(datos)
+    if 'historial_actividad' in datos or migrado:
+        guardar_usuario(correo, datos)  # mueve el historial heredado a la tabla de actividad y guarda la migración
+        datos.pop('historial_actividad', None)
+    return datos
+
+def cargar_usuario_serializado(correo: str):
+    """Registro con cada campo serializado con pickle, para LazyUser. Retorna None si no existe."""
+    datos = cargar_usuario(correo)
+    if datos is None:
+        return None
+    return {campo: pickle.dumps(valor, pickle.HIGHEST_PROTOCOL) for campo, valor in datos.items()}
+
+def guardar_usuario(correo: str, datos: dict):
+    """Guarda (crea o reemplaza) el registro de un único usuario."""
+    correo = correo.lower()
+    datos = dict(datos)
+    with _transaccion_escritura() as conn:
+        fila = conn.execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+        _extraer_historial(conn, correo, datos)
+        _guardar_credenciales(conn, correo, datos)
+        conn.execute(
+            "INSERT OR REPLACE INTO usuarios (email, rol, datos) VALUES (?, ?, ?)",
+            (correo, datos.get('rol'), _serializar(datos))
+        )
+        cambiados = _campos_cambiados(_deserializar(fila[0]) if fila else None, datos)
+        if cambiados is None or cambiados:
+            _publicar(eventos.UsuarioActualizado(correo, cambiados))
+
+def eliminar_usuario(correo: str):
+    """Elimina el registro de un usuario y su historial. Retorna True si existía."""
+    with _transaccion_escritura() as conn:
+        cursor = conn.execute("DELETE FROM usuarios WHERE email = ?", (correo.lower(),))
+        conn.execute("DELETE FROM actividad WHERE email = ?", (correo.lower(),))
+        conn.execute("DELETE FROM credenciales WHERE email = ?", (correo.lower(),))
+        if cursor.rowcount > 0:
+            _publicar(eventos.UsuarioEliminado(correo.lower()))
+    return cursor.rowcount > 0
+
+def cargar_usuarios(rol: str = None):
+    """Carga todos los usuarios (o solo los de un rol) en un diccionario correo -> datos."""
+    if rol is None:
+        filas = _conexion().execute("SELECT email, datos FROM usuarios").fetchall()
+    else:
+        filas = _conexion().execute("SELECT email, datos FROM usuarios WHERE rol = ?", (rol,)).fetchall()
+    usuarios = {}
+    for email, datos in filas:
+        usuarios[email] = datos = _deserializar(datos)
+        esquema_usuarios.migrar(datos)  # solo en memoria: cada registro se guarda migrado al cargarlo solo
+    return usuarios
+
+def guardar_usuarios(usuarios):
+    """Reemplaza el contenido completo de la tabla de usuarios."""
+    with _transaccion_escritura() as conn:
+        eliminados = {email for (email,) in conn.execute("SELECT email FROM usuarios")} - {c.lower() for c in usuarios}
+        conn.execute("DELETE FROM usuarios")
+        conn.execute("DELETE FROM credenciales")
+        for correo, datos in usuarios.items():
+            datos = dict(datos)
+            _extraer_historial(conn, correo.lower(), datos)
+            _guardar_credenciales(conn, correo.lower(), datos)
+            conn.execute(
+                "INSERT INTO usuarios (email, rol, datos) VALUES (?, ?, ?)",
+                (correo.lower(), datos.get('rol'), _serializar(datos))
+            )
+            _publicar(eventos.UsuarioActualizado(correo.lower()))
+        for correo in eliminados:
+            _publicar(eventos.UsuarioEliminado(correo))
+
+def actualizar_datos_usuario(correo: str, datos_a_actualizar: dict):
+    """Actualiza los datos de un usuario específico dentro de una transacción."""
+    correo = correo.lower()
+    with _transaccion_escritura() as conn:
+        fila = conn.execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+        if fila is None:
+            return False
+        datos = _deserializar(fila[0])
+        datos.update(datos_a_actualizar)
+        _extraer_historial(conn, correo, datos)
+        _guardar_credenciales(conn, correo, datos)
+        conn.execute(
+            "UPDATE usuarios SET rol = ?, datos = ? WHERE email = ?",
+            (datos.get('rol'), _serializar(datos), correo)
+        )
+        if datos_a_actualizar:
+            _publicar(eventos.UsuarioActualizado(correo, frozenset(datos_a_actualizar)))
+    return True
+
+def modificar_usuario(correo: str, funcion, reintentos: int = None):
+    """
+    Como gestion_usuarios.modificar_usuario. Aquí la transacción inmediata ya excluye a los demás
+    escritores, así que no hay conflictos que reintentar ('reintentos' se acepta por compatibilidad).
+    """
+    correo = correo.lower()
+    with _transaccion_escritura() as conn:
+        fila = conn.execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+        if fila is None:
+            return None
+        datos = _deserializar(fila[0])
+        resultado = funcion(datos)
+        if resultado is not None:
+            datos = resultado
+        _extraer_historial(conn, correo, datos)
+        _guardar_credenciales(conn, correo, datos)
+        conn.execute(
+            "UPDATE usuarios SET rol = ?, datos = ? WHERE email = ?",
+            (datos.get('rol'), _serializar(datos), correo)
+        )
+        cambiados = _campos_cambiados(_deserializar(fila[0]), datos)
+        if cambiados:
+            _publicar(eventos.UsuarioActualizado(correo, cambiados))
+    return datos
+
+def registrar_cambios(correo: str, cambios: list):
+    """Aplica cambios pequeños (ver gestion_usuarios.aplicar_cambios) dentro de una transacción."""
+    correo = correo.lower()
+    with _transaccion_escritura() as conn:
+        fila = conn.execute("SELECT datos FROM usuarios WHERE email = ?", (correo,)).fetchone()
+        if fila is None:
+            return False
+        datos = aplicar_cambios(_deserializar(fila[0]), cambios)
+        _extraer_historial(conn, correo, datos)
+        _guardar_credenciales(conn, correo, datos)
+        conn.execute("UPDATE usuarios SET datos = ? WHERE email = ?", (_serializar(datos), correo))
+        if cambios:
+            _publicar(eventos.UsuarioActualizado(correo, frozenset(cambio['ruta'][0] for cambio in cambios)))
+    return True
+
+
+# --- Cursos ---
+
+def _escribir_curso(conn, curso_dict):
+    conn.execute(
+        "INSERT OR REPLACE INTO cursos (id_curso, creador_email, datos) VALUES (?, ?, ?)",
+        (curso_dict['id_curso'], curso_dict.get('creador_email'), _serializar(curso_dict))
+    )
+    conn.execute("DELETE FROM curso_miembros WHERE id_curso = ?", (curso_dict['id_curso'],))
+    conn.executemany(
+        "INSERT OR IGNORE INTO curso_miembros (id_curso, email, rol) VALUES (?, ?, ?)",
+        [(curso_dict['id_curso'], m['email'], m.get('rol')) for m in curso_dict.get('miembros', [])]
+    )
+
+def cargar_cursos():
+    """Carga todos los cursos."""
+    return [_deserializar(datos) for (datos,) in _conexion().execute("SELECT datos FROM cursos").fetchall()]
+
+def guardar_cursos(cursos):
+    """Reemplaza la lista completa de cursos."""
+    with _transaccion_escritura() as conn:
+        eliminados = {id_curso for (id_curso,) in conn.execute("SELECT id_curso FROM cursos")} - {c['id_curso'] for c in cursos}
+        conn.execute("DELETE FROM cursos")
+        for curso in cursos:
+            _escribir_curso(conn, curso)
+            _publicar(eventos.CursoActualizado(curso['id_curso']))
+        for id_curso in eliminados:
+            _publicar(eventos.CursoEliminado(id_curso))
+
+def actualizar_curso(curso_dict):
+    """Actualiza (o agrega) un curso."""
+    with _transaccion_escritura() as conn:
+        _escribir_curso(conn, curso_dict)
+        _publicar(eventos.CursoActualizado(curso_dict['id_curso']))
+
+def modificar_curso(id_curso, funcion):
+    """Lectura-modificación-escritura atómica de un curso (ver gestion_cursos.modificar_curso)."""
+    with _transaccion_escritura() as conn:
+        fila = conn.execute("SELECT datos FROM cursos WHERE id_curso = ?", (id_curso,)).fetchone()
+        if fila is None:
+            return None
+        curso = _deserializar(fila[0])
+        resultado = funcion(curso)
+        if resultado is not None:
+            curso = resultado
+        _escribir_curso(conn, curso)
+        _publicar(eventos.CursoActualizado(id_curso))
+    return curso
+
+def _modificar_miembros(id_curso, modificar):
+    def _aplicar(curso):
+        curso['miembros'] = modificar(curso.get('miembros', []))
+    return modificar_curso(id_curso, _aplicar) is not None
+
+def agregar_miembro(id_curso, email, rol):
+    """Agrega un miembro a un curso. Retorna False si el curso no existe."""
+    return _modificar_miembros(id_curso, lambda miembros: miembros if any(m['email'] == email for m in miembros)
+                               else miembros + [{'email': email, 'rol': rol}])
+
+def quitar_miembro(id_curso, email):
+    """Quita un miembro de un curso. Retorna False si el curso no existe."""
+    return _modificar_miembros(id_curso, lambda miembros: [m for m in miembros if m['email'] != email])
+
+def obtener_curso_por_id(id_curso):
+    """Devuelve el dict del curso por su ID, o None si no existe."""
+    fila = _conexion().execute("SELECT datos FROM cursos WHERE id_curso = ?", (id_curso,)).fetchone()
+    return _deserializar(fila[0]) if fila else None
+
+def obtener_cursos_de_usuario(email):
+    """Devuelve una lista de cursos (dict) donde el usuario es miembro."""
+    filas = _conexion().execute(
+        "SELECT c.datos FROM curso_miembros m JOIN cursos c ON c.id_curso = m.id_curso WHERE m.email = ?",
+        (email,)
+    ).fetchall()
+    return [_deserializar(datos) for (datos,) in filas]
+
+
+# --- Migración ---
+
+def migrar_desde_json():
+    """Copia usuarios, historiales de actividad y cursos de los archivos JSON a la base de datos. Retorna (n_usuarios, n_cursos)."""
+    from data import gestion_usuarios, gestion_cursos, gestion_actividad
+    usuarios = gestion_usuarios.cargar_usuarios()
+    cursos = gestion_cursos.cargar_cursos()
+    guardar_usuarios(usuarios)
+    guardar_cursos(cursos)
+    with _transaccion_escritura() as conn:
+        conn.execute("DELETE FROM actividad")
+        for correo in usuarios:
+            historial, cursor = gestion_actividad.obtener_actividad(correo, limite=500)
+            while cursor is not None:
+                pagina, cursor = gestion_actividad.obtener_actividad(correo, limite=500, antes=cursor)
+                historial.extend(pagina)
+            _insertar_actividades(conn, correo.lower(), [{k: v for k, v in a.items() if k != 'id'} for a in reversed(historial)])
+    return len(usuarios), len(cursos)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrar':
+        n_usuarios, n_cursos = migrar_desde_json()
+        print(f"Migrados {n_usuarios} usuarios y {n_cursos} cursos a {RUTA_DB}.")
+    else:
+        print("Uso: python -m data.gestion_sqlite migrar")
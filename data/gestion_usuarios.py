@@ -1,53 +1,638 @@
 # data/gestion_usuarios.py
 
-import json
 import os
-import hashlib
+import pickle
+import random
+import shutil
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from urllib.parse import quote, unquote
 
+from data import serializacion
+from data import contrasenas
+from data import esquema_usuarios
+from data import eventos
+from data import gestion_credenciales
+from data.bloqueo_archivos import BloqueoArchivo
+from data.indices import serializar_campos
+# registrar_actividad y obtener_actividad se reexportan: los servicios las usan a través del DAO de usuarios.
+from data.gestion_actividad import registrar_actividad, obtener_actividad, importar_historial, eliminar_actividad
+
+# Archivo monolítico heredado. Solo se lee una vez para migrarlo al formato por usuario; se deja
+# en su sitio (está versionado) y la copia usuarios.json.migrado marca que ya se migró.
 RUTA_USUARIOS = os.path.join(os.path.dirname(__file__), 'usuarios.json')
+# Directorio con un archivo JSON por usuario (<correo>.json), su log de cambios (<correo>.log)
+# y el archivo de bloqueo entre procesos (<correo>.lock).
+DIR_USUARIOS = os.path.join(os.path.dirname(__file__), 'usuarios')
+
+# Número de cambios acumulados en el log a partir del cual se compacta en segundo plano.
+UMBRAL_COMPACTACION = 50
+# Intentos optimistas de modificar_usuario antes de hacer el último con el registro bloqueado.
+REINTENTOS_CONFLICTO = 5
+
+_EXTENSION = '.json'
+_EXTENSION_LOG = '.log'
+_EXTENSION_LOCK = '.lock'
+_NOMBRE_DIARIO = '_transaccion.diario'
+
+# Versión de cada registro: '_secuencia' crece con cada escritura, sea del registro completo o del log.
+CAMPO_VERSION = '_secuencia'
+
+_bloqueo_migracion = BloqueoArchivo(RUTA_USUARIOS + _EXTENSION_LOCK)
+_bloqueo_transacciones = BloqueoArchivo(os.path.join(os.path.dirname(__file__), 'transacciones' + _EXTENSION_LOCK))
+_lock_bloqueos = threading.Lock()
+_bloqueos = {}    # correo -> BloqueoArchivo (hilos de este proceso + otros procesos)
+_secuencias = {}  # correo -> (firma de los archivos, versión) de la última lectura o escritura
+_pendientes = {}  # correo -> cambios escritos desde la última compactación
+_transaccion_local = threading.local()  # .cambios: correo -> [funcion(datos)] anotadas en la transacción abierta del hilo
+_diario_revisado = False
+
+
+class ConflictoDeVersion(Exception):
+    """El registro cambió entre la lectura y la escritura (ver guardar_usuario / modificar_usuario)."""
+
+
+def _en_transaccion() -> bool:
+    return getattr(_transaccion_local, 'cambios', None) is not None
+
+def _exigir_fuera_de_transaccion(operacion: str):
+    """
+    El diario de transaccion() solo guarda campos a asignar; las escrituras que no se pueden anotar así
+    lanzan RuntimeError dentro del bloque en lugar de escribirse fuera de la transacción.
+    """
+    if _en_transaccion():
+        raise RuntimeError(f"{operacion} no se puede usar dentro de transaccion(); usar modificar_usuario.")
+
+def _anotar(correo: str, funcion) -> bool:
+    """Anota funcion(datos) para aplicarla al confirmar la transacción abierta. Retorna False si el usuario no existe."""
+    _asegurar_directorio()
+    if not os.path.exists(_ruta_registro(correo)):
+        return False
+    _transaccion_local.cambios.setdefault(correo, []).append(funcion)
+    return True
+
+
+class _CacheRegistros:
+    """
+    Registros ya parseados, compartidos por todos los servicios (todos reciben este mismo módulo).
+    Cada entrada guarda la firma (inode, mtime, tamaño) del archivo base y del log; si la firma
+    en disco no cambió, el registro se sirve desde memoria sin abrir ni parsear nada.
+    Cada campo se guarda serializado con pickle por separado: cada lectura devuelve una copia
+    independiente (los servicios mutan los dicts que reciben), pickle.loads cuesta bastante menos
+    que json.load o copy.deepcopy, y LazyUser puede decodificar solo los campos que usa.
+    """
+
+    def __init__(self):
+        self._registros = {}  # correo -> (firma, {campo: bytes})
+
+    def obtener_serializado(self, correo: str, firma):
+        entrada = self._registros.get(correo)
+        if entrada is not None and entrada[0] == firma:
+            return dict(entrada[1])
+        return None
+
+    def obtener(self, correo: str, firma):
+        campos = self.obtener_serializado(correo, firma)
+        if campos is None:
+            return None
+        return {campo: pickle.loads(serializado) for campo, serializado in campos.items()}
+
+    def recordar(self, correo: str, firma, datos: dict):
+        """
+        Guarda un registro recién leído de disco o recién escrito por este proceso.
+        Retorna los campos que difieren de la entrada anterior, o None si no había entrada.
+        """
+        anterior = self._registros.get(correo)
+        campos = serializar_campos(datos)
+        self._registros[correo] = (firma, campos)
+        if anterior is None:
+            return None
+        previos = anterior[1]
+        return {c for c in campos.keys() | previos.keys() if campos.get(c) != previos.get(c)} - {CAMPO_VERSION}
+
+    def descartar(self, correo: str = None):
+        if correo is None:
+            self._registros.clear()
+        else:
+            self._registros.pop(correo, None)
+
+
+def _firma_archivo(ruta: str):
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def firma_registro(correo: str):
+    """(inode, mtime, tamaño) del registro y de su log: si no cambió, el usuario no cambió."""
+    return (_firma_archivo(_ruta_registro(correo)), _firma_archivo(_ruta_log(correo)))
+
+_cache = _CacheRegistros()
 
-def cargar_usuarios():
-    """Carga todos los datos de usuarios desde el archivo JSON."""
-    if not os.path.exists(RUTA_USUARIOS):
-        with open(RUTA_USUARIOS, 'w', encoding='utf-8') as f:
-            json.dump({}, f, indent=4, ensure_ascii=False)
-        return {}
+
+def _nombre_base(correo: str) -> str:
+    return quote(correo.lower(), safe='@.+-_')
+
+def _ruta_registro(correo: str) -> str:
+    """Devuelve la ruta del archivo que guarda el registro de un usuario."""
+    return os.path.join(DIR_USUARIOS, _nombre_base(correo) + _EXTENSION)
+
+def _ruta_log(correo: str) -> str:
+    """Devuelve la ruta del log de cambios (JSONL) de un usuario."""
+    return os.path.join(DIR_USUARIOS, _nombre_base(correo) + _EXTENSION_LOG)
+
+def _bloqueo(correo: str) -> BloqueoArchivo:
+    """
+    Bloqueo de escritura de un registro: RLock propio del usuario más un bloqueo de archivo
+    (<correo>.lock) contra otros procesos. Usuarios distintos no se bloquean entre sí.
+    """
+    with _lock_bloqueos:
+        bloqueo = _bloqueos.get(correo)
+        if bloqueo is None:
+            bloqueo = _bloqueos[correo] = BloqueoArchivo(os.path.join(DIR_USUARIOS, _nombre_base(correo) + _EXTENSION_LOCK))
+        return bloqueo
+
+def _correo_desde_archivo(nombre_archivo: str) -> str:
+    return unquote(nombre_archivo[:-len(_EXTENSION)])
+
+def _escribir_json(ruta: str, datos):
+    """Escribe un registro de forma atómica (ver serializacion.escribir) para no dejar registros a medias."""
+    serializacion.escribir(ruta, datos)
+
+def _borrar_log(correo: str):
     try:
-        with open(RUTA_USUARIOS, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError) as e:
-        print(f"Error al cargar usuarios.json: {e}")
+        os.remove(_ruta_log(correo))
+    except FileNotFoundError:
+        pass
+    _pendientes.pop(correo, None)
+
+def _extraer_historial(correo: str, datos: dict) -> bool:
+    """Saca el 'historial_actividad' heredado del registro y lo pasa al log de actividad. Retorna True si estaba."""
+    if 'historial_actividad' not in datos:
+        return False
+    historial = datos.pop('historial_actividad')
+    if historial:
+        importar_historial(correo, historial)
+    return True
+
+def _migrar_archivo_monolitico():
+    """Reparte el usuarios.json heredado en un archivo por usuario y deja una copia en usuarios.json.migrado."""
+    try:
+        usuarios = serializacion.leer(RUTA_USUARIOS)
+    except (ValueError, IOError) as e:
+        print(f"Error al migrar usuarios.json: {e}")
+        return
+    for correo, datos in usuarios.items():
+        _escribir_json(_ruta_registro(correo), datos)
+    shutil.copyfile(RUTA_USUARIOS, RUTA_USUARIOS + '.migrado')
+    _cache.descartar()
+    print(f"usuarios.json migrado a {len(usuarios)} archivos en {DIR_USUARIOS}.")
+
+def _pendiente_de_migrar() -> bool:
+    return os.path.exists(RUTA_USUARIOS) and not os.path.exists(RUTA_USUARIOS + '.migrado')
+
+def _asegurar_directorio():
+    global _diario_revisado
+    if not os.path.isdir(DIR_USUARIOS):
+        os.makedirs(DIR_USUARIOS, exist_ok=True)
+    if _pendiente_de_migrar():
+        with _bloqueo_migracion:
+            if _pendiente_de_migrar():
+                _migrar_archivo_monolitico()
+    if not _diario_revisado:
+        _diario_revisado = True
+        if os.path.exists(_ruta_diario()):
+            _recuperar_transaccion()
+
+
+# --- Log de cambios ---
+
+def aplicar_cambios(datos: dict, cambios: list) -> dict:
+    """
+    Aplica una lista de cambios pequeños sobre un registro de usuario.
+    Cada cambio es un dict {'op': 'set'|'inc'|'insertar', 'ruta': [claves...], 'valor': ...}:
+    'set' asigna, 'inc' suma (partiendo de 0) e 'insertar' añade al principio de una lista.
+    """
+    for cambio in cambios:
+        *padres, clave = cambio['ruta']
+        destino = datos
+        for parte in padres:
+            destino = destino.setdefault(parte, {})
+        op = cambio['op']
+        if op == 'set':
+            destino[clave] = cambio['valor']
+        elif op == 'inc':
+            destino[clave] = destino.get(clave, 0) + cambio['valor']
+        elif op == 'insertar':
+            destino.setdefault(clave, []).insert(0, cambio['valor'])
+        else:
+            raise ValueError(f"Operación de cambio desconocida: {op}")
+    return datos
+
+def _leer_log(correo: str) -> list:
+    """Lee las entradas del log de un usuario. Una última línea incompleta (escritura cortada) se ignora."""
+    entradas = []
+    try:
+        with open(_ruta_log(correo), 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entradas.append(serializacion.de_linea(linea))
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return entradas
+
+def _leer_base(correo: str):
+    try:
+        return serializacion.leer(_ruta_registro(correo))
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"Error al cargar el registro de {correo}: {e}")
+        return None
+
+def _cargar_con_log(correo: str):
+    """
+    Carga la base del usuario y reaplica la cola del log.
+    Las entradas con secuencia <= '_secuencia' de la base ya están incluidas y se saltan,
+    así que una compactación interrumpida nunca aplica un cambio dos veces.
+    """
+    firma = firma_registro(correo)  # antes de leer: si otro proceso escribe mientras tanto, la firma ya no coincidirá
+    datos = _leer_base(correo)
+    if datos is None:
+        _secuencias.pop(correo, None)
+        return None
+    entradas = _leer_log(correo)
+    aplicada = datos.get(CAMPO_VERSION, 0)
+    aplicar_cambios(datos, [e for e in entradas if e['seq'] > aplicada])
+    if entradas:
+        datos[CAMPO_VERSION] = max(aplicada, entradas[-1]['seq'])
+    _secuencias[correo] = (firma, datos.get(CAMPO_VERSION, 0))
+    return datos
+
+def _ultima_secuencia(correo: str) -> int:
+    """Versión actual del registro en disco. Se relee si otro proceso tocó los archivos."""
+    entrada = _secuencias.get(correo)
+    if entrada is None or entrada[0] != firma_registro(correo):
+        _cargar_con_log(correo)
+        entrada = _secuencias.get(correo)
+    return entrada[1] if entrada else 0
+
+def compactar_registro(correo: str):
+    """Incorpora el log de cambios del usuario a su archivo base y vacía el log."""
+    correo = correo.lower()
+    with _bloqueo(correo):
+        datos = _cargar_con_log(correo)
+        if datos is None:
+            return
+        _escribir_json(_ruta_registro(correo), datos)
+        _borrar_log(correo)
+        firma = firma_registro(correo)
+        _secuencias[correo] = (firma, datos.get(CAMPO_VERSION, 0))
+        _cache.recordar(correo, firma, datos)
+
+def registrar_cambios(correo: str, cambios: list):
+    """
+    Añade cambios pequeños (ver aplicar_cambios) al log del usuario en lugar de reescribir su registro.
+    El costo es O(tamaño de los cambios). Cuando el log supera UMBRAL_COMPACTACION entradas
+    se compacta en un hilo en segundo plano. No se puede usar dentro de transaccion().
+    """
+    _exigir_fuera_de_transaccion('registrar_cambios')
+    return _registrar_cambios(correo, cambios)
+
+def _registrar_cambios(correo: str, cambios: list):
+    correo = correo.lower()
+    if not cambios:
+        return True
+    _asegurar_directorio()
+    with _bloqueo(correo):
+        if not os.path.exists(_ruta_registro(correo)):
+            return False
+        secuencia = _ultima_secuencia(correo)
+        lineas = []
+        for cambio in cambios:
+            secuencia += 1
+            lineas.append(serializacion.a_linea({**cambio, 'seq': secuencia}) + '\n')
+        toca_credenciales = any(cambio['ruta'][0] in gestion_credenciales.CAMPOS_REGISTRO for cambio in cambios)
+        if toca_credenciales:
+            gestion_credenciales.marcar_pendiente(correo)  # ver gestion_credenciales: una caída aquí no deja la contraseña vieja
         try:
-            with open(RUTA_USUARIOS, 'w', encoding='utf-8') as f:
-                json.dump({}, f, indent=4, ensure_ascii=False)
-            return {}
-        except IOError as e_write:
-            print(f"Error al intentar crear un nuevo usuarios.json: {e_write}")
-            return {}
+            with open(_ruta_log(correo), 'a', encoding='utf-8') as f:
+                f.writelines(lineas)
+        except IOError as e:
+            print(f"Error al escribir el log de cambios de {correo}: {e}")
+            return False
+        _secuencias[correo] = (firma_registro(correo), secuencia)
+        _cache.descartar(correo)  # la próxima lectura reaplica el log; la escritura sigue siendo O(1)
+        _pendientes[correo] = _pendientes.get(correo, 0) + len(cambios)
+        if _pendientes[correo] >= UMBRAL_COMPACTACION:
+            _pendientes[correo] = 0
+            threading.Thread(target=compactar_registro, args=(correo,), daemon=True).start()
+        if toca_credenciales:
+            gestion_credenciales.guardar_desde_registro(correo, cargar_usuario(correo))
+    eventos.publicar(eventos.UsuarioActualizado(correo, frozenset(cambio['ruta'][0] for cambio in cambios)))
+    return True
 
 
-def guardar_usuarios(usuarios):
-    """Guarda todos los datos de usuarios en el archivo JSON."""
+# --- Transacciones de varios registros ---
+
+def _ruta_diario() -> str:
+    return os.path.join(DIR_USUARIOS, _NOMBRE_DIARIO)
+
+@contextmanager
+def transaccion():
+    """
+    Agrupa las llamadas a modificar_usuario y actualizar_datos_usuario hechas en este hilo dentro del
+    bloque: solo se anotan, y al salir sin excepción se aplican, con todos los registros implicados
+    bloqueados, sobre la versión actual de cada uno (no sobre la que leyó quien llamó), así que lo que
+    otro escritor guardó mientras tanto no se pierde. Los campos que cambian se confirman con una única
+    escritura durable (el diario) seguida de un cambio en el log de cada registro. Una caída a mitad
+    nunca deja aplicada solo una parte: el diario se vuelve a aplicar en el siguiente arranque.
+    Si el bloque (o una de las funciones anotadas) lanza una excepción no se escribe nada. Las lecturas
+    dentro del bloque no ven los cambios anotados. Una transacción anidada se une a la exterior.
+    guardar_usuario, registrar_cambios y eliminar_usuario lanzan RuntimeError dentro del bloque:
+    escribirían directamente y no se desharían si el bloque falla.
+    """
+    if _en_transaccion():
+        yield
+        return
+    _transaccion_local.cambios = {}
     try:
-        with open(RUTA_USUARIOS, 'w', encoding='utf-8') as f:
-            json.dump(usuarios, f, indent=4, ensure_ascii=False)
-    except IOError as e:
-        print(f"Error al guardar usuarios.json: {e}")
+        yield
+        pendientes = _transaccion_local.cambios
+    finally:
+        _transaccion_local.cambios = None
+    if pendientes:
+        _confirmar_transaccion(pendientes)
+
+def _confirmar_transaccion(pendientes: dict):
+    """pendientes: correo -> [funcion(datos)], en el orden en que se anotaron."""
+    _asegurar_directorio()
+    with _bloqueo_transacciones, ExitStack() as bloqueos:
+        for correo in sorted(pendientes):  # mismo orden que _aplicar_diario
+            bloqueos.enter_context(_bloqueo(correo))
+        cambios = {}
+        for correo, funciones in pendientes.items():
+            datos = cargar_usuario(correo)
+            if datos is None:
+                continue
+            anterior = serializar_campos(datos)
+            for funcion in funciones:
+                resultado = funcion(datos)
+                if resultado is not None:
+                    datos = resultado
+            campos = {campo: valor for campo, valor in serializar_campos(datos).items()
+                      if campo != CAMPO_VERSION and valor != anterior.get(campo)}
+            if campos:
+                cambios[correo] = {campo: datos[campo] for campo in campos}
+        if not cambios:
+            return
+        ruta_tmp = _ruta_diario() + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            f.write(serializacion.a_linea(cambios))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_tmp, _ruta_diario())  # punto de confirmación: desde aquí la transacción se aplica entera
+        _aplicar_diario(cambios)
+
+def _aplicar_diario(cambios: dict):
+    """Pasa los campos del diario al log de cada registro y borra el diario. Llamar con _bloqueo_transacciones."""
+    with ExitStack() as bloqueos:
+        for correo in sorted(cambios):  # siempre en el mismo orden, para que dos transacciones no se esperen en círculo
+            bloqueos.enter_context(_bloqueo(correo))
+        for correo, campos in cambios.items():
+            # 'set' es idempotente: reaplicar un diario ya aplicado en parte no duplica nada
+            _registrar_cambios(correo, [{'op': 'set', 'ruta': [campo], 'valor': valor} for campo, valor in campos.items()])
+        os.remove(_ruta_diario())
+
+def _recuperar_transaccion():
+    """Termina de aplicar el diario de una transacción confirmada que se interrumpió (caída del proceso)."""
+    with _bloqueo_transacciones:
+        try:
+            cambios = serializacion.leer(_ruta_diario())
+        except FileNotFoundError:
+            return  # otro proceso la terminó mientras se esperaba el bloqueo
+        except ValueError as e:
+            print(f"Diario de transacción ilegible, se descarta: {e}")
+            os.remove(_ruta_diario())
+            return
+        _aplicar_diario(cambios)
+        print(f"Transacción interrumpida completada ({len(cambios)} registros).")
+
+
+# --- Registros completos ---
+
+def cargar_usuario(correo: str):
+    """
+    Carga el registro de un único usuario (base + log de cambios). Retorna el diccionario o None si no existe.
+    Si los archivos no cambiaron desde la última lectura se devuelve una copia del registro en memoria.
+    La versión del registro queda en datos['_secuencia'] (ver modificar_usuario).
+    Un registro en un formato anterior se migra (ver esquema_usuarios) y se guarda migrado, salvo
+    dentro de transaccion(), donde solo se devuelve migrado y se guarda en una lectura posterior.
+    """
+    correo = correo.lower()
+    _asegurar_directorio()
+    with _bloqueo(correo).hilo:
+        firma = firma_registro(correo)
+        datos = _cache.obtener(correo, firma)
+        if datos is not None:
+            return datos
+        datos = _cargar_con_log(correo)
+        if datos is None:
+            return None
+        migrado = esquema_usuarios.migrar(datos)
+        if (migrado or 'historial_actividad' in datos) and _en_transaccion():
+            datos.pop('historial_actividad', None)  # no se escribe fuera de la transacción abierta
+        elif _extraer_historial(correo, datos) or migrado:
+            try:
+                guardar_usuario(correo, datos, version_esperada=datos.get(CAMPO_VERSION, 0))
+                datos[CAMPO_VERSION] = _ultima_secuencia(correo)
+            except ConflictoDeVersion:
+                pass  # otro escritor se adelantó: su versión se migrará en la próxima lectura
+        elif firma_registro(correo) == firma:
+            _cache.recordar(correo, firma, datos)
+        return datos
+
+def cargar_usuario_serializado(correo: str):
+    """
+    Como cargar_usuario, pero cada campo se devuelve serializado con pickle ({campo: bytes}) para que
+    models.user_model.LazyUser decodifique solo los que use. Retorna None si el usuario no existe.
+    """
+    correo = correo.lower()
+    with _bloqueo(correo).hilo:
+        campos = _cache.obtener_serializado(correo, firma_registro(correo))
+        if campos is None:
+            datos = cargar_usuario(correo)  # deja el registro en la caché si los archivos no cambiaron entretanto
+            if datos is None:
+                return None
+            campos = _cache.obtener_serializado(correo, firma_registro(correo)) or serializar_campos(datos)
+        return campos
+
+def guardar_usuario(correo: str, datos: dict, version_esperada: int = None):
+    """
+    Guarda (crea o reemplaza) el registro de un único usuario. El log pendiente queda sustituido.
+    Con version_esperada, lanza ConflictoDeVersion si el registro en disco ya no está en esa versión.
+    Publica eventos.UsuarioActualizado con los campos que cambiaron (si no cambió ninguno, no publica).
+    Un registro en un formato anterior se migra antes de escribirlo (y de dejarlo en la caché).
+    No se puede usar dentro de transaccion().
+    """
+    _exigir_fuera_de_transaccion('guardar_usuario')
+    correo = correo.lower()
+    _asegurar_directorio()
+    with _bloqueo(correo):
+        if version_esperada is not None:
+            # La firma (inode, mtime, tamaño) puede repetirse entre dos escrituras muy seguidas de otro
+            # proceso; para comprobar la versión se relee siempre de disco.
+            _secuencias.pop(correo, None)
+        version = _ultima_secuencia(correo)
+        if version_esperada is not None and version != version_esperada:
+            raise ConflictoDeVersion(f"{correo}: versión {version}, se esperaba {version_esperada}")
+        datos = {**datos, CAMPO_VERSION: version + 1}
+        esquema_usuarios.migrar(datos)
+        _extraer_historial(correo, datos)
+        gestion_credenciales.preparar_desde_registro(correo, datos)
+        try:
+            _escribir_json(_ruta_registro(correo), datos)
+        except IOError as e:
+            print(f"Error al guardar el registro de {correo}: {e}")
+            _cache.descartar(correo)
+            return
+        _borrar_log(correo)
+        firma = firma_registro(correo)
+        _secuencias[correo] = (firma, version + 1)
+        cambiados = _cache.recordar(correo, firma, datos)
+        gestion_credenciales.guardar_desde_registro(correo, datos)
+    if cambiados is None or cambiados:
+        eventos.publicar(eventos.UsuarioActualizado(correo, frozenset(cambiados) if cambiados is not None else None))
+
+def modificar_usuario(correo: str, funcion, reintentos: int = REINTENTOS_CONFLICTO):
+    """
+    Lectura-modificación-escritura optimista: carga el registro, llama a funcion(datos) sin bloquear
+    (puede modificar datos in situ o retornar el dict nuevo) y guarda solo si nadie escribió el registro
+    entretanto; si alguien lo hizo, vuelve a empezar sobre la versión nueva en lugar de pisarla.
+    Tras 'reintentos' conflictos, el último intento se hace con el registro bloqueado, así que siempre termina.
+    funcion puede llamarse más de una vez. Retorna el registro guardado, o None si el usuario no existe.
+    Dentro de transaccion() funcion solo se anota y se llama una vez al confirmar, con los registros
+    bloqueados; entonces retorna True, o None si el usuario no existe.
+    """
+    correo = correo.lower()
+    if _en_transaccion():
+        return True if _anotar(correo, funcion) else None
+    for intento in range(reintentos):
+        if intento:
+            time.sleep(random.uniform(0, 0.01 * intento))  # espera aleatoria para no chocar otra vez con el mismo escritor
+        try:
+            return _modificar_una_vez(correo, funcion)
+        except ConflictoDeVersion:
+            _cache.descartar(correo)  # por el mismo motivo, el siguiente intento lee de disco
+    with _bloqueo(correo):
+        return _modificar_una_vez(correo, funcion)
+
+def _modificar_una_vez(correo: str, funcion):
+    datos = cargar_usuario(correo)
+    if datos is None:
+        return None
+    version = datos.get(CAMPO_VERSION, 0)
+    resultado = funcion(datos)
+    if resultado is not None:
+        datos = resultado
+    guardar_usuario(correo, datos, version_esperada=version)
+    return datos
+
+def eliminar_usuario(correo: str):
+    """Elimina el registro de un usuario. Retorna True si existía. No se puede usar dentro de transaccion()."""
+    _exigir_fuera_de_transaccion('eliminar_usuario')
+    correo = correo.lower()
+    _asegurar_directorio()
+    with _bloqueo(correo):
+        _borrar_log(correo)
+        _secuencias.pop(correo, None)
+        _cache.descartar(correo)
+        eliminar_actividad(correo)
+        gestion_credenciales.eliminar(correo)
+        try:
+            os.remove(_ruta_registro(correo))
+        except FileNotFoundError:
+            return False
+    eventos.publicar(eventos.UsuarioEliminado(correo))
+    return True
+
+def listar_correos() -> list:
+    """Correos de todos los usuarios guardados, sin cargar sus registros."""
+    _asegurar_directorio()
+    return [_correo_desde_archivo(nombre_archivo) for nombre_archivo in os.listdir(DIR_USUARIOS)
+            if nombre_archivo.endswith(_EXTENSION)]
+
+def cargar_usuarios(rol: str = None):
+    """Carga todos los datos de usuarios (o solo los de un rol) en un diccionario correo -> datos."""
+    usuarios = {}
+    for correo in listar_correos():
+        datos = cargar_usuario(correo)
+        if datos is not None and (rol is None or datos.get('rol') == rol):
+            usuarios[correo] = datos
+    return usuarios
+
+
+def guardar_usuarios(usuarios):
+    """
+    Guarda todos los datos de usuarios. Los registros que ya no están en el diccionario se eliminan.
+    Para cambios de un solo usuario usar guardar_usuario / actualizar_datos_usuario, que no tocan al resto.
+    """
+    _asegurar_directorio()
+    for correo, datos in usuarios.items():
+        guardar_usuario(correo, datos)
+    correos = {correo.lower() for correo in usuarios}
+    for correo in listar_correos():
+        if correo not in correos:
+            eliminar_usuario(correo)
+
+def obtener_credenciales(correo: str):
+    """
+    Credenciales del usuario ({'hash', 'salt', 'rol', 'perfil_completo'}) sin cargar su perfil.
+    Los usuarios creados antes de la tabla de credenciales se añaden a ella en su primera consulta, y una
+    entrada que quedó pendiente (caída entre el registro y la tabla) se vuelve a copiar del registro.
+    Retorna None si el usuario no existe.
+    """
+    correo = correo.lower()
+    _asegurar_directorio()
+    credenciales = gestion_credenciales.obtener(correo)
+    if credenciales is None and os.path.exists(_ruta_registro(correo)):
+        datos = cargar_usuario(correo)
+        if datos is not None:
+            gestion_credenciales.guardar_desde_registro(correo, datos)
+            credenciales = gestion_credenciales.obtener(correo)
+    return credenciales
 
 def hashear_contrasena(contrasena):
-    """Genera un hash SHA256 para la contraseña."""
-    return hashlib.sha256(contrasena.encode('utf-8')).hexdigest()
+    """SHA-256 sin sal del formato heredado. Las contraseñas nuevas usan data.contrasenas (KDF con sal)."""
+    return contrasenas.hash_heredado(contrasena)
 
 def actualizar_datos_usuario(correo: str, datos_a_actualizar: dict):
     """
-    Actualiza los datos de un usuario específico en el archivo JSON.
-    Esta función es parte del DAO, ya que es una operación de persistencia para un solo usuario.
+    Actualiza los datos de un usuario específico.
+    Solo lee y reescribe el archivo de ese usuario, por lo que el costo no depende del número de usuarios.
+    Para cambios pequeños y frecuentes (respuestas de quiz) es preferible registrar_cambios.
+    La lectura y la escritura ocurren bajo el bloqueo del registro, así que dos actualizaciones
+    concurrentes de campos distintos se combinan en lugar de pisarse.
+    Dentro de transaccion() solo se anota el cambio (ver transaccion). Los campos dados se asignan
+    enteros: si otro escritor puede tocar el mismo campo, es mejor modificar_usuario.
     """
-    usuarios = cargar_usuarios()
     correo = correo.lower()
+    _asegurar_directorio()
+    if _en_transaccion():
+        if not datos_a_actualizar:
+            return os.path.exists(_ruta_registro(correo))
+        return _anotar(correo, lambda datos, valores=dict(datos_a_actualizar): datos.update(valores))
+    with _bloqueo(correo):
+        if not datos_a_actualizar:
+            return os.path.exists(_ruta_registro(correo))
+        datos = cargar_usuario(correo)
 
-    if correo in usuarios:
-        usuarios[correo].update(datos_a_actualizar)
-        guardar_usuarios(usuarios)
-        return True
-    return False
\ No newline at end of file
+        if datos is not None:
+            datos.update(datos_a_actualizar)
+            guardar_usuario(correo, datos)
+            return True
+    return False
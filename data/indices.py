@@ -0,0 +1,134 @@
+# data/indices.py
+#
+# Índices en memoria y copias compartidos por los repositorios en disco (gestion_cursos,
+# gestion_reportes, gestion_usuarios) y los de data/repositorio_memoria.py, para que ambos
+# filtren, paginen y copien igual.
+
+import bisect
+import hashlib
+import pickle
+
+EVENTO_REPORTE = 'reporte'
+EVENTO_ESTADO = 'estado'
+
+
+def copia(datos):
+    """Copia profunda e independiente (pickle es más rápido que copy.deepcopy para dicts y listas)."""
+    return pickle.loads(pickle.dumps(datos, pickle.HIGHEST_PROTOCOL))
+
+def serializar_campos(datos: dict) -> dict:
+    """{campo: bytes de pickle}: así se guardan los registros de usuario en caché y se comparan campo a campo."""
+    return {campo: pickle.dumps(valor, pickle.HIGHEST_PROTOCOL) for campo, valor in datos.items()}
+
+
+# --- Cursos ---
+
+class IndiceCursos:
+    """
+    Índices en memoria de los cursos: id_curso -> curso y email -> ids de sus cursos.
+    Se reconstruyen solo si el archivo cambió por fuera (inode/mtime/tamaño) y se mantienen
+    de forma incremental en actualizar_curso, agregar_miembro y quitar_miembro.
+    """
+
+    def __init__(self):
+        self.firma = None
+        self.por_id = {}       # id_curso -> dict del curso (en el orden del archivo)
+        self.por_miembro = {}  # email -> {id_curso: None} (dict como conjunto ordenado)
+
+    def reconstruir(self, cursos, firma):
+        self.firma = firma
+        self.por_id = {}
+        self.por_miembro = {}
+        for curso in cursos:
+            self.poner(curso)
+
+    def poner(self, curso):
+        anterior = self.por_id.get(curso['id_curso'])
+        if anterior is not None:
+            self._quitar_miembros(anterior)
+        self.por_id[curso['id_curso']] = curso
+        for m in curso.get('miembros', []):
+            self.por_miembro.setdefault(m['email'], {})[curso['id_curso']] = None
+
+    def _quitar_miembros(self, curso):
+        for m in curso.get('miembros', []):
+            ids = self.por_miembro.get(m['email'])
+            if ids is not None:
+                ids.pop(curso['id_curso'], None)
+                if not ids:
+                    del self.por_miembro[m['email']]
+
+
+# --- Reportes ---
+
+def hash_pregunta(pregunta: str) -> str:
+    """Clave de una pregunta independiente de mayúsculas y espacios, para agrupar reportes de la misma."""
+    normalizada = ' '.join(str(pregunta or '').lower().split())
+    return hashlib.sha1(normalizada.encode('utf-8')).hexdigest()
+
+
+class IndiceReportes:
+    """
+    Reportes en orden de creación (posición = orden) y, por cada estado, profesor y pregunta,
+    la lista ordenada de posiciones. Las páginas se sacan recorriendo esas listas desde el final.
+    """
+
+    def __init__(self):
+        self.desplazamiento = 0  # bytes del archivo ya procesados
+        self.inodo = None        # para detectar que el archivo fue reemplazado
+        self.reportes = []
+        self.posiciones = {}     # id_reporte -> posición
+        self.por_estado = {}
+        self.por_profesor = {}
+        self.por_pregunta = {}
+
+    def aplicar(self, evento):
+        if evento.get('evento') == EVENTO_ESTADO:
+            posicion = self.posiciones.get(evento.get('id_reporte'))
+            if posicion is not None:
+                reporte = self.reportes[posicion]
+                _quitar(self.por_estado, reporte.get('estado'), posicion)
+                reporte['estado'] = evento.get('estado')
+                _poner(self.por_estado, reporte['estado'], posicion)
+            return
+        reporte = {k: v for k, v in evento.items() if k != 'evento'}
+        if reporte.get('id_reporte') in self.posiciones:
+            return
+        posicion = len(self.reportes)
+        self.reportes.append(reporte)
+        self.posiciones[reporte.get('id_reporte')] = posicion
+        _poner(self.por_estado, reporte.get('estado'), posicion)
+        _poner(self.por_profesor, reporte.get('email_profesor'), posicion)
+        _poner(self.por_pregunta, hash_pregunta((reporte.get('pregunta_original_data') or {}).get('pregunta')), posicion)
+
+
+def _poner(indice, clave, posicion):
+    bisect.insort(indice.setdefault(clave, []), posicion)
+
+def _quitar(indice, clave, posicion):
+    posiciones = indice.get(clave)
+    if posiciones:
+        i = bisect.bisect_left(posiciones, posicion)
+        if i < len(posiciones) and posiciones[i] == posicion:
+            del posiciones[i]
+
+
+def posiciones_reportes(indice, estado=None, email_profesor=None, pregunta=None):
+    """Lista ordenada de posiciones que cumplen los filtros (la del filtro más selectivo, luego se filtra)."""
+    candidatas = [lista for lista in (
+        indice.por_estado.get(estado, []) if estado is not None else None,
+        indice.por_profesor.get(email_profesor, []) if email_profesor is not None else None,
+        indice.por_pregunta.get(hash_pregunta(pregunta), []) if pregunta is not None else None,
+    ) if lista is not None]
+    if not candidatas:
+        return range(len(indice.reportes))
+    base = min(candidatas, key=len)
+    resto = [set(lista) for lista in candidatas if lista is not base]
+    return [p for p in base if all(p in s for s in resto)] if resto else base
+
+def pagina_reportes(indice, estado, email_profesor, pregunta, limite, desplazamiento):
+    """Copias de los reportes que cumplen los filtros, más reciente primero, desde 'desplazamiento' y hasta 'limite'."""
+    posiciones = posiciones_reportes(indice, estado, email_profesor, pregunta)
+    fin = len(posiciones) - desplazamiento
+    inicio = max(0, fin - limite) if limite is not None else 0
+    return [copia(indice.reportes[p]) for p in reversed(posiciones[inicio:max(0, fin)])]
@@ -0,0 +1,292 @@
+# data/repositorio_memoria.py
+#
+# Implementaciones en memoria de los repositorios de data/repositorios.py. Se comportan como los
+# módulos JSON (copias independientes en cada lectura, versión '_secuencia', migración de esquema,
+# transacciones, eventos de cambio) pero sin tocar el disco, para pruebas y benchmarks de los servicios:
+#
+#     usuarios = UsuariosEnMemoria()
+#     auth_service = AuthService(user_dao_module=usuarios)
+#     course_service = CourseService(usuarios, ai_service, course_dao_module=CursosEnMemoria())
+#
+# Cada instancia es independiente y segura entre hilos (un RLock por repositorio).
+
+import pickle
+import threading
+from contextlib import contextmanager
+
+from data import esquema_usuarios, eventos
+from data.gestion_usuarios import CAMPO_VERSION, ConflictoDeVersion, aplicar_cambios
+from data.indices import (EVENTO_ESTADO, EVENTO_REPORTE, IndiceCursos, IndiceReportes, copia, pagina_reportes,
+                          posiciones_reportes, serializar_campos)
+
+
+class UsuariosEnMemoria:
+    """RepositorioUsuarios en memoria. Los registros se guardan campo a campo serializados, como la caché de gestion_usuarios."""
+
+    def __init__(self, usuarios: dict = None):
+        self._lock = threading.RLock()
+        self._registros = {}  # correo -> {campo: bytes}
+        self._actividad = {}  # correo -> actividades, de la más antigua a la más reciente
+        self._transaccion_local = threading.local()
+        for correo, datos in (usuarios or {}).items():
+            self.guardar_usuario(correo, datos)
+
+    def obtener_credenciales(self, correo: str):
+        with self._lock:
+            campos = self._registros.get(correo.lower())
+            if campos is None:
+                return None
+            valor = lambda campo: pickle.loads(campos[campo]) if campo in campos else None
+            return {'hash': valor('contrasena_hash'), 'salt': valor('contrasena_salt'), 'rol': valor('rol'),
+                    'perfil_completo': bool(valor('perfil_completo'))}
+
+    def cargar_usuario(self, correo: str):
+        correo = correo.lower()
+        with self._lock:
+            campos = self._registros.get(correo)
+            if campos is None:
+                return None
+            datos = {campo: pickle.loads(serializado) for campo, serializado in campos.items()}
+            if esquema_usuarios.migrar(datos):
+                self._registros[correo] = serializar_campos(datos)
+            return datos
+
+    def cargar_usuario_serializado(self, correo: str):
+        correo = correo.lower()
+        with self._lock:
+            if self.cargar_usuario(correo) is None:
+                return None
+            return dict(self._registros[correo])
+
+    def cargar_usuarios(self, rol: str = None):
+        with self._lock:
+            usuarios = {correo: self.cargar_usuario(correo) for correo in self._registros}
+        return {correo: datos for correo, datos in usuarios.items() if rol is None or datos.get('rol') == rol}
+
+    def _exigir_fuera_de_transaccion(self, operacion: str):
+        """Como en gestion_usuarios: solo modificar_usuario y actualizar_datos_usuario se anotan en transaccion()."""
+        if getattr(self._transaccion_local, 'cambios', None) is not None:
+            raise RuntimeError(f"{operacion} no se puede usar dentro de transaccion(); usar modificar_usuario.")
+
+    def guardar_usuario(self, correo: str, datos: dict, version_esperada: int = None):
+        self._exigir_fuera_de_transaccion('guardar_usuario')
+        correo = correo.lower()
+        with self._lock:
+            anterior = self._registros.get(correo, {})
+            version = pickle.loads(anterior[CAMPO_VERSION]) if CAMPO_VERSION in anterior else 0
+            if version_esperada is not None and version != version_esperada:
+                raise ConflictoDeVersion(f"{correo}: versión {version}, se esperaba {version_esperada}")
+            datos = {**datos, CAMPO_VERSION: version + 1}
+            historial = datos.pop('historial_actividad', None)
+            if historial:
+                self._anexar_actividades(correo, list(reversed(historial)))
+            campos = serializar_campos(datos)
+            self._registros[correo] = campos
+            cambiados = {c for c in campos.keys() | anterior.keys() if campos.get(c) != anterior.get(c)} - {CAMPO_VERSION}
+        if cambiados:
+            eventos.publicar(eventos.UsuarioActualizado(correo, frozenset(cambiados) if anterior else None))
+
+    def actualizar_datos_usuario(self, correo: str, datos_a_actualizar: dict):
+        correo = correo.lower()
+        anotados = getattr(self._transaccion_local, 'cambios', None)
+        with self._lock:
+            if correo not in self._registros:
+                return False
+            if anotados is not None:
+                if datos_a_actualizar:
+                    anotados.setdefault(correo, []).append(lambda datos, valores=dict(datos_a_actualizar): datos.update(valores))
+            elif datos_a_actualizar:
+                datos = self.cargar_usuario(correo)
+                datos.update(datos_a_actualizar)
+                self.guardar_usuario(correo, datos)
+            return True
+
+    def registrar_cambios(self, correo: str, cambios: list):
+        self._exigir_fuera_de_transaccion('registrar_cambios')
+        correo = correo.lower()
+        if not cambios:
+            return True
+        with self._lock:
+            datos = self.cargar_usuario(correo)
+            if datos is None:
+                return False
+            aplicar_cambios(datos, cambios)
+            datos[CAMPO_VERSION] = datos.get(CAMPO_VERSION, 0) + len(cambios)
+            self._registros[correo] = serializar_campos(datos)
+        eventos.publicar(eventos.UsuarioActualizado(correo, frozenset(cambio['ruta'][0] for cambio in cambios)))
+        return True
+
+    def modificar_usuario(self, correo: str, funcion, reintentos: int = None):
+        """Como gestion_usuarios.modificar_usuario; aquí el registro queda bloqueado durante funcion, así que no hay conflictos."""
+        correo = correo.lower()
+        anotados = getattr(self._transaccion_local, 'cambios', None)
+        with self._lock:
+            if anotados is not None:
+                if correo not in self._registros:
+                    return None
+                anotados.setdefault(correo, []).append(funcion)
+                return True
+            datos = self.cargar_usuario(correo)
+            if datos is None:
+                return None
+            resultado = funcion(datos)
+            if resultado is not None:
+                datos = resultado
+            self.guardar_usuario(correo, datos)
+            return datos
+
+    def eliminar_usuario(self, correo: str):
+        self._exigir_fuera_de_transaccion('eliminar_usuario')
+        correo = correo.lower()
+        with self._lock:
+            self._actividad.pop(correo, None)
+            if self._registros.pop(correo, None) is None:
+                return False
+        eventos.publicar(eventos.UsuarioEliminado(correo))
+        return True
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Como gestion_usuarios.transaccion: las modificaciones anotadas en el hilo se aplican juntas al salir
+        del bloque, sobre los registros actuales. Si una lanza, no se guarda ninguna.
+        """
+        if getattr(self._transaccion_local, 'cambios', None) is not None:
+            yield
+            return
+        self._transaccion_local.cambios = {}
+        try:
+            yield
+            pendientes = self._transaccion_local.cambios
+        finally:
+            self._transaccion_local.cambios = None
+        with self._lock:
+            nuevos = {}
+            for correo, funciones in pendientes.items():
+                datos = self.cargar_usuario(correo)
+                if datos is None:
+                    continue
+                for funcion in funciones:
+                    resultado = funcion(datos)
+                    if resultado is not None:
+                        datos = resultado
+                nuevos[correo] = datos
+            for correo, datos in nuevos.items():
+                self.guardar_usuario(correo, datos)
+
+    # --- Actividad ---
+
+    def _anexar_actividades(self, correo: str, actividades: list):
+        lista = self._actividad.setdefault(correo, [])
+        siguiente = lista[-1]['id'] if lista else 0
+        for actividad in actividades:
+            siguiente += 1
+            lista.append({**copia(actividad), 'id': siguiente})
+
+    def registrar_actividad(self, correo: str, actividad: dict):
+        with self._lock:
+            self._anexar_actividades(correo.lower(), [actividad])
+        return True
+
+    def obtener_actividad(self, correo: str, limite: int = 10, antes: int = None):
+        """Misma paginación que gestion_actividad.obtener_actividad: (actividades, cursor)."""
+        with self._lock:
+            pagina = []
+            for entrada in reversed(self._actividad.get(correo.lower(), [])):
+                if antes is not None and entrada['id'] >= antes:
+                    continue
+                if len(pagina) == limite:
+                    return pagina, pagina[-1]['id']
+                pagina.append(copia(entrada))
+            return pagina, None
+
+
+class CursosEnMemoria:
+    """RepositorioCursos en memoria, con los mismos índices que gestion_cursos."""
+
+    def __init__(self, cursos: list = None):
+        self._lock = threading.RLock()
+        self._indice = IndiceCursos()
+        for curso in cursos or []:
+            self._indice.poner(copia(curso))
+
+    def cargar_cursos(self):
+        with self._lock:
+            return [copia(c) for c in self._indice.por_id.values()]
+
+    def guardar_cursos(self, cursos):
+        with self._lock:
+            self._indice.reconstruir([copia(c) for c in cursos], None)
+
+    def actualizar_curso(self, curso_dict):
+        with self._lock:
+            self._indice.poner(copia(curso_dict))
+        eventos.publicar(eventos.CursoActualizado(curso_dict['id_curso']))
+
+    def modificar_curso(self, id_curso, funcion):
+        with self._lock:
+            curso = self._indice.por_id.get(id_curso)
+            if curso is None:
+                return None
+            curso = copia(curso)
+            resultado = funcion(curso)
+            if resultado is not None:
+                curso = resultado
+            self._indice.poner(curso)
+        eventos.publicar(eventos.CursoActualizado(id_curso))
+        return copia(curso)
+
+    def agregar_miembro(self, id_curso, email, rol):
+        def _agregar(curso):
+            if not any(m['email'] == email for m in curso.get('miembros', [])):
+                curso.setdefault('miembros', []).append({'email': email, 'rol': rol})
+        return self.modificar_curso(id_curso, _agregar) is not None
+
+    def quitar_miembro(self, id_curso, email):
+        def _quitar(curso):
+            curso['miembros'] = [m for m in curso.get('miembros', []) if m['email'] != email]
+        return self.modificar_curso(id_curso, _quitar) is not None
+
+    def obtener_curso_por_id(self, id_curso):
+        with self._lock:
+            curso = self._indice.por_id.get(id_curso)
+            return copia(curso) if curso is not None else None
+
+    def obtener_cursos_de_usuario(self, email):
+        with self._lock:
+            return [copia(self._indice.por_id[id_curso]) for id_curso in self._indice.por_miembro.get(email, {})]
+
+
+class ReportesEnMemoria:
+    """RepositorioReportes en memoria, con los mismos índices que gestion_reportes."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indice = IndiceReportes()
+
+    def agregar_reporte(self, reporte: dict):
+        with self._lock:
+            self._indice.aplicar({'evento': EVENTO_REPORTE, **copia(reporte)})
+        eventos.publicar(eventos.ReporteAgregado(reporte.get('id_reporte'), reporte.get('email_profesor')))
+
+    def cambiar_estado(self, id_reporte: str, estado: str, fecha: str = None):
+        with self._lock:
+            if id_reporte not in self._indice.posiciones:
+                return False
+            self._indice.aplicar({'evento': EVENTO_ESTADO, 'id_reporte': id_reporte, 'estado': estado, 'fecha': fecha})
+        eventos.publicar(eventos.EstadoReporteCambiado(id_reporte, estado))
+        return True
+
+    def obtener_reportes(self, estado: str = None, email_profesor: str = None, pregunta: str = None,
+                         limite: int = None, desplazamiento: int = 0):
+        with self._lock:
+            return pagina_reportes(self._indice, estado, email_profesor, pregunta, limite, desplazamiento)
+
+    def contar_reportes(self, estado: str = None, email_profesor: str = None, pregunta: str = None):
+        with self._lock:
+            return len(posiciones_reportes(self._indice, estado, email_profesor, pregunta))
+
+    def obtener_reporte(self, id_reporte: str):
+        with self._lock:
+            posicion = self._indice.posiciones.get(id_reporte)
+            return copia(self._indice.reportes[posicion]) if posicion is not None else None
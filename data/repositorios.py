@@ -0,0 +1,58 @@
+# data/repositorios.py
+#
+# Interfaces de almacenamiento que reciben los servicios (user_dao_module, course_dao_module,
+# reportes_dao_module). Son protocolos estructurales: los módulos gestion_usuarios / gestion_cursos /
+# gestion_reportes y gestion_sqlite los cumplen tal cual, sin heredar de nada, y
+# data/repositorio_memoria.py da una implementación en memoria para pruebas y benchmarks:
+#
+#     from data.repositorio_memoria import UsuariosEnMemoria
+#     auth_service = AuthService(user_dao_module=UsuariosEnMemoria())
+#
+# Los registros se intercambian como dicts; cada lectura devuelve una copia que el llamador puede mutar.
+
+from typing import Callable, ContextManager, Optional, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class RepositorioUsuarios(Protocol):
+    def obtener_credenciales(self, correo: str) -> Optional[dict]:
+        """{'hash', 'salt', 'rol', 'perfil_completo'} sin cargar el perfil, o None si no existe."""
+    def cargar_usuario(self, correo: str) -> Optional[dict]: ...
+    def cargar_usuario_serializado(self, correo: str) -> Optional[dict]:
+        """{campo: bytes de pickle}, para LazyUser."""
+    def cargar_usuarios(self, rol: str = None) -> dict: ...
+    def guardar_usuario(self, correo: str, datos: dict): ...
+    def actualizar_datos_usuario(self, correo: str, datos_a_actualizar: dict) -> bool: ...
+    def registrar_cambios(self, correo: str, cambios: list) -> bool:
+        """Cambios pequeños {'op', 'ruta', 'valor'} (ver gestion_usuarios.aplicar_cambios)."""
+    def modificar_usuario(self, correo: str, funcion: Callable, reintentos: int = None) -> Optional[dict]: ...
+    def eliminar_usuario(self, correo: str) -> bool: ...
+    def transaccion(self) -> ContextManager:
+        """
+        Las modificaciones (modificar_usuario, actualizar_datos_usuario) hechas dentro del bloque se confirman
+        todas juntas o ninguna, aplicadas sobre la versión actual de cada registro.
+        """
+    def registrar_actividad(self, correo: str, actividad: dict) -> bool: ...
+    def obtener_actividad(self, correo: str, limite: int = 10, antes: int = None) -> tuple:
+        """(actividades, cursor), de la más reciente a la más antigua."""
+
+
+@runtime_checkable
+class RepositorioCursos(Protocol):
+    def cargar_cursos(self) -> list: ...
+    def actualizar_curso(self, curso_dict: dict): ...
+    def modificar_curso(self, id_curso: str, funcion: Callable) -> Optional[dict]: ...
+    def agregar_miembro(self, id_curso: str, email: str, rol: str) -> bool: ...
+    def quitar_miembro(self, id_curso: str, email: str) -> bool: ...
+    def obtener_curso_por_id(self, id_curso: str) -> Optional[dict]: ...
+    def obtener_cursos_de_usuario(self, email: str) -> list: ...
+
+
+@runtime_checkable
+class RepositorioReportes(Protocol):
+    def agregar_reporte(self, reporte: dict): ...
+    def cambiar_estado(self, id_reporte: str, estado: str, fecha: str = None) -> bool: ...
+    def obtener_reportes(self, estado: str = None, email_profesor: str = None, pregunta: str = None,
+                         limite: int = None, desplazamiento: int = 0) -> list: ...
+    def contar_reportes(self, estado: str = None, email_profesor: str = None, pregunta: str = None) -> int: ...
+    def obtener_reporte(self, id_reporte: str) -> Optional[dict]: ...
@@ -0,0 +1,286 @@
+# data/respaldo.py
+#
+# Copias de seguridad incrementales de la carpeta data/, en data/respaldos/:
+#   - objetos/: contenido comprimido (zstd si el paquete zstandard está instalado, si no gzip)
+#     y direccionado por el SHA-256 del contenido sin comprimir. Un objeto que ya existe no se
+#     vuelve a escribir, así que lo que no cambió entre dos instantáneas no ocupa más espacio.
+#   - instantaneas/<fecha>.json.gz: qué objetos forman cada instantánea.
+# Por usuario se guarda su registro (un objeto) y su log de actividad como una lista de trozos:
+# cada instantánea añade solo los bytes anexados desde la anterior. Los segmentos de actividad
+# archivada (ver gestion_actividad) también crecen solo por el final y se guardan igual.
+# Los cursos se guardan uno por objeto y los reportes (correcciones.jsonl) por trozos.
+# Un registro cuya firma (inode, mtime, tamaño) no cambió ni siquiera se lee, así que el tiempo y
+# el espacio de una instantánea dependen de lo que cambió, no del tamaño total de los datos.
+#
+# Solo respalda el almacenamiento JSON. Con BRAINCOURSE_STORAGE=sqlite (o memoria) los archivos de
+# data/ no son los datos vivos, así que crear y restaurar se niegan en vez de copiar datos viejos;
+# para SQLite basta copiar braincourse.db con la aplicación cerrada.
+#
+#     python -m data.respaldo crear
+#     python -m data.respaldo listar
+#     python -m data.respaldo restaurar <correo> [fecha ISO]   # la última instantánea hasta esa fecha
+#     python -m data.respaldo podar <instantáneas a conservar>
+
+import gzip
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from data import gestion_actividad, gestion_cursos, gestion_reportes, gestion_usuarios, serializacion
+from data.bloqueo_archivos import BloqueoArchivo
+
+DIR_RESPALDOS = os.path.join(os.path.dirname(__file__), 'respaldos')
+
+_FORMATO_FECHA = '%Y%m%dT%H%M%S%f'
+_EXTENSION_INSTANTANEA = '.json.gz'
+_EXTENSIONES_OBJETO = ('.zst', '.gz')
+
+_bloqueo = BloqueoArchivo(os.path.join(os.path.dirname(__file__), 'respaldos.lock'))
+
+
+def _dir_objetos():
+    return os.path.join(DIR_RESPALDOS, 'objetos')
+
+def _dir_instantaneas():
+    return os.path.join(DIR_RESPALDOS, 'instantaneas')
+
+def _ruta_objeto(clave: str) -> str:
+    """Ruta sin extensión: objetos/<2 primeros caracteres>/<clave>."""
+    return os.path.join(_dir_objetos(), clave[:2], clave)
+
+def _ruta_instantanea(nombre: str) -> str:
+    return os.path.join(_dir_instantaneas(), nombre + _EXTENSION_INSTANTANEA)
+
+
+# --- Objetos ---
+
+def _guardar_objeto(contenido: bytes, estadisticas: dict) -> str:
+    """Guarda el contenido si no existía y retorna su clave (SHA-256)."""
+    clave = hashlib.sha256(contenido).hexdigest()
+    base = _ruta_objeto(clave)
+    if any(os.path.exists(base + extension) for extension in _EXTENSIONES_OBJETO):
+        return clave
+    if zstandard is not None:
+        comprimido, extension = zstandard.ZstdCompressor().compress(contenido), '.zst'
+    else:
+        comprimido, extension = gzip.compress(contenido, mtime=0), '.gz'
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    with open(base + extension + '.tmp', 'wb') as f:
+        f.write(comprimido)
+    os.replace(base + extension + '.tmp', base + extension)
+    estadisticas['objetos_nuevos'] += 1
+    estadisticas['bytes_escritos'] += len(comprimido)
+    return clave
+
+def _leer_objeto(clave: str) -> bytes:
+    base = _ruta_objeto(clave)
+    if os.path.exists(base + '.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"El objeto {clave} está en zstd y el paquete zstandard no está instalado.")
+        with open(base + '.zst', 'rb') as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+    with open(base + '.gz', 'rb') as f:
+        return gzip.decompress(f.read())
+
+def _exigir_almacenamiento_json():
+    motor = os.environ.get('BRAINCOURSE_STORAGE', 'json').lower()
+    if motor != 'json':
+        raise RuntimeError(f"Las copias de seguridad solo funcionan con el almacenamiento JSON "
+                           f"(BRAINCOURSE_STORAGE={motor}); los archivos de data/ no tienen los datos actuales.")
+
+def _firma_texto(firma) -> str:
+    return serializacion.a_linea(firma)
+
+
+# --- Instantáneas ---
+
+def listar_instantaneas() -> list:
+    """Nombres de las instantáneas, de la más antigua a la más reciente."""
+    try:
+        nombres = os.listdir(_dir_instantaneas())
+    except FileNotFoundError:
+        return []
+    return sorted(n[:-len(_EXTENSION_INSTANTANEA)] for n in nombres if n.endswith(_EXTENSION_INSTANTANEA))
+
+def leer_instantanea(nombre: str) -> dict:
+    with open(_ruta_instantanea(nombre), 'rb') as f:
+        return serializacion.de_linea(gzip.decompress(f.read()))
+
+def _respaldar_log(ruta: str, anterior, estadisticas: dict):
+    """
+    Trozos de un log de solo anexado: reutiliza los de la instantánea anterior y guarda como trozo
+    nuevo solo los bytes añadidos desde entonces. Si el archivo se reemplazó, se guarda entero.
+    """
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    if anterior is not None and anterior['inodo'] == st.st_ino and anterior['tamano'] <= st.st_size:
+        trozos, desde = list(anterior['trozos']), anterior['tamano']
+    else:
+        trozos, desde = [], 0
+    if st.st_size > desde:
+        with open(ruta, 'rb') as f:
+            f.seek(desde)
+            nuevo = f.read(st.st_size - desde)
+        trozos.append(_guardar_objeto(nuevo, estadisticas))
+        desde += len(nuevo)
+    return {'inodo': st.st_ino, 'tamano': desde, 'trozos': trozos}
+
+def _leer_log(entrada) -> bytes:
+    return b''.join(_leer_objeto(clave) for clave in entrada['trozos'])
+
+def crear_instantanea() -> dict:
+    """Crea una instantánea incremental respecto a la última. Retorna estadísticas de lo hecho."""
+    _exigir_almacenamiento_json()
+    inicio = time.perf_counter()
+    estadisticas = {'usuarios': 0, 'usuarios_leidos': 0, 'objetos_nuevos': 0, 'bytes_escritos': 0}
+    with _bloqueo:
+        nombres = listar_instantaneas()
+        anterior = leer_instantanea(nombres[-1]) if nombres else {}
+        usuarios_previos = anterior.get('usuarios', {})
+        actividad_previa = anterior.get('actividad', {})
+        archivo_previo = anterior.get('archivo', {})
+        fecha = datetime.now()
+
+        usuarios, actividad, archivo = {}, {}, {}
+        for correo in gestion_usuarios.listar_correos():
+            firma = _firma_texto(gestion_usuarios.firma_registro(correo))  # antes de leer: un cambio a mitad se verá en la próxima
+            previo = usuarios_previos.get(correo)
+            if previo is not None and previo['firma'] == firma:
+                usuarios[correo] = previo
+            else:
+                datos = gestion_usuarios.cargar_usuario(correo)
+                if datos is None:
+                    continue
+                estadisticas['usuarios_leidos'] += 1
+                usuarios[correo] = {'firma': firma, 'objeto': _guardar_objeto(serializacion.a_linea(datos).encode('utf-8'), estadisticas)}
+            log = _respaldar_log(gestion_actividad.ruta_actividad(correo), actividad_previa.get(correo), estadisticas)
+            if log is not None:
+                actividad[correo] = log
+            archivados = {}
+            for nombre_segmento, ruta in gestion_actividad.archivos_archivados(correo).items():
+                segmento = _respaldar_log(ruta, archivo_previo.get(correo, {}).get(nombre_segmento), estadisticas)
+                if segmento is not None:
+                    archivados[nombre_segmento] = segmento
+            if archivados:
+                archivo[correo] = archivados
+        estadisticas['usuarios'] = len(usuarios)
+
+        cursos_previos = anterior.get('cursos', {})
+        firma_cursos = _firma_texto(gestion_cursos.firma_cursos())
+        if cursos_previos.get('firma') == firma_cursos:
+            cursos = cursos_previos
+        else:
+            cursos = {'firma': firma_cursos, 'objetos': {
+                curso['id_curso']: _guardar_objeto(serializacion.a_linea(curso).encode('utf-8'), estadisticas)
+                for curso in gestion_cursos.cargar_cursos()
+            }}
+
+        manifiesto = {
+            'fecha': fecha.isoformat(),
+            'usuarios': usuarios,
+            'actividad': actividad,
+            'archivo': archivo,
+            'cursos': cursos,
+            'reportes': _respaldar_log(gestion_reportes.RUTA_REPORTES, anterior.get('reportes'), estadisticas),
+        }
+        nombre = fecha.strftime(_FORMATO_FECHA)
+        os.makedirs(_dir_instantaneas(), exist_ok=True)
+        with open(_ruta_instantanea(nombre) + '.tmp', 'wb') as f:
+            f.write(gzip.compress(serializacion.a_linea(manifiesto).encode('utf-8'), mtime=0))
+        os.replace(_ruta_instantanea(nombre) + '.tmp', _ruta_instantanea(nombre))
+    estadisticas['instantanea'] = nombre
+    estadisticas['segundos'] = time.perf_counter() - inicio
+    return estadisticas
+
+def _instantanea_hasta(hasta=None):
+    """Nombre de la última instantánea no posterior a 'hasta' (datetime o texto ISO; None = la última)."""
+    nombres = listar_instantaneas()
+    if hasta is None:
+        return nombres[-1] if nombres else None
+    if isinstance(hasta, str):
+        hasta = datetime.fromisoformat(hasta)
+    validos = [n for n in nombres if datetime.strptime(n, _FORMATO_FECHA) <= hasta]
+    return validos[-1] if validos else None
+
+def restaurar_usuario(correo: str, hasta=None) -> bool:
+    """
+    Restaura el registro y el historial de actividad de un usuario tal como estaban en la última
+    instantánea no posterior a 'hasta'. Los demás usuarios no se tocan.
+    Retorna False si no hay instantánea o el usuario no estaba en ella.
+    """
+    _exigir_almacenamiento_json()
+    correo = correo.lower()
+    nombre = _instantanea_hasta(hasta)
+    if nombre is None:
+        return False
+    manifiesto = leer_instantanea(nombre)
+    entrada = manifiesto['usuarios'].get(correo)
+    if entrada is None:
+        return False
+    datos = serializacion.de_linea(_leer_objeto(entrada['objeto']))
+    log = manifiesto['actividad'].get(correo)
+    gestion_usuarios.guardar_usuario(correo, datos)
+    gestion_actividad.reemplazar_log(correo, _leer_log(log) if log is not None else b'')
+    gestion_actividad.reemplazar_archivados(correo, {nombre: _leer_log(segmento) for nombre, segmento
+                                                     in manifiesto.get('archivo', {}).get(correo, {}).items()})
+    return True
+
+def podar(conservar: int) -> int:
+    """Borra las instantáneas más antiguas salvo las 'conservar' últimas, y los objetos que ya nadie usa. Retorna objetos borrados."""
+    with _bloqueo:
+        nombres = listar_instantaneas()
+        for nombre in nombres[:max(0, len(nombres) - conservar)]:
+            os.remove(_ruta_instantanea(nombre))
+        usados = set()
+        for nombre in listar_instantaneas():
+            manifiesto = leer_instantanea(nombre)
+            usados.update(e['objeto'] for e in manifiesto['usuarios'].values())
+            usados.update(clave for e in manifiesto['actividad'].values() for clave in e['trozos'])
+            usados.update(clave for segmentos in manifiesto.get('archivo', {}).values()
+                          for e in segmentos.values() for clave in e['trozos'])
+            usados.update(manifiesto['cursos'].get('objetos', {}).values())
+            if manifiesto.get('reportes'):
+                usados.update(manifiesto['reportes']['trozos'])
+        borrados = 0
+        for directorio, _, archivos in os.walk(_dir_objetos()):
+            for archivo in archivos:
+                if archivo.split('.')[0] not in usados:
+                    os.remove(os.path.join(directorio, archivo))
+                    borrados += 1
+        return borrados
+
+
+if __name__ == '__main__':
+    orden = sys.argv[1] if len(sys.argv) > 1 else None
+    if orden in ('crear', 'restaurar'):
+        try:
+            _exigir_almacenamiento_json()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+    if orden == 'crear':
+        e = crear_instantanea()
+        print(f"Instantánea {e['instantanea']}: {e['usuarios']} usuarios ({e['usuarios_leidos']} leídos), "
+              f"{e['objetos_nuevos']} objetos nuevos, {e['bytes_escritos']} bytes, {e['segundos'] * 1000:.0f} ms.")
+    elif orden == 'listar':
+        for nombre in listar_instantaneas():
+            manifiesto = leer_instantanea(nombre)
+            print(f"{nombre}  {manifiesto['fecha']}  {len(manifiesto['usuarios'])} usuarios")
+    elif orden == 'restaurar' and len(sys.argv) in (3, 4):
+        hasta = sys.argv[3] if len(sys.argv) == 4 else None
+        print("Usuario restaurado." if restaurar_usuario(sys.argv[2], hasta) else "No hay una instantánea con ese usuario.")
+    elif orden == 'podar' and len(sys.argv) == 3:
+        print(f"{podar(int(sys.argv[2]))} objetos borrados.")
+    else:
+        print("Uso: python -m data.respaldo crear | listar | restaurar <correo> [fecha ISO] | podar <n>\n"
+              "Solo para el almacenamiento JSON (BRAINCOURSE_STORAGE=json, el de por defecto).")
+        sys.exit(1)
@@ -0,0 +1,133 @@
+# data/serializacion.py
+#
+# Capa de codificación para los archivos de la carpeta data/.
+# - 'json': JSON minificado (usa orjson si está instalado, si no el módulo json estándar).
+# - 'msgpack': MessagePack (requiere el paquete msgpack), precedido por una cabecera propia.
+# El formato se detecta por los primeros bytes del archivo, así que los JSON existentes
+# (incluidos los indentados) se siguen leyendo sin cambios y el nombre del archivo no importa.
+#
+# Conversión de los datos existentes e informe de tamaño / tiempo de carga:
+#     python -m data.serializacion convertir msgpack
+#     python -m data.serializacion convertir json
+
+import glob
+import json
+import os
+import sys
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATO_JSON = 'json'
+FORMATO_MSGPACK = 'msgpack'
+
+# Formato con el que se escriben los archivos nuevos.
+FORMATO_ESCRITURA = os.environ.get('BRAINCOURSE_FORMATO', FORMATO_JSON).lower()
+
+_CABECERA_MSGPACK = b'BCMP\x01'
+
+
+class ErrorDeFormato(ValueError):
+    """El contenido no se pudo decodificar (archivo corrupto o formato no disponible)."""
+
+
+def a_linea(datos) -> str:
+    """Serializa a una línea de JSON compacto (para logs JSONL y columnas de texto)."""
+    if orjson is not None:
+        return orjson.dumps(datos).decode('utf-8')
+    return json.dumps(datos, ensure_ascii=False, separators=(',', ':'))
+
+def de_linea(texto):
+    """Inverso de a_linea."""
+    try:
+        if orjson is not None:
+            return orjson.loads(texto)
+        return json.loads(texto)
+    except ValueError as e:
+        raise ErrorDeFormato(str(e)) from e
+
+
+def codificar(datos, formato: str = None) -> bytes:
+    formato = formato or FORMATO_ESCRITURA
+    if formato == FORMATO_MSGPACK:
+        if msgpack is None:
+            raise ErrorDeFormato("El formato 'msgpack' requiere el paquete msgpack.")
+        return _CABECERA_MSGPACK + msgpack.packb(datos, use_bin_type=True)
+    if formato == FORMATO_JSON:
+        return a_linea(datos).encode('utf-8')
+    raise ErrorDeFormato(f"Formato desconocido: {formato}")
+
+def detectar_formato(contenido: bytes) -> str:
+    return FORMATO_MSGPACK if contenido.startswith(_CABECERA_MSGPACK) else FORMATO_JSON
+
+def decodificar(contenido: bytes):
+    """Decodifica el contenido de un archivo detectando su formato por la cabecera."""
+    if detectar_formato(contenido) == FORMATO_MSGPACK:
+        if msgpack is None:
+            raise ErrorDeFormato("El archivo está en MessagePack pero el paquete msgpack no está instalado.")
+        try:
+            return msgpack.unpackb(contenido[len(_CABECERA_MSGPACK):], raw=False)
+        except Exception as e:
+            raise ErrorDeFormato(str(e)) from e
+    return de_linea(contenido)
+
+
+def leer(ruta: str):
+    """Lee y decodifica un archivo de datos. Lanza FileNotFoundError o ErrorDeFormato."""
+    with open(ruta, 'rb') as f:
+        return decodificar(f.read())
+
+def escribir(ruta: str, datos, formato: str = None):
+    """Codifica y escribe un archivo de forma atómica (archivo temporal + reemplazo)."""
+    contenido = codificar(datos, formato)
+    ruta_tmp = ruta + '.tmp'
+    with open(ruta_tmp, 'wb') as f:
+        f.write(contenido)
+    os.replace(ruta_tmp, ruta)
+
+
+# --- Conversión ---
+
+def _archivos_de_datos():
+    directorio = os.path.dirname(__file__)
+    rutas = glob.glob(os.path.join(directorio, 'usuarios', '*.json'))
+    rutas += [os.path.join(directorio, nombre) for nombre in ('cursos.json', 'correcciones.json')]
+    return [ruta for ruta in rutas if os.path.exists(ruta) and os.path.getsize(ruta) > 0]
+
+def _medir(rutas):
+    """Retorna (bytes totales, segundos para leer y decodificar todos los archivos)."""
+    total = sum(os.path.getsize(ruta) for ruta in rutas)
+    inicio = time.perf_counter()
+    for ruta in rutas:
+        leer(ruta)
+    return total, time.perf_counter() - inicio
+
+def convertir(formato: str, rutas=None):
+    """Reescribe los archivos de datos en el formato indicado. Retorna ((bytes, s) antes, (bytes, s) después)."""
+    rutas = rutas if rutas is not None else _archivos_de_datos()
+    antes = _medir(rutas)
+    for ruta in rutas:
+        escribir(ruta, leer(ruta), formato)
+    despues = _medir(rutas)
+    return antes, despues
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'convertir' or sys.argv[2] not in (FORMATO_JSON, FORMATO_MSGPACK):
+        print("Uso: python -m data.serializacion convertir json|msgpack")
+        sys.exit(1)
+    if sys.argv[2] == FORMATO_MSGPACK and msgpack is None:
+        print("El formato 'msgpack' requiere el paquete msgpack (pip install msgpack).")
+        sys.exit(1)
+    (bytes_antes, t_antes), (bytes_despues, t_despues) = convertir(sys.argv[2])
+    print(f"Tamaño total: {bytes_antes} -> {bytes_despues} bytes ({(bytes_despues - bytes_antes) / max(bytes_antes, 1):+.1%})")
+    print(f"Tiempo de carga: {t_antes * 1000:.2f} -> {t_despues * 1000:.2f} ms ({(t_despues - t_antes) / max(t_antes, 1e-9):+.1%})")
+    print(f"Archivos nuevos se escriben en '{FORMATO_ESCRITURA}' (variable BRAINCOURSE_FORMATO).")
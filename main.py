@@ -3,12 +3,15 @@
 import customtkinter as ctk
 from tkinter import messagebox
 import os
+import threading
 
 # Importar las nuevas capas
 from ai_integration.ai_service import AIService
 from services.auth_service import AuthService
 from models.user_model import User 
 from data import gestion_usuarios as user_dao 
+from data import gestion_cursos as course_dao
+from data import gestion_reportes
 
 # Importar las vistas de alumno
 from views.student_onboarding_view import OnboardingWindow
@@ -35,11 +38,23 @@ except Exception as e:
     messagebox.showerror("Error de Inicialización de IA", f"No se pudo cargar la API Key o iniciar el servicio de IA. Error: {e}\nPor favor, verifica 'api_key.txt'.")
     exit()
 
+# Motor de almacenamiento: JSON por defecto, SQLite con BRAINCOURSE_STORAGE=sqlite
+# (migrar antes con `python -m data.gestion_sqlite migrar`) o en memoria, sin tocar el disco,
+# con BRAINCOURSE_STORAGE=memoria (los datos se pierden al cerrar; para pruebas).
+reportes_dao = gestion_reportes
+motor = os.environ.get('BRAINCOURSE_STORAGE', 'json').lower()
+if motor == 'sqlite':
+    from data import gestion_sqlite
+    user_dao = course_dao = gestion_sqlite
+elif motor == 'memoria':
+    from data.repositorio_memoria import UsuariosEnMemoria, CursosEnMemoria, ReportesEnMemoria
+    user_dao, course_dao, reportes_dao = UsuariosEnMemoria(), CursosEnMemoria(), ReportesEnMemoria()
+
 # Instancias de servicios principales
 auth_service = AuthService(user_dao_module=user_dao) 
 learning_service = LearningService(user_dao_module=auth_service.user_dao, ai_service_instance=ai_service)
-course_service = CourseService(user_dao_module=auth_service.user_dao, ai_service_instance=ai_service)
-quality_control_service = QualityControlService() 
+course_service = CourseService(user_dao_module=auth_service.user_dao, ai_service_instance=ai_service, course_dao_module=course_dao)
+quality_control_service = QualityControlService(reportes_dao_module=reportes_dao)
 teacher_service = TeacherService(auth_service_instance=auth_service, course_service_instance=course_service, qc_service_instance=quality_control_service)
 
 
@@ -69,7 +84,8 @@ class RegisterWindow(ctk.CTkToplevel):
         self.password_entry = ctk.CTkEntry(self, placeholder_text="Contraseña", show="*")
         self.password_entry.grid(row=5, column=0, padx=20, pady=10, sticky="ew")
 
-        ctk.CTkButton(self, text="Registrarse", command=self.register_user).grid(row=6, column=0, padx=20, pady=20, sticky="ew")
+        self.register_button = ctk.CTkButton(self, text="Registrarse", command=self.register_user)
+        self.register_button.grid(row=6, column=0, padx=20, pady=20, sticky="ew")
 
     def register_user(self):
         nombre = self.name_entry.get().strip()
@@ -85,8 +101,20 @@ class RegisterWindow(ctk.CTkToplevel):
             messagebox.showerror("Error de Formato", "Por favor, introduce un correo electrónico válido.", parent=self)
             return
 
-        success, message_or_user = auth_service.registrar_usuario(nombre, correo, contrasena, rol)
-
+        # El hash de la contraseña (KDF) es lento a propósito: se calcula fuera del hilo de Tk
+        self.register_button.configure(state="disabled", text="Registrando...")
+        def _registrar_en_hilo():
+            try:
+                resultado = auth_service.registrar_usuario(nombre, correo, contrasena, rol)
+            except Exception as e:
+                # Siempre se responde al hilo de Tk, o el botón se quedaría deshabilitado
+                print(f"Error al registrar el usuario: {e}")
+                resultado = (False, f"No se pudo completar el registro: {e}")
+            self.after(0, lambda: self._process_register_result(*resultado))
+        threading.Thread(target=_registrar_en_hilo, daemon=True).start()
+
+    def _process_register_result(self, success, message_or_user):
+        self.register_button.configure(state="normal", text="Registrarse")
         if success:
             messagebox.showinfo("Éxito", "¡Registro exitoso! Ahora puedes iniciar sesión.", parent=self)
             self.destroy()
@@ -114,7 +142,8 @@ class LoginWindow(ctk.CTkFrame):
         self.password_entry.grid(row=2, column=0, padx=50, pady=10)
         self.password_entry.bind("<Return>", self.login_user_event) 
 
-        ctk.CTkButton(self, text="Iniciar Sesión", command=self.login_user, width=300).grid(row=3, column=0, padx=50, pady=20)
+        self.login_button = ctk.CTkButton(self, text="Iniciar Sesión", command=self.login_user, width=300)
+        self.login_button.grid(row=3, column=0, padx=50, pady=20)
 
         register_frame = ctk.CTkFrame(self, fg_color="transparent")
         register_frame.grid(row=5, column=0, pady=(0, 50))
@@ -131,11 +160,27 @@ class LoginWindow(ctk.CTkFrame):
         if not correo or not contrasena:
             messagebox.showerror("Error", "Por favor, ingresa correo y contraseña.")
             return
-
-        success, message_or_user_obj = auth_service.verificar_usuario(correo, contrasena)
-
+        if self.login_button.cget("state") == "disabled":
+            return  # ya hay una verificación en curso (p. ej. Enter pulsado dos veces)
+
+        # La verificación (KDF) es lenta a propósito: se hace en un hilo y el resultado vuelve al de Tk con after()
+        self.login_button.configure(state="disabled", text="Verificando...")
+        def _verificar_en_hilo():
+            try:
+                resultado = auth_service.verificar_usuario(correo, contrasena)
+            except Exception as e:
+                # Siempre se responde al hilo de Tk, o el botón se quedaría en "Verificando..."
+                print(f"Error al verificar el usuario: {e}")
+                resultado = (False, f"No se pudo iniciar sesión: {e}")
+            self.after(0, lambda: self._process_login_result(*resultado))
+        threading.Thread(target=_verificar_en_hilo, daemon=True).start()
+
+    def _process_login_result(self, success, message_or_user_obj):
+        self.login_button.configure(state="normal", text="Iniciar Sesión")
         if success:
             current_user_obj: User = message_or_user_obj
+            # El login solo leyó las credenciales: el perfil se lee en segundo plano mientras se construye la vista
+            threading.Thread(target=current_user_obj.completar_carga, daemon=True).start()
             self.launch_app_based_on_role(current_user_obj)
         else:
             messagebox.showerror("Error de Inicio de Sesión", message_or_user_obj)
@@ -1,27 +1,130 @@
+from dataclasses import dataclass, field
 from datetime import datetime
 
+
+@dataclass(slots=True)
+class Membership:
+    """Miembro de un curso: {'email', 'rol'} en disco; rol es 'profesor', 'alumno' o 'co-profesor'."""
+    email: str
+    rol: str
+
+    def to_dict(self):
+        return {'email': self.email, 'rol': self.rol}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['email'], data.get('rol'))
+
+
+@dataclass(slots=True)
+class Module:
+    """Módulo de un curso. Las claves del dict que no tienen campo propio se conservan en 'extra'."""
+    id_modulo: str
+    titulo: str = "Sin título"
+    subtemas: list = field(default_factory=list)
+    completado: bool = False
+    calificacion_examen: float = None
+    teoria_generada: dict = field(default_factory=dict)
+    extra: dict = field(default_factory=dict)
+
+    _CLAVES = frozenset(('id_modulo', 'titulo', 'subtemas', 'completado', 'calificacion_examen', 'teoria_generada'))
+
+    def to_dict(self):
+        data = {
+            'id_modulo': self.id_modulo,
+            'titulo': self.titulo,
+            'subtemas': self.subtemas,
+            'completado': self.completado,
+            'calificacion_examen': self.calificacion_examen,
+            'teoria_generada': self.teoria_generada
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        # Argumentos posicionales y 'extra' solo si hace falta: es el camino caliente al cargar cursos
+        extra = {} if data.keys() <= cls._CLAVES else {k: v for k, v in data.items() if k not in cls._CLAVES}
+        return cls(data.get('id_modulo'), data.get('titulo', "Sin título"), data.get('subtemas', []),
+                   data.get('completado', False), data.get('calificacion_examen'), data.get('teoria_generada') or {}, extra)
+
+
+def _a_dicts(lista, tipo):
+    """La lista tal cual si nunca se materializó (sigue siendo de dicts), o sus to_dict()."""
+    if not lista or not isinstance(lista[0], tipo):
+        return lista
+    return [m.to_dict() for m in lista]
+
+
 class Course:
+    # Miembros y módulos se guardan como llegan del DAO (listas de dicts) y solo se convierten en
+    # Membership/Module la primera vez que se usan: la mayoría de lecturas (listar cursos, el panel)
+    # no los tocan, y to_dict devuelve tal cual las listas que nadie materializó.
+    __slots__ = ('id_curso', 'tema_general', 'creador_email', '_miembros', '_modulos',
+                 'progreso_general', 'calificacion_promedio', '_miembros_por_email')
+
     def __init__(self, id_curso, tema_general, creador_email, miembros=None, modulos=None, progreso_general=0.0, calificacion_promedio=None):
         self.id_curso = id_curso
         self.tema_general = tema_general
         self.creador_email = creador_email
-        self.miembros = miembros if miembros is not None else []  # [{'email': ..., 'rol': 'profesor'/'alumno'/'co-profesor'}]
-        self.modulos = modulos if modulos is not None else []
+        # Acepta Membership/Module o los dicts tal como vienen del DAO. Una lista no vacía de dicts se
+        # reemplaza al materializarla, así que nunca se modifica la del llamador; una vacía se copia aquí.
+        self._miembros = miembros or []
+        self._modulos = modulos or []
         self.progreso_general = progreso_general
         self.calificacion_promedio = calificacion_promedio
+        self._miembros_por_email = None
+
+    @property
+    def miembros(self):
+        """Lista de Membership; los dicts del DAO se convierten aquí, una sola vez."""
+        if self._miembros and not isinstance(self._miembros[0], Membership):
+            self._miembros = [m if isinstance(m, Membership) else Membership.from_dict(m) for m in self._miembros]
+        return self._miembros
+
+    @miembros.setter
+    def miembros(self, miembros):
+        self._miembros = miembros
+        self._miembros_por_email = None
+
+    @property
+    def modulos(self):
+        """Lista de Module; los dicts del DAO se convierten aquí, una sola vez."""
+        if self._modulos and not isinstance(self._modulos[0], Module):
+            self._modulos = [m if isinstance(m, Module) else Module.from_dict(m) for m in self._modulos]
+        return self._modulos
+
+    @modulos.setter
+    def modulos(self, modulos):
+        self._modulos = modulos
+
+    def _por_email(self):
+        if self._miembros_por_email is None:
+            self._miembros_por_email = {m.email: m for m in self.miembros}
+        return self._miembros_por_email
 
     # Métodos para manejar miembros
+    def es_miembro(self, email):
+        return email in self._por_email()
+
     def agregar_miembro(self, email, rol):
-        if not any(m['email'] == email for m in self.miembros):
-            self.miembros.append({'email': email, 'rol': rol})
+        if email not in self._por_email():
+            miembro = Membership(email, rol)
+            self.miembros.append(miembro)
+            self._miembros_por_email[email] = miembro
 
     def quitar_miembro(self, email):
-        self.miembros = [m for m in self.miembros if m['email'] != email]
+        if self._por_email().pop(email, None) is not None:
+            self._miembros = [m for m in self.miembros if m.email != email]
 
     def cambiar_rol_miembro(self, email, nuevo_rol):
-        for m in self.miembros:
-            if m['email'] == email:
-                m['rol'] = nuevo_rol
+        miembro = self._por_email().get(email)
+        if miembro is not None:
+            miembro.rol = nuevo_rol
+
+    def encontrar_modulo(self, id_modulo):
+        return next((m for m in self.modulos if m.id_modulo == id_modulo), None)
 
     # Métodos de serialización
     def to_dict(self):
@@ -29,8 +132,8 @@ class Course:
             'id_curso': self.id_curso,
             'tema_general': self.tema_general,
             'creador_email': self.creador_email,
-            'miembros': self.miembros,
-            'modulos': self.modulos,
+            'miembros': _a_dicts(self._miembros, Membership),
+            'modulos': _a_dicts(self._modulos, Module),
             'progreso_general': self.progreso_general,
             'calificacion_promedio': self.calificacion_promedio
         }
@@ -0,0 +1,31 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class Question:
+    """Pregunta de opción múltiple generada por la IA. Las claves sin campo propio se conservan en 'extra'."""
+    pregunta: str
+    opciones: list = field(default_factory=list)
+    respuesta: str = None
+    extra: dict = field(default_factory=dict)
+
+    _CLAVES = ('pregunta', 'opciones', 'respuesta')
+
+    def to_dict(self):
+        data = {'pregunta': self.pregunta, 'opciones': self.opciones, 'respuesta': self.respuesta}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Lanza ValueError si el dict no tiene la forma mínima de una pregunta."""
+        if not isinstance(data, dict) or not data.get('pregunta'):
+            raise ValueError(f"Pregunta inválida: {data!r}")
+        opciones = data.get('opciones')
+        return cls(
+            pregunta=data['pregunta'],
+            opciones=list(opciones) if isinstance(opciones, list) else [],
+            respuesta=data.get('respuesta'),
+            extra={k: v for k, v in data.items() if k not in cls._CLAVES}
+        )
@@ -1,17 +1,65 @@
 # models/user_model.py
 
+import pickle
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 
+from data.esquema_usuarios import CAMPO_ESQUEMA, VERSION_ESQUEMA
+
+
+@dataclass(slots=True)
+class Activity:
+    """Entrada del historial de actividad. En disco solo se guardan los campos con valor."""
+    fecha: str
+    tipo: str
+    tema: str
+    resultado: str
+    pregunta: str = None
+    respuesta_usuario: str = None
+    respuesta_correcta_ia: str = None
+    fue_correcta: bool = None
+    preguntas: list = None
+    id: int = None
+
+    def to_dict(self):
+        data = {}
+        for campo in Activity.__slots__:
+            valor = getattr(self, campo)
+            if valor is not None:
+                data[campo] = valor
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(*map(data.get, cls.__slots__))
+
+
 class User:
+    __slots__ = ('email', 'nombre', 'contrasena_hash', 'rol', 'perfil_completo', 'datos_perfil', 'progreso',
+                 'historial_temas', 'logros', 'estadisticas', 'cursos', 'profesores_vinculados',
+                 'solicitudes_enviadas', 'invitaciones_profesor', 'notificaciones', 'alumnos_vinculados',
+                 'solicitudes_pendientes', 'cursos_membresia', 'contrasena_salt')
+
+    # Campos persistidos del registro (todos salvo el email, que es la clave)
+    CAMPOS = ('nombre', 'contrasena_hash', 'rol', 'perfil_completo', 'datos_perfil', 'progreso',
+              'historial_temas', 'logros', 'estadisticas', 'cursos', 'profesores_vinculados',
+              'solicitudes_enviadas', 'invitaciones_profesor', 'notificaciones', 'alumnos_vinculados',
+              'solicitudes_pendientes', 'contrasena_salt', 'cursos_membresia')
+    # Campos que tocan la vinculación profesor-alumno y sus avisos
+    CAMPOS_VINCULACION = ('profesores_vinculados', 'solicitudes_enviadas', 'invitaciones_profesor',
+                          'notificaciones', 'alumnos_vinculados', 'solicitudes_pendientes')
+
     def __init__(self, email, nombre, contrasena_hash, rol, perfil_completo=False, datos_perfil=None,
                  progreso=None, historial_temas=None, logros=None, estadisticas=None, cursos=None,
-                 historial_actividad=None, profesores_vinculados=None, solicitudes_enviadas=None,
+                 profesores_vinculados=None, solicitudes_enviadas=None,
                  invitaciones_profesor=None, notificaciones=None, alumnos_vinculados=None,
-                 solicitudes_pendientes=None):
+                 solicitudes_pendientes=None, contrasena_salt=None, cursos_membresia=None):
         
         self.email = email
         self.nombre = nombre
         self.contrasena_hash = contrasena_hash
+        self.contrasena_salt = contrasena_salt  # None en los hashes heredados (ver data/contrasenas.py)
         self.rol = rol
         self.perfil_completo = perfil_completo
         self.datos_perfil = datos_perfil if datos_perfil is not None else {}
@@ -21,7 +69,8 @@ class User:
         self.logros = logros if logros is not None else {"primer_quiz": None, "mente_brillante": None, "racha_5": None, "polimata_5": None}
         self.estadisticas = estadisticas if estadisticas is not None else {"preguntas_totales": 0, "aciertos_totales": 0, "rendimiento_por_tema": {}}
         self.cursos = cursos if cursos is not None else []
-        self.historial_actividad = historial_actividad if historial_actividad is not None else []
+        self.cursos_membresia = cursos_membresia if cursos_membresia is not None else []  # [{'id_curso', 'rol_en_curso'}]
+        # El historial de actividad no forma parte del registro: se guarda y pagina aparte (data/gestion_actividad.py).
         
         # Campos específicos de Alumno
         self.profesores_vinculados = profesores_vinculados if profesores_vinculados is not None else []
@@ -36,6 +85,13 @@ class User:
     @classmethod
     def from_dict(cls, email, data):
         """Crea una instancia de User desde un diccionario de datos."""
+        if data.get(CAMPO_ESQUEMA) == VERSION_ESQUEMA:
+            # Registro ya migrado (ver data/esquema_usuarios.py): trae todos los campos, sin valores por defecto que aplicar
+            user = object.__new__(cls)
+            user.email = email
+            for campo in User.CAMPOS:
+                setattr(user, campo, data[campo])
+            return user
         return cls(
             email=email,
             nombre=data.get('nombre'),
@@ -48,42 +104,47 @@ class User:
             logros=data.get('logros'),
             estadisticas=data.get('estadisticas'),
             cursos=data.get('cursos'),
-            historial_actividad=data.get('historial_actividad'),
             profesores_vinculados=data.get('profesores_vinculados'),
             solicitudes_enviadas=data.get('solicitudes_enviadas'),
             invitaciones_profesor=data.get('invitaciones_profesor'),
             notificaciones=data.get('notificaciones'),
             alumnos_vinculados=data.get('alumnos_vinculados'),
-            solicitudes_pendientes=data.get('solicitudes_pendientes')
+            solicitudes_pendientes=data.get('solicitudes_pendientes'),
+            contrasena_salt=data.get('contrasena_salt'),
+            cursos_membresia=data.get('cursos_membresia')
         )
 
     def to_dict(self):
-        """Convierte la instancia de User a un diccionario para guardar en JSON."""
-        data = {
-            'nombre': self.nombre,
-            'contrasena_hash': self.contrasena_hash,
-            'rol': self.rol,
-            'perfil_completo': self.perfil_completo,
-            'datos_perfil': self.datos_perfil,
-            'progreso': self.progreso,
-            'historial_temas': self.historial_temas,
-            'logros': self.logros,
-            'estadisticas': self.estadisticas,
-            'cursos': self.cursos,
-            'historial_actividad': self.historial_actividad,
-        }
-        if self.rol == 'alumno':
-            data['profesores_vinculados'] = self.profesores_vinculados
-            data['solicitudes_enviadas'] = self.solicitudes_enviadas
-            data['invitaciones_profesor'] = self.invitaciones_profesor
-            data['notificaciones'] = self.notificaciones
-        elif self.rol == 'profesor':
-            data['alumnos_vinculados'] = self.alumnos_vinculados
-            data['solicitudes_pendientes'] = self.solicitudes_pendientes
+        """Convierte la instancia de User a un diccionario para guardar en JSON (registro completo, en la versión actual del esquema)."""
+        data = {campo: getattr(self, campo) for campo in User.CAMPOS}
+        data[CAMPO_ESQUEMA] = VERSION_ESQUEMA
         return data
 
+    def extraer_cambios(self):
+        """Datos a persistir con actualizar_datos_usuario. User devuelve el registro completo; LazyUser, solo lo modificado."""
+        return self.to_dict()
+
+    def sincronizar(self, datos: dict, campos):
+        """Copia 'campos' desde un registro recién guardado por otro camino (p. ej. modificar_usuario)."""
+        for nombre in campos:
+            if nombre in datos:
+                setattr(self, nombre, datos[nombre])
+
+    @staticmethod
+    def modificador(email, funcion, campos):
+        """
+        Función para user_dao.modificar_usuario: aplica funcion(user) a un User construido con el registro
+        actual (no con una copia leída antes) y copia al registro solo 'campos'. Puede llamarse más de una vez.
+        """
+        def modificar(datos):
+            user = User.from_dict(email, datos)
+            funcion(user)
+            for nombre in campos:
+                datos[nombre] = getattr(user, nombre)
+        return modificar
+
     def registrar_respuesta_quiz(self, tema, es_correcta, pregunta_texto, respuesta_usuario, respuesta_correcta_ia):
-        """Actualiza estadísticas y historial de actividad por una respuesta de quiz."""
+        """Actualiza estadísticas por una respuesta de quiz. Retorna la actividad a registrar en el historial."""
         self.estadisticas['preguntas_totales'] = self.estadisticas.get('preguntas_totales', 0) + 1
         if tema not in self.estadisticas.get('rendimiento_por_tema', {}):
             self.estadisticas['rendimiento_por_tema'][tema] = {"aciertos": 0, "total": 0}
@@ -93,18 +154,16 @@ class User:
             self.estadisticas['aciertos_totales'] = self.estadisticas.get('aciertos_totales', 0) + 1
             self.estadisticas['rendimiento_por_tema'][tema]['aciertos'] += 1
         
-        actividad = {
-            "fecha": datetime.now().isoformat(),
-            "tipo": "Quiz de Práctica" if self.rol == 'alumno' else "Revisión de Quiz (Profesor)", # Ajustar según contexto
-            "tema": tema,
-            "resultado": "Correcta" if es_correcta else "Incorrecta",
-            "pregunta": pregunta_texto,
-            "respuesta_usuario": str(respuesta_usuario),
-            "respuesta_correcta_ia": str(respuesta_correcta_ia),
-            "fue_correcta": es_correcta
-        }
-        if self.rol == 'alumno':
-            self.historial_actividad.insert(0, actividad)
+        return Activity(
+            fecha=datetime.now().isoformat(),
+            tipo="Quiz de Práctica" if self.rol == 'alumno' else "Revisión de Quiz (Profesor)", # Ajustar según contexto
+            tema=tema,
+            resultado="Correcta" if es_correcta else "Incorrecta",
+            pregunta=pregunta_texto,
+            respuesta_usuario=str(respuesta_usuario),
+            respuesta_correcta_ia=str(respuesta_correcta_ia),
+            fue_correcta=es_correcta
+        )
 
     def incrementar_racha(self):
         """Incrementa la racha de respuestas correctas."""
@@ -149,15 +208,12 @@ class User:
 
     def agregar_curso(self, curso_id, rol_en_curso):
         """Agrega un curso al usuario con un rol específico (alumno/profesor/co-profesor)."""
-        if not hasattr(self, 'cursos_membresia'):
-            self.cursos_membresia = []
         if not any(m['id_curso'] == curso_id for m in self.cursos_membresia):
             self.cursos_membresia.append({'id_curso': curso_id, 'rol_en_curso': rol_en_curso})
 
     def quitar_curso(self, curso_id):
         """Quita un curso de la membresía del usuario."""
-        if hasattr(self, 'cursos_membresia'):
-            self.cursos_membresia = [m for m in self.cursos_membresia if m['id_curso'] != curso_id]
+        self.cursos_membresia = [m for m in self.cursos_membresia if m['id_curso'] != curso_id]
 
     def encontrar_curso(self, id_curso):
         """Busca y retorna un curso por su ID."""
@@ -255,4 +311,95 @@ class User:
     def asignar_curso(self, curso_dict):
         """Agrega un curso completo (dict) a la lista de cursos del usuario."""
         if not any(c['id_curso'] == curso_dict['id_curso'] for c in self.cursos):
-            self.cursos.append(curso_dict)
\ No newline at end of file
+            self.cursos.append(curso_dict)
+
+
+class LazyUser(User):
+    """
+    User que se hidrata campo a campo: conserva cada campo del registro serializado (pickle)
+    y solo lo decodifica la primera vez que se accede a él. El login o una comprobación de rol
+    decodifican uno o dos campos en lugar de cursos, estadísticas y notificaciones.
+    extraer_cambios() devuelve solo los campos asignados o modificados desde la carga.
+    Creado con desde_credenciales, el perfil ni siquiera se lee hasta que hace falta un campo
+    que no está en las credenciales, o hasta que se llama a completar_carga().
+    """
+
+    __slots__ = ('_serializados', '_asignados', '_cargador', '_lock_carga')
+
+    def __init__(self, email, campos_serializados: dict, cargador=None):
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, '_serializados', dict(campos_serializados))
+        object.__setattr__(self, '_asignados', set())
+        object.__setattr__(self, '_cargador', cargador)  # callable -> campos serializados del resto del perfil
+        object.__setattr__(self, '_lock_carga', threading.Lock())
+
+    @classmethod
+    def cargar(cls, user_dao, email):
+        """Carga un usuario sin decodificar sus campos. Retorna None si no existe."""
+        email = email.lower()
+        campos = user_dao.cargar_usuario_serializado(email)
+        return cls(email, campos) if campos is not None else None
+
+    @classmethod
+    def desde_credenciales(cls, user_dao, email, credenciales: dict):
+        """Usuario con solo lo que trae la tabla de credenciales; el resto del perfil se carga después."""
+        email = email.lower()
+        campos = {'contrasena_hash': credenciales.get('hash'), 'contrasena_salt': credenciales.get('salt'),
+                  'rol': credenciales.get('rol'), 'perfil_completo': credenciales.get('perfil_completo', False)}
+        return cls(email, {campo: pickle.dumps(valor, pickle.HIGHEST_PROTOCOL) for campo, valor in campos.items()},
+                   cargador=lambda: user_dao.cargar_usuario_serializado(email))
+
+    def completar_carga(self):
+        """Lee el resto del perfil si aún no se leyó. Se puede llamar desde un hilo en segundo plano."""
+        with self._lock_carga:
+            if self._cargador is None:
+                return
+            campos = self._cargador()
+            if campos is not None:
+                self._serializados.update(campos)
+            object.__setattr__(self, '_cargador', None)
+
+    def __getattr__(self, nombre):
+        # Solo se llama si el atributo aún no existe, es decir, la primera vez que se usa un campo.
+        if nombre not in LazyUser.CAMPOS:
+            raise AttributeError(nombre)
+        if self._cargador is not None and nombre not in self._serializados:
+            self.completar_carga()
+        serializado = self._serializados.get(nombre)
+        if serializado is not None:
+            valor = pickle.loads(serializado)
+        else:
+            valor = getattr(User(self.email, None, None, None), nombre)  # valor por defecto del constructor
+        object.__setattr__(self, nombre, valor)
+        return valor
+
+    def __setattr__(self, nombre, valor):
+        if nombre in LazyUser.CAMPOS:
+            self._asignados.add(nombre)
+        object.__setattr__(self, nombre, valor)
+
+    def extraer_cambios(self):
+        """
+        Devuelve {campo: valor} con los campos asignados o modificados (también in situ) desde la carga
+        o desde la última llamada. Los campos que nunca se decodificaron no se tocan ni se comparan.
+        """
+        cambios = {}
+        for nombre in LazyUser.CAMPOS:
+            try:
+                valor = object.__getattribute__(self, nombre)  # no dispara __getattr__: solo campos ya decodificados
+            except AttributeError:
+                continue
+            serializado = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+            if nombre in self._asignados or serializado != self._serializados.get(nombre):
+                cambios[nombre] = valor
+                self._serializados[nombre] = serializado
+        self._asignados.clear()
+        return cambios
+
+    def sincronizar(self, datos: dict, campos):
+        """Como User.sincronizar, pero los campos copiados pasan a ser la nueva base: no cuentan como cambios."""
+        for nombre in campos:
+            if nombre in datos:
+                object.__setattr__(self, nombre, datos[nombre])
+                self._serializados[nombre] = pickle.dumps(datos[nombre], pickle.HIGHEST_PROTOCOL)
+                self._asignados.discard(nombre)
@@ -1,15 +1,18 @@
 # services/course_service.py
 
 from models.user_model import User
-from models.course_model import Course
+from models.course_model import Course, Membership
 from data import gestion_usuarios as user_dao
 from data import gestion_cursos as course_dao
+from data.repositorios import RepositorioCursos, RepositorioUsuarios
 from ai_integration.ai_service import AIService
 from services import curso_generator
 
 class CourseService:
-    def __init__(self, user_dao_module, ai_service_instance: AIService):
+    def __init__(self, user_dao_module: RepositorioUsuarios, ai_service_instance: AIService,
+                 course_dao_module: RepositorioCursos = course_dao):
         self.user_dao = user_dao_module
+        self.course_dao = course_dao_module
         self.ai_service = ai_service_instance
 
     def crear_curso(self, creador: User, tema: str):
@@ -19,32 +22,32 @@ class CourseService:
                 id_curso=new_course_data['id_curso'],
                 tema_general=tema,
                 creador_email=creador.email,
-                miembros=[{'email': creador.email, 'rol': 'profesor'}],
+                miembros=[Membership(creador.email, 'profesor')],
                 modulos=new_course_data['modulos']
             )
             creador.agregar_curso(course.id_curso, 'profesor')
-            self.user_dao.actualizar_datos_usuario(creador.email, creador.to_dict())
-            course_dao.actualizar_curso(course.to_dict())
+            self.user_dao.actualizar_datos_usuario(creador.email, creador.extraer_cambios())
+            self.course_dao.actualizar_curso(course.to_dict())
             return course
         return None
 
     def agregar_miembro_a_curso(self, course: Course, user: User, rol: str):
         course.agregar_miembro(user.email, rol)
         user.agregar_curso(course.id_curso, rol)
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
-        course_dao.actualizar_curso(course.to_dict())
+        self.user_dao.actualizar_datos_usuario(user.email, user.extraer_cambios())
+        self.course_dao.agregar_miembro(course.id_curso, user.email, rol)
 
     def quitar_miembro_de_curso(self, course: Course, user: User):
         course.quitar_miembro(user.email)
         user.quitar_curso(course.id_curso)
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
-        course_dao.actualizar_curso(course.to_dict())
+        self.user_dao.actualizar_datos_usuario(user.email, user.extraer_cambios())
+        self.course_dao.quitar_miembro(course.id_curso, user.email)
 
     def obtener_cursos_de_usuario(self, user: User):
-        return [Course.from_dict(c) for c in course_dao.obtener_cursos_de_usuario(user.email)]
+        return [Course.from_dict(c) for c in self.course_dao.obtener_cursos_de_usuario(user.email)]
 
     def obtener_curso_por_id(self, id_curso):
-        c = course_dao.obtener_curso_por_id(id_curso)
+        c = self.course_dao.obtener_curso_por_id(id_curso)
         return Course.from_dict(c) if c else None
 
     def crear_curso_para_usuario(self, user: User, topic: str):
@@ -54,15 +57,23 @@ class CourseService:
         """
         new_course_data = curso_generator.generar_silabo_curso(topic, self.ai_service)
         if new_course_data:
-            user.asignar_curso(new_course_data)
-            self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
+            # La generación tarda segundos y suele correr en un hilo: se agrega el curso sobre el registro
+            # actual en disco (no sobre el 'user' cargado antes) para no pisar cambios hechos entretanto.
+            def _asignar(datos):
+                alumno = User.from_dict(user.email, datos)
+                alumno.asignar_curso(new_course_data)
+                datos['cursos'] = alumno.cursos
+            datos = self.user_dao.modificar_usuario(user.email, _asignar)
+            if datos is None:
+                return None
+            user.sincronizar(datos, ('cursos',))
             return new_course_data
         return None
 
     def eliminar_curso_de_usuario(self, user: User, course_id: str):
         """Elimina un curso del perfil del usuario."""
         user.eliminar_curso(course_id)
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
+        self.user_dao.actualizar_datos_usuario(user.email, user.extraer_cambios())
         return True
 
     def obtener_teoria_subtema(self, user: User, course_id: str, module_id: str, subtema: str):
@@ -70,31 +81,44 @@ class CourseService:
         Obtiene la teoría de un subtema. Si no está cacheada, la genera con IA y la guarda.
         Retorna el texto de la teoría.
         """
+        return "".join(self.obtener_teoria_subtema_en_partes(user, course_id, module_id, subtema))
+
+    def obtener_teoria_subtema_en_partes(self, user: User, course_id: str, module_id: str, subtema: str):
+        """
+        Como obtener_teoria_subtema, pero por partes: la teoría cacheada llega de una vez y la nueva a medida
+        que la IA la genera. Solo se guarda en el curso si se generó completa.
+        """
         # Buscar el curso oficial (no solo el del usuario)
-        from data import gestion_cursos as course_dao
-        curso_oficial = course_dao.obtener_curso_por_id(course_id)
+        curso_oficial = self.obtener_curso_por_id(course_id)
         if not curso_oficial:
-            return "Error: Curso no encontrado."
-        modulo = next((m for m in curso_oficial['modulos'] if m['id_modulo'] == module_id), None)
+            yield "Error: Curso no encontrado."
+            return
+        modulo = curso_oficial.encontrar_modulo(module_id)
         if not modulo:
-            return "Error: Módulo no encontrado."
-        teoria_cache = modulo.get("teoria_generada", {}).get(subtema)
+            yield "Error: Módulo no encontrado."
+            return
+        teoria_cache = modulo.teoria_generada.get(subtema)
         if teoria_cache:
-            return teoria_cache
+            yield teoria_cache
         else:
-            from services import curso_generator
-            teoria = curso_generator.generar_teoria_subtema(subtema, self.ai_service)
-            if "No se pudo generar" not in teoria:
-                if 'teoria_generada' not in modulo:
-                    modulo['teoria_generada'] = {}
-                modulo['teoria_generada'][subtema] = teoria
-                course_dao.actualizar_curso(curso_oficial)
-            return teoria
+            partes = []
+            for parte in curso_generator.generar_teoria_subtema_en_partes(subtema, self.ai_service):
+                partes.append(parte)
+                yield parte
+            teoria = "".join(partes).strip()
+            if curso_generator.TEORIA_NO_GENERADA not in teoria:
+                def _guardar_teoria(curso_dict):
+                    curso = Course.from_dict(curso_dict)
+                    modulo_actual = curso.encontrar_modulo(module_id)
+                    if modulo_actual is not None:
+                        modulo_actual.teoria_generada.setdefault(subtema, teoria)
+                    return curso.to_dict()
+                self.course_dao.modificar_curso(course_id, _guardar_teoria)
 
     def marcar_modulo_completado(self, user: User, course_id: str, module_id: str, quiz_score: float):
         """
         Marca un módulo como completado y actualiza la calificación del examen.
         """
         user.actualizar_progreso_modulo(course_id, module_id, completado=True, calificacion_examen=quiz_score)
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
+        self.user_dao.actualizar_datos_usuario(user.email, user.extraer_cambios())
         return True
\ No newline at end of file
@@ -1,11 +1,25 @@
 # services/curso_generator.py
 
-import json
 import uuid
 # No importamos 'google.generativeai' directamente aquí.
 
 from ai_integration.ai_service import AIService # Importamos el AIService
 
+ESQUEMA_SILABO = {
+    'type': 'OBJECT',
+    'properties': {
+        'modulos': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {'titulo': {'type': 'STRING'}, 'subtemas': {'type': 'ARRAY', 'items': {'type': 'STRING'}}},
+                'required': ['titulo', 'subtemas'],
+            },
+        },
+    },
+    'required': ['modulos'],
+}
+
 def generar_silabo_curso(tema_general: str, ai_service: AIService):
     """
     Genera un sílabo de curso utilizando la IA de Gemini.
@@ -19,10 +33,10 @@ def generar_silabo_curso(tema_general: str, ai_service: AIService):
         '{"modulos": [{"titulo": "Módulo 1: ...", "subtemas": ["Subtema 1.1", "Subtema 1.2"]}]}'
     )
     try:
-        # Usamos el método send_message del AIService
-        response_text = ai_service.send_message(prompt, current_topic=tema_general)
-        json_text = response_text.strip().replace("```json", "").replace("```", "")
-        silabo = json.loads(json_text)
+        # Generación de una sola vez con el esquema del sílabo, fuera de la sesión de chat
+        silabo = ai_service.generate_structured(prompt, ESQUEMA_SILABO, tarea='silabo')
+        if silabo is None:
+            return None
 
         curso_completo = {
             "id_curso": f"curso_{uuid.uuid4().hex[:8]}",
@@ -45,20 +59,42 @@ def generar_silabo_curso(tema_general: str, ai_service: AIService):
         print(f"Error generando sílabo del curso: {e}")
         return None
 
+TEORIA_NO_GENERADA = "No se pudo generar la teoría para este subtema."
+
+def _prompt_teoria(subtema: str):
+    return (
+        "Actúa como un profesor de matemáticas claro y conciso. Explica el siguiente concepto: "
+        f"'{subtema}'. Proporciona la teoría fundamental, cualquier fórmula clave y un ejemplo simple resuelto. "
+        "Usa un lenguaje fácil de entender."
+    )
+
 def generar_teoria_subtema(subtema: str, ai_service: AIService):
     """
     Genera teoría para un subtema utilizando la IA de Gemini.
     Recibe una instancia de AIService para la comunicación con la IA.
     """
-    prompt = (
-        "Actúa como un profesor de matemáticas claro y conciso. Explica el siguiente concepto: "
-        f"'{subtema}'. Proporciona la teoría fundamental, cualquier fórmula clave y un ejemplo simple resuelto. "
-        "Usa un lenguaje fácil de entender."
-    )
     try:
-        # Usamos el método send_message del AIService
-        response_text = ai_service.send_message(prompt, current_topic=subtema)
-        return response_text.strip()
+        # Generación de una sola vez, fuera de la sesión de chat
+        teoria = ai_service.generate_text(_prompt_teoria(subtema), tarea='teoria')
+        if teoria is None:
+            return TEORIA_NO_GENERADA
+        return teoria
+    except Exception as e:
+        print(f"Error generando teoría del subtema: {e}")
+        return TEORIA_NO_GENERADA
+
+def generar_teoria_subtema_en_partes(subtema: str, ai_service: AIService):
+    """
+    Como generar_teoria_subtema, pero va devolviendo el texto por partes a medida que la IA lo genera.
+    Si la IA falla, la última parte es TEORIA_NO_GENERADA.
+    """
+    hubo_texto = False
+    try:
+        for parte in ai_service.stream_text(_prompt_teoria(subtema), tarea='teoria'):
+            hubo_texto = True
+            yield parte
+        if not hubo_texto:
+            yield TEORIA_NO_GENERADA
     except Exception as e:
         print(f"Error generando teoría del subtema: {e}")
-        return "No se pudo generar la teoría para este subtema."
\ No newline at end of file
+        yield ("\n\n" if hubo_texto else "") + TEORIA_NO_GENERADA
\ No newline at end of file
@@ -1,12 +1,39 @@
 # services/ejercicios.py
 
-import json
 import random
 # Ya no importamos 'datetime' aquí, se maneja en user_model o en el servicio que registra la actividad.
 # No importamos 'google.generativeai' directamente aquí.
 
 # Importamos el AIService que será el encargado de la comunicación con Gemini
 from ai_integration.ai_service import AIService
+from models.question_model import Question
+
+# Esquema de respuesta que se pide a la IA para cualquier quiz o examen: una lista de preguntas.
+ESQUEMA_PREGUNTAS = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'pregunta': {'type': 'STRING'},
+            'opciones': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+            'respuesta': {'type': 'STRING'},
+        },
+        'required': ['pregunta', 'opciones', 'respuesta'],
+    },
+}
+
+def _normalizar_preguntas(quiz_data):
+    """Convierte la lista devuelta por la IA en preguntas válidas (dicts) con las opciones mezcladas."""
+    preguntas = []
+    for problema in quiz_data:
+        try:
+            pregunta = Question.from_dict(problema)
+        except ValueError as e:
+            print(f"Pregunta descartada: {e}")
+            continue
+        random.shuffle(pregunta.opciones)
+        preguntas.append(pregunta.to_dict())
+    return preguntas
 
 def _construir_modificador_contextual(datos_perfil_usuario):
     """
@@ -66,23 +93,16 @@ def generar_quiz_nivelacion_con_ia(nivel_estudios: str, ai_service: AIService):
     )
 
     try:
-        # Usamos el método send_message del AIService para interactuar con la IA
-        response_text = ai_service.send_message(prompt_para_ia)
+        # Generación de una sola vez: no pasa por la sesión de chat ni alarga su historial
+        quiz_data = ai_service.generate_structured(prompt_para_ia, ESQUEMA_PREGUNTAS, tarea='quiz_nivelacion')
         
-        json_text = response_text.strip().replace("```json", "").replace("```", "")
-        quiz_data = json.loads(json_text)
-        
-        # Asegurarse de que la respuesta sea una lista
+        # generate_structured ya comprueba el esquema; None significa que la IA falló
         if not isinstance(quiz_data, list):
             print(f"La respuesta de la IA no es una lista: {quiz_data}")
             return []
             
-        for problema in quiz_data:
-            if "opciones" in problema and isinstance(problema["opciones"], list):
-                random.shuffle(problema["opciones"])
-        
-        return quiz_data
-    except (json.JSONDecodeError, KeyError, Exception) as e:
+        return _normalizar_preguntas(quiz_data)
+    except Exception as e:
         print(f"Error generando quiz de nivelación con IA: {e}")
         return []
 
@@ -105,15 +125,11 @@ def generar_quiz_tematico_con_ia(tema: str, nivel: int, num_preguntas: int, ai_s
     )
 
     try:
-        response_text = ai_service.send_message(prompt_para_ia, user_level=nivel, user_profile_data=datos_perfil_usuario, current_topic=tema)
-        json_text = response_text.strip().replace("```json", "").replace("```", "")
-        quiz_data = json.loads(json_text)
+        quiz_data = ai_service.generate_structured(prompt_para_ia, ESQUEMA_PREGUNTAS, tarea='quiz', usar_cache=False)
         if isinstance(quiz_data, list):
-            for problema in quiz_data:
-                if "opciones" in problema: random.shuffle(problema["opciones"])
-            return quiz_data
+            return _normalizar_preguntas(quiz_data)
         else: return []
-    except (json.JSONDecodeError, KeyError, Exception) as e:
+    except Exception as e:
         print(f"Error generando quiz temático con IA: {e}"); return []
 
 
@@ -134,13 +150,9 @@ def generar_examen_modulo(subtemas: list, nivel: int, num_preguntas: int, ai_ser
     )
     
     try:
-        response_text = ai_service.send_message(prompt, user_level=nivel, user_profile_data=datos_perfil_usuario, current_topic=temas_str)
-        json_text = response_text.strip().replace("```json", "").replace("```", "")
-        quiz_data = json.loads(json_text)
+        quiz_data = ai_service.generate_structured(prompt, ESQUEMA_PREGUNTAS, tarea='examen', usar_cache=False)
         if isinstance(quiz_data, list):
-            for problema in quiz_data:
-                if "opciones" in problema: random.shuffle(problema["opciones"])
-            return quiz_data
+            return _normalizar_preguntas(quiz_data)
         else: return []
     except Exception as e:
         print(f"Error generando examen de módulo: {e}"); return []
\ No newline at end of file
@@ -1,14 +1,15 @@
 # services/learning_service.py
 
-from models.user_model import User
+from models.user_model import User, Activity
 from data import gestion_usuarios as user_dao
+from data.repositorios import RepositorioUsuarios
 from ai_integration.ai_service import AIService
 from services import ejercicios # Ahora `ejercicios` se trata como un módulo auxiliar para este servicio
 import logros # El refactorizado logros.py
 from datetime import datetime
 
 class LearningService:
-    def __init__(self, user_dao_module, ai_service_instance: AIService):
+    def __init__(self, user_dao_module: RepositorioUsuarios, ai_service_instance: AIService):
         self.user_dao = user_dao_module # Pasamos el módulo gestion_usuarios
         self.ai_service = ai_service_instance
 
@@ -19,7 +20,9 @@ class LearningService:
     def generar_quiz_tematico(self, user: User, topic: str, num_questions: int):
         """Genera un quiz temático para el usuario."""
         user.agregar_historial_tema(topic) # Actualiza el historial de temas del usuario
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict()) # Persiste el historial
+        self._registrar_cambios(user, [ # Persiste solo el historial de temas
+            {'op': 'set', 'ruta': ['historial_temas'], 'valor': user.historial_temas}
+        ])
         return ejercicios.generar_quiz_tematico_con_ia(topic, user.progreso.get('nivel'), num_questions, self.ai_service, user.datos_perfil)
     
     def generar_examen_modulo(self, user: User, subtemas: list, num_questions: int):
@@ -45,7 +48,7 @@ class LearningService:
         es_correcta = (str(opcion_elegida) == str(respuesta_correcta))
 
         # Actualizar estadísticas en el modelo User
-        user.registrar_respuesta_quiz(tema, es_correcta, pregunta_data['pregunta'], opcion_elegida, respuesta_correcta)
+        actividad = user.registrar_respuesta_quiz(tema, es_correcta, pregunta_data['pregunta'], opcion_elegida, respuesta_correcta)
         
         # Actualizar racha y nivel en el modelo User
         if es_correcta:
@@ -59,8 +62,19 @@ class LearningService:
         # Verificar y actualizar logros (la función de logros modifica el objeto User)
         unlocked_achievements = logros.verificar_y_actualizar_logros(user, 'respuesta_correcta')
 
-        # Persistir los cambios en la base de datos
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict())
+        # Persistir solo lo que cambió (log de cambios, sin reescribir el registro completo)
+        cambios = [
+            {'op': 'inc', 'ruta': ['estadisticas', 'preguntas_totales'], 'valor': 1},
+            {'op': 'inc', 'ruta': ['estadisticas', 'rendimiento_por_tema', tema, 'total'], 'valor': 1},
+        ]
+        if es_correcta:
+            cambios.append({'op': 'inc', 'ruta': ['estadisticas', 'aciertos_totales'], 'valor': 1})
+            cambios.append({'op': 'inc', 'ruta': ['estadisticas', 'rendimiento_por_tema', tema, 'aciertos'], 'valor': 1})
+        cambios.append({'op': 'set', 'ruta': ['progreso'], 'valor': user.progreso})
+        cambios.extend(self._cambios_logros(user, unlocked_achievements))
+        self._registrar_cambios(user, cambios)
+        if user.rol == 'alumno':
+            self.user_dao.registrar_actividad(user.email, actividad.to_dict())
         
         return es_correcta, unlocked_achievements
 
@@ -78,14 +92,14 @@ class LearningService:
             list[str]: IDs de logros desbloqueados.
         """
         # Aquí se registra la actividad en el historial del usuario
-        actividad = {
-            "fecha": datetime.now().isoformat(),
-            "tipo": "Examen de Módulo" if is_exam else "Quiz de Práctica",
-            "tema": quiz_results['topic'],
-            "resultado": f"{quiz_results['correct_answers']}/{quiz_results['total_questions']}",
-            "preguntas": quiz_results['questions_details'] # Lista de dicts con pregunta, respuesta_usuario, fue_correcta, etc.
-        }
-        user.historial_actividad.insert(0, actividad)
+        actividad = Activity(
+            fecha=datetime.now().isoformat(),
+            tipo="Examen de Módulo" if is_exam else "Quiz de Práctica",
+            tema=quiz_results['topic'],
+            resultado=f"{quiz_results['correct_answers']}/{quiz_results['total_questions']}",
+            preguntas=quiz_results['questions_details'] # Lista de dicts con pregunta, respuesta_usuario, fue_correcta, etc.
+        )
+        self.user_dao.registrar_actividad(user.email, actividad.to_dict())
 
         # Verificar y actualizar logros post-quiz
         unlocked_achievements = logros.verificar_y_actualizar_logros(user, 'post_quiz', quiz_data={
@@ -97,6 +111,20 @@ class LearningService:
         # Se llama de nuevo con 'post_quiz' para que la lógica de logros verifique los temas distintos
         unlocked_achievements.extend(logros.verificar_y_actualizar_logros(user, 'polimata_5'))
 
-        self.user_dao.actualizar_datos_usuario(user.email, user.to_dict()) # Persistir los cambios del usuario
+        # Persistir los logros como cambios pequeños (la actividad ya quedó en su propio log)
+        self._registrar_cambios(user, self._cambios_logros(user, unlocked_achievements))
+
+        return unlocked_achievements
+
+    def _registrar_cambios(self, user: User, cambios: list):
+        """
+        Persiste los cambios en el log del usuario y marca los campos tocados como ya guardados, para que
+        el próximo extraer_cambios() no los vuelva a escribir enteros desde memoria.
+        """
+        if self.user_dao.registrar_cambios(user.email, cambios):
+            campos = {cambio['ruta'][0] for cambio in cambios}
+            user.sincronizar({campo: getattr(user, campo) for campo in campos}, campos)
 
-        return unlocked_achievements
\ No newline at end of file
+    def _cambios_logros(self, user: User, logros_ids: list):
+        """Cambios para persistir la fecha de los logros recién desbloqueados."""
+        return [{'op': 'set', 'ruta': ['logros', logro_id], 'valor': user.logros[logro_id]} for logro_id in logros_ids]
\ No newline at end of file
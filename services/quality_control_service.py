@@ -1,21 +1,16 @@
 # services/quality_control_service.py
 
-import json
-import os
 from datetime import datetime
 import uuid
 
-RUTA_CORRECCIONES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'correcciones.json')
+from data import gestion_reportes as reportes_dao
+from data.repositorios import RepositorioReportes
 
 class QualityControlService:
-    def __init__(self):
-        # Asegurarse de que el archivo existe al inicializar
-        if not os.path.exists(RUTA_CORRECCIONES):
-            try:
-                with open(RUTA_CORRECCIONES, 'w', encoding='utf-8') as f:
-                    json.dump([], f, indent=4, ensure_ascii=False)
-            except IOError as e:
-                print(f"Error al crear correcciones.json: {e}")
+    def __init__(self, reportes_dao_module: RepositorioReportes = reportes_dao):
+        # Los reportes viven en un log de solo anexado (ver data/gestion_reportes.py);
+        # el correcciones.json heredado se migra en la primera lectura.
+        self.reportes_dao = reportes_dao_module
 
     def guardar_reporte(self, email_profesor, pregunta_original_data, correccion_data):
         """
@@ -23,15 +18,6 @@ class QualityControlService:
         pregunta_original_data debe contener 'pregunta', 'respuesta_correcta_ia'
         correccion_data debe contener 'respuesta_profesor', 'justificacion'
         """
-        try:
-            if not os.path.exists(RUTA_CORRECCIONES):
-                lista_reportes = []
-            else:
-                with open(RUTA_CORRECCIONES, 'r', encoding='utf-8') as f:
-                    lista_reportes = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            lista_reportes = []
-
         nuevo_reporte = {
             "id_reporte": f"rep_{uuid.uuid4().hex[:8]}",
             "fecha": datetime.now().isoformat(),
@@ -41,40 +27,40 @@ class QualityControlService:
             "estado": "pendiente" # Puede ser 'pendiente', 'revisado', 'aplicado'
         }
 
-        lista_reportes.insert(0, nuevo_reporte) # Añadir al principio
-
         try:
-            with open(RUTA_CORRECCIONES, 'w', encoding='utf-8') as f:
-                json.dump(lista_reportes, f, indent=4, ensure_ascii=False)
+            self.reportes_dao.agregar_reporte(nuevo_reporte)
             return True
         except IOError as e:
-            print(f"Error al guardar reporte en correcciones.json: {e}")
+            print(f"Error al guardar reporte en correcciones.jsonl: {e}")
             return False
 
-    def obtener_reportes(self):
-        """Carga y retorna todos los reportes de correcciones."""
+    def obtener_reportes(self, estado=None, email_profesor=None, limite=None, desplazamiento=0):
+        """
+        Retorna los reportes de correcciones, más reciente primero. Sin argumentos, todos;
+        con 'estado' / 'email_profesor' se filtran por índice, y 'limite' / 'desplazamiento' paginan.
+        """
         try:
-            with open(RUTA_CORRECCIONES, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            return self.reportes_dao.obtener_reportes(estado=estado, email_profesor=email_profesor,
+                                                      limite=limite, desplazamiento=desplazamiento)
+        except IOError as e:
+            print(f"Error al leer correcciones.jsonl: {e}")
             return []
-    
-    def actualizar_estado_reporte(self, reporte_id, nuevo_estado):
-        """Actualiza el estado de un reporte específico."""
-        reportes = self.obtener_reportes()
-        for reporte in reportes:
-            if reporte.get('id_reporte') == reporte_id:
-                reporte['estado'] = nuevo_estado
-                self.guardar_reportes_raw(reportes) # Usar una función interna para guardar la lista completa
-                return True
-        return False
 
-    def guardar_reportes_raw(self, reportes_list):
-        """Función interna para guardar la lista de reportes directamente."""
+    def contar_reportes(self, estado=None, email_profesor=None):
+        """Número de reportes con esos filtros (para paginar)."""
         try:
-            with open(RUTA_CORRECCIONES, 'w', encoding='utf-8') as f:
-                json.dump(reportes_list, f, indent=4, ensure_ascii=False)
-            return True
+            return self.reportes_dao.contar_reportes(estado=estado, email_profesor=email_profesor)
+        except IOError:
+            return 0
+
+    def obtener_reportes_de_pregunta(self, pregunta: str):
+        """Reportes sobre la misma pregunta (comparada sin mayúsculas ni espacios extra)."""
+        return self.reportes_dao.obtener_reportes(pregunta=pregunta)
+
+    def actualizar_estado_reporte(self, reporte_id, nuevo_estado):
+        """Actualiza el estado de un reporte específico. Solo se anexa el cambio, no se reescriben los reportes."""
+        try:
+            return self.reportes_dao.cambiar_estado(reporte_id, nuevo_estado, datetime.now().isoformat())
         except IOError as e:
-            print(f"Error al guardar correcciones.json: {e}")
-            return False
\ No newline at end of file
+            print(f"Error al actualizar el reporte {reporte_id}: {e}")
+            return False
@@ -1,6 +1,6 @@
 # services/teacher_service.py (VERSIÓN FINAL Y COMPLETA)
 
-from models.user_model import User
+from models.user_model import User, LazyUser
 from data import gestion_usuarios as user_dao
 from services.auth_service import AuthService
 from services.course_service import CourseService
@@ -21,12 +21,10 @@ class TeacherService:
         Retorna (True, mensaje_exito) o (False, mensaje_error).
         """
         alumno_email = alumno_email.lower()
-        all_users_data = self.user_dao.cargar_usuarios()
-        
-        if alumno_email not in all_users_data or all_users_data[alumno_email].get('rol') != 'alumno':
+        alumno_user_obj = LazyUser.cargar(self.user_dao, alumno_email)
+
+        if alumno_user_obj is None or alumno_user_obj.rol != 'alumno':
             return False, "No se encontró un alumno con ese correo electrónico."
-        
-        alumno_user_obj = User.from_dict(alumno_email, all_users_data[alumno_email])
 
         if alumno_user_obj.email in profesor_user.alumnos_vinculados:
             return False, "Este alumno ya está vinculado contigo."
@@ -34,9 +32,12 @@ class TeacherService:
         if profesor_user.email in alumno_user_obj.invitaciones_profesor:
             return False, "Ya le has enviado una invitación a este alumno y está pendiente."
 
-        if alumno_user_obj.recibir_invitacion_profesor(profesor_user.email):
-            alumno_user_obj.agregar_notificacion(f"El profesor {profesor_user.nombre} te ha invitado a vincularte.")
-            self.user_dao.actualizar_datos_usuario(alumno_user_obj.email, alumno_user_obj.to_dict())
+        def _invitar(alumno):
+            if alumno.recibir_invitacion_profesor(profesor_user.email):
+                alumno.agregar_notificacion(f"El profesor {profesor_user.nombre} te ha invitado a vincularte.")
+        # Un solo registro: modificar_usuario basta (una transacción añadiría el diario sin ganar nada)
+        datos = self.user_dao.modificar_usuario(alumno_email, User.modificador(alumno_email, _invitar, User.CAMPOS_VINCULACION))
+        if datos is not None and profesor_user.email in datos.get('invitaciones_profesor', []):
             return True, f"Invitación enviada a {alumno_email}."
         
         return False, "No se pudo enviar la invitación (posiblemente ya existe)."
@@ -47,36 +48,38 @@ class TeacherService:
         Retorna (True, mensaje_exito) o (False, mensaje_error).
         """
         alumno_email = alumno_email.lower()
-        all_users_data = self.user_dao.cargar_usuarios()
+        alumno_user_obj = LazyUser.cargar(self.user_dao, alumno_email)
         
-        if alumno_email not in all_users_data or all_users_data[alumno_email].get('rol') != 'alumno':
+        if alumno_user_obj is None or alumno_user_obj.rol != 'alumno':
             return False, "No se encontraron los datos del alumno."
 
-        alumno_user_obj = User.from_dict(alumno_email, all_users_data[alumno_email])
-
-        if profesor_user.email in alumno_user_obj.solicitudes_enviadas:
-            alumno_user_obj.solicitudes_enviadas.remove(profesor_user.email)
-        
-        if aceptar:
-            success_prof_side = profesor_user.aceptar_solicitud_alumno(alumno_email)
-
-            if success_prof_side:
-                alumno_user_obj.agregar_notificacion(f"El profesor {profesor_user.nombre} ha aceptado tu solicitud de vinculación.")
-                self.user_dao.actualizar_datos_usuario(alumno_user_obj.email, alumno_user_obj.to_dict())
-                self.user_dao.actualizar_datos_usuario(profesor_user.email, profesor_user.to_dict()) 
-                return True, f"Solicitud de {alumno_email} aceptada y vinculación establecida."
-            else:
+        # profesor_user es el de la sesión: las solicitudes llegadas después del login solo están en disco
+        self._refrescar_vinculacion(profesor_user)
+        if alumno_email not in profesor_user.solicitudes_pendientes:
+            if aceptar:
                 return False, f"No se pudo aceptar la solicitud de {alumno_email} (posiblemente ya vinculado o no pendiente)."
-        else:
-            success_prof_side = profesor_user.rechazar_solicitud_alumno(alumno_email)
-            
-            if success_prof_side:
-                alumno_user_obj.agregar_notificacion(f"El profesor {profesor_user.nombre} ha rechazado tu solicitud de vinculación.")
-                self.user_dao.actualizar_datos_usuario(alumno_user_obj.email, alumno_user_obj.to_dict())
-                self.user_dao.actualizar_datos_usuario(profesor_user.email, profesor_user.to_dict()) 
-                return True, f"Solicitud de {alumno_email} rechazada."
+            return False, f"No se pudo rechazar la solicitud de {alumno_email} (posiblemente no pendiente)."
+
+        texto = (f"El profesor {profesor_user.nombre} ha aceptado tu solicitud de vinculación." if aceptar
+                 else f"El profesor {profesor_user.nombre} ha rechazado tu solicitud de vinculación.")
+        def _lado_alumno(alumno):
+            if profesor_user.email in alumno.solicitudes_enviadas:
+                alumno.solicitudes_enviadas.remove(profesor_user.email)
+            alumno.agregar_notificacion(texto)
+        def _lado_profesor(profesor):
+            if aceptar:
+                profesor.aceptar_solicitud_alumno(alumno_email)
             else:
-                return False, f"No se pudo rechazar la solicitud de {alumno_email} (posiblemente no pendiente)."
+                profesor.rechazar_solicitud_alumno(alumno_email)
+        # Cada lado se aplica al confirmar, sobre el registro de ese momento: no pisa lo que otros escribieron
+        with self.user_dao.transaccion():
+            self.user_dao.modificar_usuario(alumno_email, User.modificador(alumno_email, _lado_alumno, User.CAMPOS_VINCULACION))
+            self.user_dao.modificar_usuario(profesor_user.email, User.modificador(profesor_user.email, _lado_profesor, User.CAMPOS_VINCULACION))
+        self._refrescar_vinculacion(profesor_user)
+
+        if aceptar:
+            return True, f"Solicitud de {alumno_email} aceptada y vinculación establecida."
+        return True, f"Solicitud de {alumno_email} rechazada."
         
     def desvincular_alumno(self, profesor_user: User, alumno_email: str) -> tuple[bool, str]:
         """
@@ -84,22 +87,32 @@ class TeacherService:
         Retorna (True, mensaje_exito) o (False, mensaje_error).
         """
         alumno_email = alumno_email.lower()
-        all_users_data = self.user_dao.cargar_usuarios()
+        alumno_user_obj = LazyUser.cargar(self.user_dao, alumno_email)
 
-        if alumno_email not in all_users_data or all_users_data[alumno_email].get('rol') != 'alumno':
+        if alumno_user_obj is None or alumno_user_obj.rol != 'alumno':
             return False, "No se encontraron los datos del alumno a desvincular."
-        
-        alumno_user_obj = User.from_dict(alumno_email, all_users_data[alumno_email])
-
-        if profesor_user.desvincular_alumno(alumno_email):
-            if profesor_user.email in alumno_user_obj.profesores_vinculados:
-                alumno_user_obj.profesores_vinculados.remove(profesor_user.email)
-                alumno_user_obj.agregar_notificacion(f"El profesor {profesor_user.nombre} te ha desvinculado.")
-                self.user_dao.actualizar_datos_usuario(profesor_user.email, profesor_user.to_dict())
-                self.user_dao.actualizar_datos_usuario(alumno_user_obj.email, alumno_user_obj.to_dict())
-                return True, f"{alumno_email} ha sido desvinculado exitosamente."
-        
-        return False, "El alumno no estaba vinculado."
+
+        self._refrescar_vinculacion(profesor_user)
+        if alumno_email not in profesor_user.alumnos_vinculados:
+            return False, "El alumno no estaba vinculado."
+
+        def _lado_profesor(profesor):
+            profesor.desvincular_alumno(alumno_email)
+        def _lado_alumno(alumno):
+            if profesor_user.email in alumno.profesores_vinculados:
+                alumno.profesores_vinculados.remove(profesor_user.email)
+                alumno.agregar_notificacion(f"El profesor {profesor_user.nombre} te ha desvinculado.")
+        with self.user_dao.transaccion():
+            self.user_dao.modificar_usuario(profesor_user.email, User.modificador(profesor_user.email, _lado_profesor, User.CAMPOS_VINCULACION))
+            self.user_dao.modificar_usuario(alumno_email, User.modificador(alumno_email, _lado_alumno, User.CAMPOS_VINCULACION))
+        self._refrescar_vinculacion(profesor_user)
+        return True, f"{alumno_email} ha sido desvinculado exitosamente."
+
+    def _refrescar_vinculacion(self, user: User):
+        """Trae al usuario en memoria los campos de vinculación guardados (sin marcarlos como cambios)."""
+        datos = self.user_dao.cargar_usuario(user.email)
+        if datos is not None:
+            user.sincronizar(datos, User.CAMPOS_VINCULACION)
 
     def obtener_alumnos_vinculados_con_data(self, profesor_user: User) -> list[dict]:
         """
@@ -107,12 +120,10 @@ class TeacherService:
         Incluye nombre, email y un resumen de estadísticas/progreso.
         """
         alumnos_data = []
-        all_users_data = self.user_dao.cargar_usuarios()
 
         for email_alumno in profesor_user.alumnos_vinculados:
-            alumno_full_data = all_users_data.get(email_alumno)
-            if alumno_full_data:
-                alumno_obj = User.from_dict(email_alumno, alumno_full_data)
+            alumno_obj = LazyUser.cargar(self.user_dao, email_alumno)
+            if alumno_obj:
                 alumnos_data.append({
                     "email": alumno_obj.email,
                     "nombre": alumno_obj.nombre,
@@ -120,32 +131,42 @@ class TeacherService:
                     "preguntas_totales": alumno_obj.estadisticas.get('preguntas_totales', 0),
                     "aciertos_totales": alumno_obj.estadisticas.get('aciertos_totales', 0),
                     "rendimiento_por_tema": alumno_obj.estadisticas.get('rendimiento_por_tema', {}),
-                    "historial_actividad_reciente": alumno_obj.historial_actividad[:10],
                     "cursos_asignados": alumno_obj.cursos
                 })
         return alumnos_data
     
+    def obtener_actividad_alumno(self, profesor_user: User, email_alumno: str, limite: int = 10, antes: int = None):
+        """
+        Retorna una página del historial de actividad de un alumno vinculado: (actividades, cursor).
+        Pasar el cursor recibido como 'antes' para obtener la página siguiente (None si no hay más).
+        """
+        if email_alumno.lower() not in profesor_user.alumnos_vinculados:
+            return [], None
+        return self.user_dao.obtener_actividad(email_alumno, limite, antes)
+
     def asignar_curso_a_alumno(self, profesor_user: User, alumno_email: str, tema: str) -> tuple[bool, str]:
         """
         Asigna un nuevo curso a un alumno vinculado.
         Retorna (True, mensaje_exito) o (False, mensaje_error).
         """
         alumno_email = alumno_email.lower()
-        all_users_data = self.user_dao.cargar_usuarios()
+        alumno_user_obj = LazyUser.cargar(self.user_dao, alumno_email)
 
-        if alumno_email not in all_users_data or all_users_data[alumno_email].get('rol') != 'alumno':
+        if alumno_user_obj is None or alumno_user_obj.rol != 'alumno':
             return False, "No se encontró el alumno o no es un alumno válido."
         
         if alumno_email not in profesor_user.alumnos_vinculados:
             return False, "El alumno no está vinculado con este profesor."
-
-        alumno_user_obj = User.from_dict(alumno_email, all_users_data[alumno_email])
         
         nuevo_curso = self.course_service.crear_curso_para_usuario(alumno_user_obj, tema)
         
         if nuevo_curso:
-            alumno_user_obj.agregar_notificacion(f"Tu profesor, {profesor_user.nombre}, te ha asignado un nuevo curso sobre '{tema}'.")
-            self.user_dao.actualizar_datos_usuario(alumno_user_obj.email, alumno_user_obj.to_dict()) 
+            texto = f"Tu profesor, {profesor_user.nombre}, te ha asignado un nuevo curso sobre '{tema}'."
+            def _notificar(datos):
+                alumno = User.from_dict(alumno_email, datos)
+                alumno.agregar_notificacion(texto)
+                datos['notificaciones'] = alumno.notificaciones
+            self.user_dao.modificar_usuario(alumno_email, _notificar)
             return True, f"Curso sobre '{tema}' asignado a {alumno_email}."
         
         return False, "No se pudo generar y asignar el curso."
@@ -157,9 +178,9 @@ class TeacherService:
         """
         return self.qc_service.guardar_reporte(profesor_email, pregunta_original_data, correccion_data)
     
-    def obtener_reportes_correccion(self):
-        """Obtiene todos los reportes de corrección de la IA."""
-        return self.qc_service.obtener_reportes()
+    def obtener_reportes_correccion(self, estado: str = None, limite: int = None, desplazamiento: int = 0):
+        """Obtiene los reportes de corrección de la IA (todos, o una página filtrada por estado)."""
+        return self.qc_service.obtener_reportes(estado=estado, limite=limite, desplazamiento=desplazamiento)
 
     def actualizar_estado_reporte_correccion(self, reporte_id: str, nuevo_estado: str) -> bool:
         """Actualiza el estado de un reporte de corrección de la IA."""
@@ -0,0 +1,52 @@
+# tests/conftest.py
+#
+# Las pruebas del almacenamiento JSON trabajan en un directorio temporal: se redirigen las rutas
+# de data/ y se vacían las cachés de cada módulo, para no tocar los datos reales ni depender del
+# orden de las pruebas.
+#
+#     python -m pytest -q
+
+import pytest
+
+from data import (gestion_actividad, gestion_credenciales, gestion_cursos, gestion_reportes,
+                  gestion_usuarios, indices, respaldo)
+from data.bloqueo_archivos import BloqueoArchivo
+
+
+@pytest.fixture
+def almacen_json(tmp_path, monkeypatch):
+    """Redirige el almacenamiento JSON a tmp_path y devuelve ese directorio."""
+    monkeypatch.delenv('BRAINCOURSE_STORAGE', raising=False)
+
+    monkeypatch.setattr(gestion_usuarios, 'RUTA_USUARIOS', str(tmp_path / 'usuarios.json'))
+    monkeypatch.setattr(gestion_usuarios, 'DIR_USUARIOS', str(tmp_path / 'usuarios'))
+    monkeypatch.setattr(gestion_usuarios, '_bloqueo_migracion', BloqueoArchivo(str(tmp_path / 'usuarios.json.lock')))
+    monkeypatch.setattr(gestion_usuarios, '_bloqueo_transacciones', BloqueoArchivo(str(tmp_path / 'transacciones.lock')))
+    monkeypatch.setattr(gestion_usuarios, '_bloqueos', {})
+    monkeypatch.setattr(gestion_usuarios, '_secuencias', {})
+    monkeypatch.setattr(gestion_usuarios, '_pendientes', {})
+    monkeypatch.setattr(gestion_usuarios, '_cache', gestion_usuarios._CacheRegistros())
+    monkeypatch.setattr(gestion_usuarios, '_diario_revisado', False)
+
+    monkeypatch.setattr(gestion_credenciales, 'RUTA_CREDENCIALES', str(tmp_path / 'credenciales.jsonl'))
+    monkeypatch.setattr(gestion_credenciales, '_bloqueo', BloqueoArchivo(str(tmp_path / 'credenciales.jsonl.lock')))
+    monkeypatch.setattr(gestion_credenciales, '_tabla', gestion_credenciales._TablaCredenciales())
+
+    monkeypatch.setattr(gestion_actividad, 'DIR_ACTIVIDAD', str(tmp_path / 'actividad'))
+    monkeypatch.setattr(gestion_actividad, 'DIR_ARCHIVO', str(tmp_path / 'actividad' / 'archivo'))
+    monkeypatch.setattr(gestion_actividad, '_bloqueos', {})
+    monkeypatch.setattr(gestion_actividad, '_ultimos_ids', {})
+    monkeypatch.setattr(gestion_actividad, '_primeras', {})
+
+    monkeypatch.setattr(gestion_cursos, 'RUTA_CURSOS', str(tmp_path / 'cursos.json'))
+    monkeypatch.setattr(gestion_cursos, '_bloqueo', BloqueoArchivo(str(tmp_path / 'cursos.lock')))
+    monkeypatch.setattr(gestion_cursos, '_indice', indices.IndiceCursos())
+
+    monkeypatch.setattr(gestion_reportes, 'RUTA_REPORTES', str(tmp_path / 'correcciones.jsonl'))
+    monkeypatch.setattr(gestion_reportes, 'RUTA_CORRECCIONES', str(tmp_path / 'correcciones.json'))
+    monkeypatch.setattr(gestion_reportes, '_bloqueo', BloqueoArchivo(str(tmp_path / 'correcciones.jsonl.lock')))
+    monkeypatch.setattr(gestion_reportes, '_indice', indices.IndiceReportes())
+
+    monkeypatch.setattr(respaldo, 'DIR_RESPALDOS', str(tmp_path / 'respaldos'))
+    monkeypatch.setattr(respaldo, '_bloqueo', BloqueoArchivo(str(tmp_path / 'respaldos.lock')))
+    return tmp_path
@@ -0,0 +1,49 @@
+# tests/test_gestion_actividad.py
+
+from datetime import datetime, timedelta
+
+from data import gestion_actividad
+
+
+def _registrar(correo, cantidad, dias_atras=0):
+    fecha = (datetime.now() - timedelta(days=dias_atras)).isoformat()
+    for i in range(cantidad):
+        gestion_actividad.registrar_actividad(correo, {'tipo': 'quiz', 'fecha': fecha})
+
+
+def _todas(correo, limite):
+    entradas, cursor = [], None
+    while True:
+        pagina, cursor = gestion_actividad.obtener_actividad(correo, limite=limite, antes=cursor)
+        entradas.extend(pagina)
+        if cursor is None:
+            return entradas
+
+
+def test_paginacion_sigue_por_el_archivo(almacen_json):
+    _registrar('a@x.com', 30)
+    assert gestion_actividad.archivar_actividad('a@x.com', maximo=8) == 22
+    _registrar('a@x.com', 5)
+    assert gestion_actividad.archivar_actividad('a@x.com', maximo=8) == 5
+
+    calientes = list(gestion_actividad._entradas_calientes_desde_el_final('a@x.com'))
+    assert [e['id'] for e in calientes] == list(range(35, 27, -1))
+    assert set(gestion_actividad.archivos_archivados('a@x.com')) == {datetime.now().strftime('%Y-%m') + '.jsonl.gz',
+                                                                     'indice.json'}
+    for limite in (1, 7, 10, 100):
+        assert [e['id'] for e in _todas('a@x.com', limite)] == list(range(35, 0, -1))
+
+
+def test_archiva_por_antiguedad(almacen_json):
+    _registrar('a@x.com', 4, dias_atras=200)
+    _registrar('a@x.com', 3)
+    assert gestion_actividad.archivar_actividad('a@x.com') == 4
+    assert [e['id'] for e in _todas('a@x.com', 2)] == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_ids_siguen_tras_archivar_todo(almacen_json):
+    _registrar('a@x.com', 3, dias_atras=200)
+    assert gestion_actividad.archivar_actividad('a@x.com') == 3
+    gestion_actividad._ultimos_ids.clear()
+    _registrar('a@x.com', 1)
+    assert [e['id'] for e in _todas('a@x.com', 10)] == [4, 3, 2, 1]
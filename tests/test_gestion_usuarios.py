@@ -0,0 +1,88 @@
+# tests/test_gestion_usuarios.py
+
+import os
+import threading
+
+import pytest
+
+from data import gestion_usuarios, serializacion
+
+
+def _crear(correo, **campos):
+    gestion_usuarios.guardar_usuario(correo, {'nombre': correo, 'rol': 'alumno', **campos})
+
+
+def test_transaccion_confirma_y_deshace(almacen_json):
+    _crear('a@x.com', vinculados=[])
+    _crear('b@x.com', vinculados=[])
+    with gestion_usuarios.transaccion():
+        gestion_usuarios.modificar_usuario('a@x.com', lambda d: d['vinculados'].append('b@x.com'))
+        gestion_usuarios.modificar_usuario('b@x.com', lambda d: d['vinculados'].append('a@x.com'))
+    assert gestion_usuarios.cargar_usuario('a@x.com')['vinculados'] == ['b@x.com']
+    assert gestion_usuarios.cargar_usuario('b@x.com')['vinculados'] == ['a@x.com']
+
+    with pytest.raises(ValueError):
+        with gestion_usuarios.transaccion():
+            gestion_usuarios.actualizar_datos_usuario('a@x.com', {'nombre': 'Otro'})
+            gestion_usuarios.modificar_usuario('b@x.com', lambda d: d['vinculados'].clear())
+            raise ValueError('falla a mitad')
+    assert gestion_usuarios.cargar_usuario('a@x.com')['nombre'] == 'a@x.com'
+    assert gestion_usuarios.cargar_usuario('b@x.com')['vinculados'] == ['a@x.com']
+    assert not os.path.exists(gestion_usuarios._ruta_diario())
+
+
+def test_transaccion_no_pisa_escrituras_intermedias(almacen_json):
+    _crear('profe@x.com', invitaciones=[])
+    with gestion_usuarios.transaccion():
+        gestion_usuarios.modificar_usuario('profe@x.com', lambda d: d['invitaciones'].append('uno'))
+        # otro hilo (fuera de la transacción) guarda mientras tanto
+        otro = threading.Thread(target=gestion_usuarios.modificar_usuario,
+                                args=('profe@x.com', lambda d: d['invitaciones'].append('dos')))
+        otro.start()
+        otro.join()
+    assert gestion_usuarios.cargar_usuario('profe@x.com')['invitaciones'] == ['dos', 'uno']
+
+
+def test_recupera_diario_interrumpido(almacen_json):
+    _crear('a@x.com')
+    _crear('b@x.com')
+    # diario confirmado que no llegó a aplicarse (caída tras el punto de confirmación)
+    serializacion.escribir(gestion_usuarios._ruta_diario(), {'a@x.com': {'nombre': 'A2'}, 'b@x.com': {'puntos': 7}})
+    gestion_usuarios._diario_revisado = False
+    gestion_usuarios._cache.descartar()
+    assert gestion_usuarios.cargar_usuario('a@x.com')['nombre'] == 'A2'
+    assert gestion_usuarios.cargar_usuario('b@x.com')['puntos'] == 7
+    assert not os.path.exists(gestion_usuarios._ruta_diario())
+
+
+def test_log_se_reaplica_y_se_compacta(almacen_json):
+    _crear('a@x.com', puntos=0, logros=[])
+    gestion_usuarios.registrar_cambios('a@x.com', [{'op': 'inc', 'ruta': ['puntos'], 'valor': 5}])
+    gestion_usuarios.registrar_cambios('a@x.com', [{'op': 'insertar', 'ruta': ['logros'], 'valor': 'primero'},
+                                                   {'op': 'set', 'ruta': ['nombre'], 'valor': 'Ana'}])
+    assert os.path.exists(gestion_usuarios._ruta_log('a@x.com'))
+    gestion_usuarios._cache.descartar()
+    antes = gestion_usuarios.cargar_usuario('a@x.com')
+    assert (antes['puntos'], antes['logros'], antes['nombre']) == (5, ['primero'], 'Ana')
+
+    gestion_usuarios.compactar_registro('a@x.com')
+    assert not os.path.exists(gestion_usuarios._ruta_log('a@x.com'))
+    gestion_usuarios._cache.descartar()
+    assert gestion_usuarios.cargar_usuario('a@x.com') == antes
+
+
+def test_compactacion_interrumpida_no_aplica_dos_veces(almacen_json):
+    _crear('a@x.com', puntos=0)
+    gestion_usuarios.registrar_cambios('a@x.com', [{'op': 'inc', 'ruta': ['puntos'], 'valor': 5}])
+    # la base ya incluye el log, pero el proceso cayó antes de borrarlo
+    datos = gestion_usuarios._cargar_con_log('a@x.com')
+    gestion_usuarios._escribir_json(gestion_usuarios._ruta_registro('a@x.com'), datos)
+    gestion_usuarios._cache.descartar()
+    assert gestion_usuarios.cargar_usuario('a@x.com')['puntos'] == 5
+
+
+def test_credenciales_siguen_al_registro(almacen_json):
+    _crear('a@x.com', contrasena_hash='viejo', perfil_completo=False)
+    gestion_usuarios.actualizar_datos_usuario('a@x.com', {'contrasena_hash': 'nuevo'})
+    assert gestion_usuarios.obtener_credenciales('a@x.com')['hash'] == 'nuevo'
+    assert gestion_usuarios.listar_correos() == ['a@x.com']
@@ -0,0 +1,73 @@
+# tests/test_repositorio_memoria.py
+
+import pytest
+
+from data.repositorio_memoria import UsuariosEnMemoria
+
+
+def _usuarios():
+    return UsuariosEnMemoria({
+        'profe@x.com': {'nombre': 'Profe', 'rol': 'profesor', 'alumnos_vinculados': []},
+        'alumno@x.com': {'nombre': 'Alumno', 'rol': 'alumno', 'profesores_vinculados': []},
+    })
+
+
+def test_transaccion_confirma_todos_los_cambios():
+    usuarios = _usuarios()
+    with usuarios.transaccion():
+        usuarios.modificar_usuario('profe@x.com', lambda d: d['alumnos_vinculados'].append('alumno@x.com'))
+        usuarios.modificar_usuario('alumno@x.com', lambda d: d['profesores_vinculados'].append('profe@x.com'))
+        assert usuarios.cargar_usuario('profe@x.com')['alumnos_vinculados'] == []  # solo anotado
+    assert usuarios.cargar_usuario('profe@x.com')['alumnos_vinculados'] == ['alumno@x.com']
+    assert usuarios.cargar_usuario('alumno@x.com')['profesores_vinculados'] == ['profe@x.com']
+
+
+def test_transaccion_con_excepcion_no_escribe_nada():
+    usuarios = _usuarios()
+    with pytest.raises(ValueError):
+        with usuarios.transaccion():
+            usuarios.modificar_usuario('profe@x.com', lambda d: d['alumnos_vinculados'].append('alumno@x.com'))
+            usuarios.actualizar_datos_usuario('alumno@x.com', {'nombre': 'Otro'})
+            raise ValueError('falla a mitad')
+    assert usuarios.cargar_usuario('profe@x.com')['alumnos_vinculados'] == []
+    assert usuarios.cargar_usuario('alumno@x.com')['nombre'] == 'Alumno'
+
+
+def test_transaccion_se_aplica_sobre_el_registro_actual():
+    usuarios = _usuarios()
+    with usuarios.transaccion():
+        usuarios.modificar_usuario('profe@x.com', lambda d: d['alumnos_vinculados'].append('a@x.com'))
+        usuarios.modificar_usuario('profe@x.com', lambda d: d['alumnos_vinculados'].append('b@x.com'))
+    assert usuarios.cargar_usuario('profe@x.com')['alumnos_vinculados'] == ['a@x.com', 'b@x.com']
+
+
+def test_escrituras_directas_dentro_de_transaccion_lanzan():
+    usuarios = _usuarios()
+    with usuarios.transaccion():
+        with pytest.raises(RuntimeError):
+            usuarios.guardar_usuario('profe@x.com', {'nombre': 'X'})
+        with pytest.raises(RuntimeError):
+            usuarios.registrar_cambios('profe@x.com', [{'op': 'set', 'ruta': ['nombre'], 'valor': 'X'}])
+
+
+def test_registrar_cambios_y_version():
+    usuarios = _usuarios()
+    version = usuarios.cargar_usuario('alumno@x.com')['_secuencia']
+    usuarios.registrar_cambios('alumno@x.com', [{'op': 'inc', 'ruta': ['puntos'], 'valor': 3},
+                                                {'op': 'inc', 'ruta': ['puntos'], 'valor': 2}])
+    datos = usuarios.cargar_usuario('alumno@x.com')
+    assert datos['puntos'] == 5
+    assert datos['_secuencia'] == version + 2
+
+
+def test_paginacion_de_actividad():
+    usuarios = _usuarios()
+    for i in range(25):
+        usuarios.registrar_actividad('alumno@x.com', {'tipo': 'quiz', 'n': i})
+    vistos, cursor = [], None
+    while True:
+        pagina, cursor = usuarios.obtener_actividad('alumno@x.com', limite=10, antes=cursor)
+        vistos.extend(a['n'] for a in pagina)
+        if cursor is None:
+            break
+    assert vistos == list(range(24, -1, -1))
@@ -0,0 +1,51 @@
+# tests/test_respaldo.py
+
+import pytest
+
+from data import gestion_actividad, gestion_usuarios, respaldo
+
+
+def _actividades(correo):
+    return [e['id'] for e in gestion_actividad.obtener_actividad(correo, limite=100)[0]]
+
+
+def test_restaurar_usuario(almacen_json):
+    gestion_usuarios.guardar_usuario('a@x.com', {'nombre': 'Ana', 'rol': 'alumno'})
+    gestion_usuarios.guardar_usuario('b@x.com', {'nombre': 'Beto', 'rol': 'alumno'})
+    for _ in range(6):
+        gestion_actividad.registrar_actividad('a@x.com', {'tipo': 'quiz', 'fecha': '2026-01-01T00:00:00'})
+    gestion_actividad.archivar_actividad('a@x.com', dias=10 ** 5, maximo=2)
+    primera = respaldo.crear_instantanea()
+    assert primera['usuarios'] == 2
+
+    segunda = respaldo.crear_instantanea()
+    assert segunda['usuarios_leidos'] == 0 and segunda['objetos_nuevos'] == 0
+
+    gestion_usuarios.actualizar_datos_usuario('a@x.com', {'nombre': 'Cambiado'})
+    gestion_usuarios.actualizar_datos_usuario('b@x.com', {'nombre': 'Beto 2'})
+    gestion_actividad.eliminar_actividad('a@x.com')
+    assert _actividades('a@x.com') == []
+
+    assert respaldo.restaurar_usuario('a@x.com')
+    assert gestion_usuarios.cargar_usuario('a@x.com')['nombre'] == 'Ana'
+    assert _actividades('a@x.com') == [6, 5, 4, 3, 2, 1]
+    assert gestion_usuarios.cargar_usuario('b@x.com')['nombre'] == 'Beto 2'  # los demás no se tocan
+    assert not respaldo.restaurar_usuario('nadie@x.com')
+
+
+def test_podar_conserva_lo_usado(almacen_json):
+    gestion_usuarios.guardar_usuario('a@x.com', {'nombre': 'Ana', 'rol': 'alumno'})
+    respaldo.crear_instantanea()
+    gestion_usuarios.actualizar_datos_usuario('a@x.com', {'nombre': 'Ana 2'})
+    respaldo.crear_instantanea()
+    assert respaldo.podar(1) == 1
+    assert respaldo.restaurar_usuario('a@x.com')
+    assert gestion_usuarios.cargar_usuario('a@x.com')['nombre'] == 'Ana 2'
+
+
+def test_se_niega_con_otro_almacenamiento(almacen_json, monkeypatch):
+    monkeypatch.setenv('BRAINCOURSE_STORAGE', 'sqlite')
+    with pytest.raises(RuntimeError):
+        respaldo.crear_instantanea()
+    with pytest.raises(RuntimeError):
+        respaldo.restaurar_usuario('a@x.com')
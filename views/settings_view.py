@@ -3,10 +3,10 @@
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog
 import os
+import threading
 
-from models.user_model import User
+from models.user_model import User, LazyUser
 from services.auth_service import AuthService
-from data import gestion_usuarios as user_dao # Usado para la lógica de vinculación profesor/alumno por ahora (podría ir en un servicio)
 
 class SettingsWindow(ctk.CTkToplevel):
     def __init__(self, master, current_user: User, auth_service_instance: AuthService, update_name_callback, logout_callback):
@@ -14,6 +14,7 @@ class SettingsWindow(ctk.CTkToplevel):
         self.app = master # Referencia a la ventana principal (root)
         self.current_user = current_user
         self.auth_service = auth_service_instance
+        self.user_dao = self.auth_service.user_dao # Usado para la lógica de vinculación profesor/alumno por ahora (podría ir en un servicio)
         self.update_name_callback = update_name_callback # Callback para actualizar el nombre en la barra lateral de la app principal
         self.logout_callback = logout_callback # Callback para cerrar sesión desde la app principal
 
@@ -84,8 +85,17 @@ class SettingsWindow(ctk.CTkToplevel):
         if not password: # Usuario canceló o no ingresó contraseña
             return
 
-        success, message = self.auth_service.eliminar_cuenta(self.current_user.email, password)
-
+        # Verificar la contraseña (KDF) y limpiar referencias es lento: se hace en un hilo
+        def _eliminar_en_hilo():
+            try:
+                resultado = self.auth_service.eliminar_cuenta(self.current_user.email, password)
+            except Exception as e:
+                print(f"Error al eliminar la cuenta: {e}")
+                resultado = (False, f"No se pudo eliminar la cuenta: {e}")
+            self.after(0, lambda: self._process_delete_result(*resultado))
+        threading.Thread(target=_eliminar_en_hilo, daemon=True).start()
+
+    def _process_delete_result(self, success, message):
         if success:
             messagebox.showinfo("Cuenta Eliminada", message, parent=self.app)
             self.destroy() # Cerrar ventana de configuración
@@ -129,30 +139,34 @@ class SettingsWindow(ctk.CTkToplevel):
     def handle_invitation(self, profesor_email: str, aceptar: bool):
         """Gestiona la respuesta de un alumno a la invitación de un profesor."""
         # Cargar todos los usuarios para actualizar los datos del profesor
-        all_users_data = user_dao.cargar_usuarios()
-        profesor_data_dict = all_users_data.get(profesor_email)
+        profesor_data_dict = self.user_dao.cargar_usuario(profesor_email)
         
         if not profesor_data_dict:
             messagebox.showerror("Error", "Profesor no encontrado en el sistema.", parent=self); return
         
-        # Convertir el diccionario de datos del profesor a un objeto User
-        profesor_user_obj = User.from_dict(profesor_email, profesor_data_dict)
-
-        if aceptar:
-            # Actualizar el lado del alumno (usa el método del User model)
-            self.current_user.aceptar_invitacion(profesor_email)
-            # Actualizar el lado del profesor (agrega al alumno a vinculados)
-            # No usamos .recibir_solicitud_alumno porque esto es una invitación directa aceptada
-            if self.current_user.email not in profesor_user_obj.alumnos_vinculados:
-                profesor_user_obj.alumnos_vinculados.append(self.current_user.email)
-            profesor_user_obj.agregar_notificacion(f"El alumno {self.current_user.nombre} ha aceptado tu invitación.")
-        else:
-            self.current_user.rechazar_invitacion(profesor_email)
-            profesor_user_obj.agregar_notificacion(f"El alumno {self.current_user.nombre} ha rechazado tu invitación.")
-
-        # Persistir los cambios en ambos usuarios
-        user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.to_dict())
-        user_dao.actualizar_datos_usuario(profesor_email, profesor_user_obj.to_dict())
+        alumno_email, alumno_nombre = self.current_user.email, self.current_user.nombre
+
+        def _lado_alumno(alumno):
+            # Usa los métodos del User model sobre el registro actual del alumno
+            if aceptar:
+                alumno.aceptar_invitacion(profesor_email)
+            else:
+                alumno.rechazar_invitacion(profesor_email)
+
+        def _lado_profesor(profesor):
+            if aceptar:
+                # No usamos .recibir_solicitud_alumno porque esto es una invitación directa aceptada
+                if alumno_email not in profesor.alumnos_vinculados:
+                    profesor.alumnos_vinculados.append(alumno_email)
+                profesor.agregar_notificacion(f"El alumno {alumno_nombre} ha aceptado tu invitación.")
+            else:
+                profesor.agregar_notificacion(f"El alumno {alumno_nombre} ha rechazado tu invitación.")
+
+        # Persistir los cambios en ambos usuarios (juntos: nunca queda vinculado solo uno de los lados).
+        # Se aplican sobre los registros actuales, así no se pierde lo que otro escribió en esas listas.
+        with self.user_dao.transaccion():
+            self.user_dao.modificar_usuario(alumno_email, User.modificador(alumno_email, _lado_alumno, User.CAMPOS_VINCULACION))
+            self.user_dao.modificar_usuario(profesor_email, User.modificador(profesor_email, _lado_profesor, User.CAMPOS_VINCULACION))
 
         messagebox.showinfo("Gestión de Invitación", f"Has {'aceptado' if aceptar else 'rechazado'} la invitación de {profesor_email}.", parent=self)
         self.refresh_link_teacher_tab() # Refrescar la UI de la pestaña
@@ -163,29 +177,28 @@ class SettingsWindow(ctk.CTkToplevel):
             messagebox.showerror("Error", "El email del profesor no puede estar vacío.", parent=self); return
         
         # Cargar todos los usuarios para verificar y actualizar al profesor
-        all_users_data = user_dao.cargar_usuarios()
-        profesor_data_dict = all_users_data.get(profesor_email)
+        profesor_data_dict = self.user_dao.cargar_usuario(profesor_email)
 
         if not profesor_data_dict or profesor_data_dict.get('rol') != 'profesor':
             messagebox.showerror("Error", "No se encontró un profesor con ese correo o el usuario no es un profesor.", parent=self); return
         
-        # Convertir el diccionario de datos del profesor a un objeto User
-        profesor_user_obj = User.from_dict(profesor_email, profesor_data_dict)
-
         # Verificar si la solicitud ya fue enviada o si ya están vinculados
         if profesor_email in self.current_user.solicitudes_enviadas or profesor_email in self.current_user.profesores_vinculados:
             messagebox.showinfo("Información", "Ya has enviado una solicitud a este profesor o ya están vinculados.", parent=self); return
 
-        # Actualizar el lado del alumno (usa el método del User model)
-        self.current_user.enviar_solicitud_vinculacion(profesor_email)
-        
-        # Actualizar el lado del profesor (recibir solicitud del alumno)
-        profesor_user_obj.recibir_solicitud_alumno(self.current_user.email)
-        profesor_user_obj.agregar_notificacion(f"El alumno {self.current_user.nombre} te ha enviado una solicitud de vinculación.")
+        alumno_email, alumno_nombre = self.current_user.email, self.current_user.nombre
+
+        def _lado_alumno(alumno):
+            alumno.enviar_solicitud_vinculacion(profesor_email)
+
+        def _lado_profesor(profesor):
+            if profesor.recibir_solicitud_alumno(alumno_email):
+                profesor.agregar_notificacion(f"El alumno {alumno_nombre} te ha enviado una solicitud de vinculación.")
 
-        # Persistir los cambios en ambos usuarios
-        user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.to_dict())
-        user_dao.actualizar_datos_usuario(profesor_email, profesor_user_obj.to_dict())
+        # Persistir los cambios en ambos usuarios (juntos y sobre los registros actuales, ver handle_invitation)
+        with self.user_dao.transaccion():
+            self.user_dao.modificar_usuario(alumno_email, User.modificador(alumno_email, _lado_alumno, User.CAMPOS_VINCULACION))
+            self.user_dao.modificar_usuario(profesor_email, User.modificador(profesor_email, _lado_profesor, User.CAMPOS_VINCULACION))
 
         messagebox.showinfo("Éxito", "Solicitud enviada. Tu profesor debe aceptarla.", parent=self)
         self.refresh_link_teacher_tab() # Refrescar la UI de la pestaña
@@ -202,10 +215,9 @@ class SettingsWindow(ctk.CTkToplevel):
         # como `get_user_by_email_and_reload(email)` que solo cargue y convierta.
         # Por simplicidad ahora, haremos una carga directa y recrearemos el objeto User.
         print("Recargando datos del usuario para SettingsWindow...")
-        all_users = user_dao.cargar_usuarios()
-        user_data_reloaded = all_users.get(self.current_user.email)
-        if user_data_reloaded:
-            self.current_user = User.from_dict(self.current_user.email, user_data_reloaded)
+        user_reloaded = LazyUser.cargar(self.user_dao, self.current_user.email)
+        if user_reloaded:
+            self.current_user = user_reloaded
         else:
             print(f"Error: No se pudo recargar el usuario {self.current_user.email}")
 
@@ -4,6 +4,7 @@ import customtkinter as ctk
 import os
 from tkinter import messagebox, simpledialog
 import threading
+import uuid
 from PIL import Image, ImageTk 
 from datetime import datetime
 from matplotlib.figure import Figure
@@ -11,7 +12,6 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 # Importar las capas de servicios y modelos
 from models.user_model import User
-from data import gestion_usuarios as user_dao # Usado para guardar cambios del usuario (persistir)
 from services.auth_service import AuthService
 from services.learning_service import LearningService
 from services.course_service import CourseService
@@ -26,6 +26,7 @@ class StudentDashboardView:
         self.root = root
         self.current_user = current_user
         self.auth_service = auth_service_instance
+        self.user_dao = self.auth_service.user_dao # Usado para guardar cambios del usuario (persistir)
         self.ai_service = ai_service_instance
         self.learning_service = learning_service_instance
         self.course_service = course_service_instance
@@ -69,7 +70,7 @@ class StudentDashboardView:
         self.pregunta_actual_texto = None # Texto de la pregunta actual para pedir pistas
         self.pista_usada = False
         self.preguntas_falladas = [] # Lista de preguntas falladas en el quiz actual para el repaso
-        self.respuestas_dadas_quiz_actual = [] # Historial de respuestas para el quiz actual (para guardar en user.historial_actividad)
+        self.respuestas_dadas_quiz_actual = [] # Historial de respuestas para el quiz actual (para guardar en el historial de actividad)
 
         self.curso_activo = None # Objeto de curso activo (dict del user.cursos)
         self.modulo_activo = None # Objeto de módulo activo (dict de curso_activo['modulos'])
@@ -184,7 +185,7 @@ class StudentDashboardView:
             for notif in notificaciones_no_leidas:
                 messagebox.showinfo("Notificación", notif['texto'], parent=self.root)
             self.current_user.marcar_notificaciones_leidas() # Método en User model
-            user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.to_dict()) # Persistir cambios
+            self.user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.extraer_cambios()) # Persistir cambios
 
     def configure_chat_tags(self):
         mode = ctk.get_appearance_mode()
@@ -205,6 +206,36 @@ class StudentDashboardView:
         self.chat_history.configure(state='disabled')
         self.chat_history.see("end") # Auto-scroll to end
 
+    def add_message_en_partes(self, sender: str, partes, tag: str = None):
+        """
+        Como add_message, para respuestas que llegan por partes (streaming). Se llama desde un hilo de fondo:
+        cada parte pasa por la cola de eventos de Tk (root.after) y se inserta en una marca propia del mensaje,
+        así otro mensaje que llegue mientras tanto no se intercala.
+        """
+        marca = f"respuesta_{uuid.uuid4().hex[:8]}"
+        self.root.after(0, self._abrir_mensaje_en_partes, sender, tag, marca)
+        for parte in partes:
+            self.root.after(0, self._insertar_en_marca, marca, parte)
+        self.root.after(0, self.chat_history.mark_unset, marca)
+
+    def _abrir_mensaje_en_partes(self, sender: str, tag: str, marca: str):
+        self.chat_history.configure(state='normal')
+        self.chat_history.insert("end", f"{sender}: ", (tag if tag else sender, "bold"))
+        # La marca queda justo antes del salto final: con gravedad izquierda mientras se inserta el salto,
+        # y derecha después para que avance con cada parte
+        self.chat_history.mark_set(marca, "end-1c")
+        self.chat_history.mark_gravity(marca, "left")
+        self.chat_history.insert("end", "\n\n")
+        self.chat_history.mark_gravity(marca, "right")
+        self.chat_history.configure(state='disabled')
+        self.chat_history.see("end")
+
+    def _insertar_en_marca(self, marca: str, texto: str):
+        self.chat_history.configure(state='normal')
+        self.chat_history.insert(marca, texto)
+        self.chat_history.configure(state='disabled')
+        self.chat_history.see(marca)
+
     def limpiar_pantalla(self):
         self.chat_history.configure(state='normal')
         self.chat_history.delete("1.0", "end")
@@ -233,6 +264,7 @@ class StudentDashboardView:
     def _get_ai_context_data(self):
         """Retorna un diccionario con datos de contexto del usuario para el AIService."""
         return {
+            'user_email': self.current_user.email,
             'user_level': self.current_user.progreso.get('nivel', 1),
             'user_profile_data': self.current_user.datos_perfil,
             'current_topic': self.current_practice_topic,
@@ -336,12 +368,12 @@ class StudentDashboardView:
         for modulo in course.modulos:
             modulo_frame = ctk.CTkFrame(self.cursos_list_frame)
             modulo_frame.pack(fill="x", padx=20, pady=5)
-            estado = "✅" if modulo.get('completado') else "📖"
-            calificacion = f"Nota: {modulo.get('calificacion_examen')}" if modulo.get('completado') and modulo.get('calificacion_examen') is not None else ""
-            label_texto = f"{estado} {modulo['titulo']} {calificacion}"
+            estado = "✅" if modulo.completado else "📖"
+            calificacion = f"Nota: {modulo.calificacion_examen}" if modulo.completado and modulo.calificacion_examen is not None else ""
+            label_texto = f"{estado} {modulo.titulo} {calificacion}"
             ctk.CTkLabel(modulo_frame, text=label_texto, anchor="w").pack(side="left", padx=10, pady=10)
-            btn_text = "Revisar" if modulo.get('completado') else "Empezar"
-            start_button = ctk.CTkButton(modulo_frame, text=btn_text, command=lambda m=modulo: self.ver_modulo_modular(m))
+            btn_text = "Revisar" if modulo.completado else "Empezar"
+            start_button = ctk.CTkButton(modulo_frame, text=btn_text, command=lambda m=modulo: self.ver_modulo_modular(m.to_dict()))
             start_button.pack(side="right", padx=10, pady=5)
 
     def ver_modulo_modular(self, modulo_data: dict):
@@ -363,16 +395,17 @@ class StudentDashboardView:
         self.add_message("Tú", f"Quiero aprender sobre: {subtema}")
         self.add_message("Sistema", "Obteniendo explicación...", tag="Sistema")
         def _mostrar_teoria():
-            teoria = self.course_service.obtener_teoria_subtema(self.current_user, self.curso_activo.id_curso, self.modulo_activo['id_modulo'], subtema)
-            self.root.after(0, lambda: self.add_message("Agente", teoria))
+            self.add_message_en_partes("Agente", self.course_service.obtener_teoria_subtema_en_partes(
+                self.current_user, self.curso_activo.id_curso, self.modulo_activo['id_modulo'], subtema))
         threading.Thread(target=_mostrar_teoria).start()
 
     def ver_teoria_subtema(self, subtema: str):
         self.add_message("Tú", f"Quiero aprender sobre: {subtema}")
         self.add_message("Sistema", "Obteniendo explicación...", tag="Sistema")
         def _mostrar_teoria():
-            teoria = self.course_service.obtener_teoria_subtema(self.current_user, self.curso_activo['id_curso'], self.modulo_activo['id_modulo'], subtema)
-            self.root.after(0, lambda: self.add_message("Agente", teoria))
+            # La teoría nueva se va mostrando a medida que la IA la genera
+            self.add_message_en_partes("Agente", self.course_service.obtener_teoria_subtema_en_partes(
+                self.current_user, self.curso_activo['id_curso'], self.modulo_activo['id_modulo'], subtema))
         threading.Thread(target=_mostrar_teoria).start()
 
     def abandonar_curso(self, course):
@@ -470,8 +503,9 @@ class StudentDashboardView:
         self.add_message("Tú", f"Quiero aprender sobre: {subtema}")
         self.add_message("Sistema", "Obteniendo explicación...", tag="Sistema")
         def _mostrar_teoria():
-            teoria = self.course_service.obtener_teoria_subtema(self.current_user, self.curso_activo['id_curso'], self.modulo_activo['id_modulo'], subtema)
-            self.root.after(0, lambda: self.add_message("Agente", teoria))
+            # La teoría nueva se va mostrando a medida que la IA la genera
+            self.add_message_en_partes("Agente", self.course_service.obtener_teoria_subtema_en_partes(
+                self.current_user, self.curso_activo['id_curso'], self.modulo_activo['id_modulo'], subtema))
         threading.Thread(target=_mostrar_teoria).start()
 
     def iniciar_modo_estadisticas(self):
@@ -710,8 +744,8 @@ class StudentDashboardView:
 
         if not self.pista_usada:
             self.add_message("Sistema", "Claro, aquí tienes una pista...", tag="Sistema")
-            # Llamar a AIService directamente para respuesta de chat
-            threading.Thread(target=lambda: self.add_message("Agente", self.ai_service.send_message(
+            # Llamar a AIService directamente; la respuesta se muestra a medida que llega
+            threading.Thread(target=lambda: self.add_message_en_partes("Agente", self.ai_service.stream_message(
                 f"Dame una pista corta para resolver: '{self.pregunta_actual_texto}'",
                 **ai_context
             ))).start()
@@ -720,7 +754,7 @@ class StudentDashboardView:
         else:
             self.add_message("Sistema", "Aquí tienes la solución completa...", tag="Sistema")
             # Llamar a AIService directamente para respuesta de chat
-            threading.Thread(target=lambda: self.add_message("Agente", self.ai_service.send_message(
+            threading.Thread(target=lambda: self.add_message_en_partes("Agente", self.ai_service.stream_message(
                 f"Explícame paso a paso cómo resolver: '{self.pregunta_actual_texto}'",
                 **ai_context
             ))).start()
@@ -729,7 +763,7 @@ class StudentDashboardView:
     def pedir_explicacion_acierto(self):
         self.add_message("Sistema", "¡Buena pregunta! Aquí te explico por qué la respuesta correcta...", tag="Sistema")
         ai_context = self._get_ai_context_data()
-        threading.Thread(target=lambda: self.add_message("Agente", self.ai_service.send_message(
+        threading.Thread(target=lambda: self.add_message_en_partes("Agente", self.ai_service.stream_message(
             f"Mi respuesta fue correcta. Explícame brevemente por qué la solución a este problema es la correcta: '{self.pregunta_actual_texto}'",
             **ai_context
         ))).start()
@@ -756,7 +790,7 @@ class StudentDashboardView:
             self.add_message("Tú", user_input)
             # Interacción directa con la IA en el chat, pasando el contexto
             ai_context = self._get_ai_context_data()
-            threading.Thread(target=lambda: self.add_message("Agente", self.ai_service.send_message(
+            threading.Thread(target=lambda: self.add_message_en_partes("Agente", self.ai_service.stream_message(
                 user_input,
                 **ai_context
             ))).start()
@@ -794,12 +828,13 @@ class StudentDashboardView:
         """Guarda manualmente los datos del usuario. Los servicios ya lo hacen automáticamente."""
         # Esto es una salvaguarda. Los servicios ya deben persistir los cambios al User object.
         # Puedes remover esta llamada si confías plenamente en que los servicios persisten todo.
-        user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.to_dict())
+        self.user_dao.actualizar_datos_usuario(self.current_user.email, self.current_user.extraer_cambios())
 
     def logout(self, force: bool = False):
         """Cierra la sesión del usuario."""
         if force or messagebox.askyesno("Cerrar Sesión", "¿Estás seguro de que quieres cerrar sesión?"):
             self._save_user_data() # Asegurarse de que los datos se guarden antes de cerrar sesión
+            self.ai_service.cerrar_chat(self.current_user.email) # La conversación con Brainy no pasa al siguiente usuario
             self.main_frame.destroy()
             # Importar LoginWindow localmente para evitar dependencias circulares al inicio
             from main import LoginWindow # Asumiendo que LoginWindow sigue en main.py por ahora
@@ -8,7 +8,8 @@ from PIL import Image, ImageTk
 from datetime import datetime
 
 # Importar las capas de servicios y modelos
-from models.user_model import User
+from models.user_model import User, LazyUser
+from models.course_model import Course
 from services.auth_service import AuthService
 from services.teacher_service import TeacherService
 from services.course_service import CourseService 
@@ -21,6 +22,8 @@ from views.correction_window import CorrectionWindow
 from views.quiz_review_window import QuizReviewWindow
 from views.settings_view import SettingsWindow
 
+REPORTES_POR_PAGINA = 20
+
 class TeacherDashboardView(ctk.CTkFrame):
     def __init__(self, master, current_user: User, auth_service_instance: AuthService, ai_service_instance: AIService, learning_service_instance: LearningService, course_service_instance: CourseService, qc_service_instance: QualityControlService, teacher_service_instance: TeacherService):
         super().__init__(master=master) 
@@ -35,6 +38,7 @@ class TeacherDashboardView(ctk.CTkFrame):
         self.teacher_service = teacher_service_instance
         
         self.user_dao = self.auth_service.user_dao 
+        self.course_dao = self.course_service.course_dao
         self.settings_window = None 
         self.gear_image_photo = None # Inicializar para evitar AttributeError si la imagen no carga
 
@@ -98,9 +102,7 @@ class TeacherDashboardView(ctk.CTkFrame):
 
     def refresh_teacher_user_data(self):
         """Recarga los datos del profesor para asegurar que estén actualizados (ej. después de aceptar/rechazar solicitudes)."""
-        all_users_data = self.user_dao.cargar_usuarios()
-        updated_data = all_users_data.get(self.current_user.email, self.current_user.to_dict())
-        self.current_user = User.from_dict(self.current_user.email, updated_data)
+        self.current_user = LazyUser.cargar(self.user_dao, self.current_user.email) or self.current_user
         self.setup_sidebar()
 
     def show_students_view(self):
@@ -219,9 +221,14 @@ class TeacherDashboardView(ctk.CTkFrame):
 
         history_frame = ctk.CTkFrame(self.content_frame); history_frame.pack(fill="x", pady=5)
         ctk.CTkLabel(history_frame, text="Historial de Actividad Reciente", font=ctk.CTkFont(size=16, weight="bold")).pack(pady=(10,5))
-        
-        historial = student_data.get('historial_actividad_reciente', [])
-        if not historial:
+        self.load_student_activity_page(history_frame, email_alumno)
+
+    def load_student_activity_page(self, history_frame, email_alumno: str, antes: int = None, boton_mas=None):
+        """Muestra una página del historial del alumno; el botón 'Cargar más' pide la siguiente."""
+        if boton_mas is not None:
+            boton_mas.destroy()
+        historial, cursor = self.teacher_service.obtener_actividad_alumno(self.current_user, email_alumno, limite=10, antes=antes)
+        if not historial and antes is None:
             ctk.CTkLabel(history_frame, text="Sin actividad reciente registrada.").pack(pady=5)
         else:
             for actividad in historial:
@@ -237,10 +244,15 @@ class TeacherDashboardView(ctk.CTkFrame):
                 if actividad.get('preguntas') is not None and isinstance(actividad.get('preguntas'), list):
                     ctk.CTkButton(act_frame, text="Revisar Detalle", width=80, command=lambda a=actividad: QuizReviewWindow(self.master, self.current_user, self.teacher_service, a)).pack(side="right", padx=10, pady=5)
 
+        if cursor is not None:
+            boton = ctk.CTkButton(history_frame, text="Cargar más")
+            boton.configure(command=lambda: self.load_student_activity_page(history_frame, email_alumno, cursor, boton))
+            boton.pack(pady=5)
+
 
     def delete_course_from_student(self, email_alumno: str, id_curso: str):
         if messagebox.askyesno("Confirmar", f"¿Seguro que quieres eliminar este curso del perfil de {email_alumno}?", parent=self.master):
-            alumno_full_data = self.user_dao.cargar_usuarios().get(email_alumno)
+            alumno_full_data = self.user_dao.cargar_usuario(email_alumno)
             if not alumno_full_data:
                 messagebox.showerror("Error", "Datos del alumno no encontrados.", parent=self.master); return
             alumno_user_obj = User.from_dict(email_alumno, alumno_full_data)
@@ -274,7 +286,7 @@ class TeacherDashboardView(ctk.CTkFrame):
         self.show_student_details(email_alumno)
 
     def review_student_course_content(self, email_alumno: str, id_curso: str):
-        alumno_full_data = self.user_dao.cargar_usuarios().get(email_alumno)
+        alumno_full_data = self.user_dao.cargar_usuario(email_alumno)
         if not alumno_full_data:
             messagebox.showerror("Error", "Datos del alumno no encontrados para revisar el curso.", parent=self.master); return
 
@@ -322,55 +334,75 @@ class TeacherDashboardView(ctk.CTkFrame):
         textbox.insert("1.0", contenido_completo)
         textbox.configure(state="disabled")
 
-    def show_ai_reports_view(self):
+    def show_ai_reports_view(self, estado: str = None):
         for widget in self.content_frame.winfo_children():
             widget.destroy()
         self.content_frame.configure(label_text="Reportes de Errores de IA")
 
         ctk.CTkLabel(self.content_frame, text="Lista de Reportes de Errores", font=ctk.CTkFont(size=18, weight="bold")).pack(pady=10)
-        
-        reportes = self.qc_service.obtener_reportes()
 
-        if not reportes:
+        filtros = {"Todos": None, "Pendientes": "pendiente", "Revisados": "revisado", "Aplicados": "aplicado"}
+        filtro_actual = next(nombre for nombre, valor in filtros.items() if valor == estado)
+        filtro_menu = ctk.CTkOptionMenu(self.content_frame, values=list(filtros), command=lambda nombre: self.show_ai_reports_view(filtros[nombre]))
+        filtro_menu.set(filtro_actual)
+        filtro_menu.pack(pady=5)
+
+        total = self.qc_service.contar_reportes(estado=estado)
+        ctk.CTkLabel(self.content_frame, text=f"{total} reporte(s)").pack(pady=2)
+
+        if total == 0:
             ctk.CTkLabel(self.content_frame, text="No hay reportes de errores de IA.").pack(pady=5)
         else:
-            for reporte in reportes:
-                report_frame = ctk.CTkFrame(self.content_frame); report_frame.pack(fill="x", pady=5, padx=10)
-                report_frame.grid_columnconfigure(0, weight=1)
-                report_frame.grid_columnconfigure(1, weight=0)
-
-                fecha = datetime.fromisoformat(reporte['fecha']).strftime('%d/%m/%Y %H:%M')
-                profesor_email = reporte.get('email_profesor', 'Desconocido')
-                pregunta_original = reporte.get('pregunta_original_data', {}).get('pregunta', 'N/A')
-                respuesta_ia = reporte.get('pregunta_original_data', {}).get('respuesta_correcta_ia', 'N/A')
-                respuesta_profesor = reporte.get('correccion_profesor', {}).get('respuesta_profesor', 'N/A')
-                justificacion = reporte.get('correccion_profesor', {}).get('justificacion', 'Sin justificación')
-                estado = reporte.get('estado', 'pendiente').capitalize()
-
-                report_text = (
-                    f"ID: {reporte['id_reporte']} | Fecha: {fecha} | Profesor: {profesor_email}\n"
-                    f"Estado: {estado}\n"
-                    f"Pregunta (IA): {pregunta_original}\n"
-                    f"Respuesta IA: {respuesta_ia}\n"
-                    f"Respuesta Profesor: {respuesta_profesor}\n"
-                    f"Justificación: {justificacion}"
-                )
-                ctk.CTkLabel(report_frame, text=report_text, wraplength=700, justify="left").grid(row=0, column=0, sticky="w", padx=10, pady=5)
-                
-                if estado == "Pendiente":
-                    ctk.CTkButton(report_frame, text="Marcar como Revisado", command=lambda r_id=reporte['id_reporte']: self.mark_report_reviewed(r_id)).grid(row=0, column=1, sticky="e", padx=10)
-                else:
-                    ctk.CTkLabel(report_frame, text=f"Estado: {estado}", font=ctk.CTkFont(weight="bold")).grid(row=0, column=1, sticky="e", padx=10)
+            reports_frame = ctk.CTkFrame(self.content_frame, fg_color="transparent"); reports_frame.pack(fill="x")
+            self.load_reports_page(reports_frame, estado)
+
+    def load_reports_page(self, reports_frame, estado: str = None, desplazamiento: int = 0, boton_mas=None):
+        """Muestra una página de reportes; el botón 'Cargar más' pide la siguiente."""
+        if boton_mas is not None:
+            boton_mas.destroy()
+        reportes = self.qc_service.obtener_reportes(estado=estado, limite=REPORTES_POR_PAGINA, desplazamiento=desplazamiento)
+        for reporte in reportes:
+            report_frame = ctk.CTkFrame(reports_frame); report_frame.pack(fill="x", pady=5, padx=10)
+            report_frame.grid_columnconfigure(0, weight=1)
+            report_frame.grid_columnconfigure(1, weight=0)
+
+            fecha = datetime.fromisoformat(reporte['fecha']).strftime('%d/%m/%Y %H:%M')
+            profesor_email = reporte.get('email_profesor', 'Desconocido')
+            pregunta_original = reporte.get('pregunta_original_data', {}).get('pregunta', 'N/A')
+            respuesta_ia = reporte.get('pregunta_original_data', {}).get('respuesta_correcta_ia', 'N/A')
+            respuesta_profesor = reporte.get('correccion_profesor', {}).get('respuesta_profesor', 'N/A')
+            justificacion = reporte.get('correccion_profesor', {}).get('justificacion', 'Sin justificación')
+            estado_reporte = reporte.get('estado', 'pendiente').capitalize()
+
+            report_text = (
+                f"ID: {reporte['id_reporte']} | Fecha: {fecha} | Profesor: {profesor_email}\n"
+                f"Estado: {estado_reporte}\n"
+                f"Pregunta (IA): {pregunta_original}\n"
+                f"Respuesta IA: {respuesta_ia}\n"
+                f"Respuesta Profesor: {respuesta_profesor}\n"
+                f"Justificación: {justificacion}"
+            )
+            ctk.CTkLabel(report_frame, text=report_text, wraplength=700, justify="left").grid(row=0, column=0, sticky="w", padx=10, pady=5)
+
+            if estado_reporte == "Pendiente":
+                ctk.CTkButton(report_frame, text="Marcar como Revisado", command=lambda r_id=reporte['id_reporte']: self.mark_report_reviewed(r_id, estado)).grid(row=0, column=1, sticky="e", padx=10)
+            else:
+                ctk.CTkLabel(report_frame, text=f"Estado: {estado_reporte}", font=ctk.CTkFont(weight="bold")).grid(row=0, column=1, sticky="e", padx=10)
 
+        siguiente = desplazamiento + len(reportes)
+        if len(reportes) == REPORTES_POR_PAGINA and siguiente < self.qc_service.contar_reportes(estado=estado):
+            boton = ctk.CTkButton(reports_frame, text="Cargar más")
+            boton.configure(command=lambda: self.load_reports_page(reports_frame, estado, siguiente, boton))
+            boton.pack(pady=5)
 
-        def mark_report_reviewed(self, reporte_id: str):
-            if messagebox.askyesno("Marcar como Revisado", f"¿Marcar reporte {reporte_id} como 'Revisado'?", parent=self.master):
-                success = self.qc_service.actualizar_estado_reporte(reporte_id, "revisado")
-                if success:
-                    messagebox.showinfo("Éxito", f"Reporte {reporte_id} marcado como 'Revisado'.", parent=self.master)
-                else:
-                    messagebox.showerror("Error", f"No se pudo actualizar el reporte {reporte_id}.", parent=self.master)
-                self.show_ai_reports_view()
+    def mark_report_reviewed(self, reporte_id: str, estado_filtro: str = None):
+        if messagebox.askyesno("Marcar como Revisado", f"¿Marcar reporte {reporte_id} como 'Revisado'?", parent=self.master):
+            success = self.qc_service.actualizar_estado_reporte(reporte_id, "revisado")
+            if success:
+                messagebox.showinfo("Éxito", f"Reporte {reporte_id} marcado como 'Revisado'.", parent=self.master)
+            else:
+                messagebox.showerror("Error", f"No se pudo actualizar el reporte {reporte_id}.", parent=self.master)
+            self.show_ai_reports_view(estado_filtro)
 
 
     def show_teacher_courses_view(self):
@@ -390,7 +422,7 @@ class TeacherDashboardView(ctk.CTkFrame):
                 ctk.CTkLabel(curso_frame, text=course.tema_general, font=ctk.CTkFont(size=16, weight="bold")).pack(side="left", padx=10)
                 ctk.CTkButton(curso_frame, text="Editar Título", command=lambda c=course: self.edit_course_title(c)).pack(side="right", padx=10)
                 ctk.CTkButton(curso_frame, text="Ver Contenido", command=lambda c=course: self.view_course_content(c)).pack(side="right", padx=10)
-                miembros_str = ", ".join([f"{m['email']} ({m['rol']})" for m in course.miembros])
+                miembros_str = ", ".join([f"{m.email} ({m.rol})" for m in course.miembros])
                 ctk.CTkLabel(curso_frame, text=f"Miembros: {miembros_str}").pack(side="left", padx=10)
 
     def view_course_content(self, course):
@@ -407,13 +439,13 @@ class TeacherDashboardView(ctk.CTkFrame):
         miembros_frame.pack(fill="x", padx=10, pady=5)
         ctk.CTkLabel(miembros_frame, text="Miembros del Curso:", font=ctk.CTkFont(size=14, weight="bold")).pack(anchor="w", padx=5)
         for miembro in course.miembros:
-            if miembro['rol'] == 'profesor':
-                ctk.CTkLabel(miembros_frame, text=f"👨‍🏫 {miembro['email']} (profesor)", text_color="blue").pack(anchor="w", padx=15)
+            if miembro.rol == 'profesor':
+                ctk.CTkLabel(miembros_frame, text=f"👨‍🏫 {miembro.email} (profesor)", text_color="blue").pack(anchor="w", padx=15)
             else:
                 alumno_row = ctk.CTkFrame(miembros_frame, fg_color="transparent")
                 alumno_row.pack(fill="x", padx=10, pady=2)
-                ctk.CTkLabel(alumno_row, text=f"👤 {miembro['email']} (alumno)").pack(side="left")
-                ctk.CTkButton(alumno_row, text="Quitar", fg_color="red", width=60, command=lambda e=miembro['email'], c=course: self.remove_student_from_course(c, e)).pack(side="right", padx=5)
+                ctk.CTkLabel(alumno_row, text=f"👤 {miembro.email} (alumno)").pack(side="left")
+                ctk.CTkButton(alumno_row, text="Quitar", fg_color="red", width=60, command=lambda e=miembro.email, c=course: self.remove_student_from_course(c, e)).pack(side="right", padx=5)
 
         # --- Agregar alumno al curso ---
         add_frame = ctk.CTkFrame(self.content_frame, fg_color="transparent")
@@ -428,14 +460,14 @@ class TeacherDashboardView(ctk.CTkFrame):
         for modulo in course.modulos:
             modulo_frame = ctk.CTkFrame(self.content_frame)
             modulo_frame.pack(fill="x", padx=20, pady=5)
-            ctk.CTkLabel(modulo_frame, text=modulo.get('titulo', 'Módulo'), font=ctk.CTkFont(size=14)).pack(anchor="w", padx=10)
+            ctk.CTkLabel(modulo_frame, text=modulo.titulo or 'Módulo', font=ctk.CTkFont(size=14)).pack(anchor="w", padx=10)
             ctk.CTkButton(modulo_frame, text="Editar Título", width=80, command=lambda m=modulo, c=course: self.edit_module_title(c, m)).pack(anchor="e", padx=5)
-            for subtema in modulo.get('subtemas', []):
+            for subtema in modulo.subtemas:
                 subtema_frame = ctk.CTkFrame(modulo_frame, fg_color="transparent")
                 subtema_frame.pack(fill="x", padx=10, pady=2)
                 ctk.CTkLabel(subtema_frame, text=f"• {subtema}", wraplength=500, justify="left").pack(side="left", padx=5)
                 ctk.CTkButton(subtema_frame, text="Editar Teoría", width=100, command=lambda s=subtema, m=modulo, c=course: self.edit_subtema_theory(c, m, s)).pack(side="right", padx=5)
-                teoria_actual = modulo.get('teoria_generada', {}).get(subtema)
+                teoria_actual = modulo.teoria_generada.get(subtema)
                 if teoria_actual:
                     ctk.CTkLabel(subtema_frame, text="(Teoría personalizada)", text_color="green").pack(side="left", padx=5)
                 else:
@@ -447,51 +479,49 @@ class TeacherDashboardView(ctk.CTkFrame):
             messagebox.showerror("Error", "Debes ingresar un correo.", parent=self.master)
             return
         # Verifica si ya es miembro
-        if any(m['email'] == email for m in course.miembros):
+        if course.es_miembro(email):
             messagebox.showinfo("Ya es miembro", f"{email} ya es miembro de este curso.", parent=self.master)
             return
         # Verifica que el usuario exista y sea alumno
-        from data import gestion_usuarios as user_dao
-        usuarios = user_dao.cargar_usuarios()
-        if email not in usuarios or usuarios[email].get('rol') != 'alumno':
+        alumno_data = self.user_dao.cargar_usuario(email)
+        if alumno_data is None or alumno_data.get('rol') != 'alumno':
             messagebox.showerror("Error", "No se encontró un alumno con ese correo.", parent=self.master)
             return
-        # Agrega al curso y al usuario
-        from models.user_model import User
-        alumno = User.from_dict(email, usuarios[email])
-        from models.course_model import Course
         # Actualiza el curso (agrega miembro)
-        course.miembros.append({'email': email, 'rol': 'alumno'})
-        # Actualiza el usuario (agrega curso)
-        if not any(c['id_curso'] == course.id_curso for c in alumno.cursos):
-            alumno.cursos.append(course.to_dict())
+        course.agregar_miembro(email, 'alumno')
+        curso_dict = course.to_dict()
+        # Actualiza el usuario (agrega curso) sobre su registro actual, sin pisar otros cambios en 'cursos'
+        def _agregar_curso(datos):
+            cursos = datos.setdefault('cursos', [])
+            if not any(c['id_curso'] == course.id_curso for c in cursos):
+                cursos.append(curso_dict)
         # Persistencia
-        from data import gestion_cursos as course_dao
-        course_dao.actualizar_curso(course.to_dict())
-        user_dao.actualizar_datos_usuario(email, alumno.to_dict())
+        self.course_dao.agregar_miembro(course.id_curso, email, 'alumno')
+        self.user_dao.modificar_usuario(email, _agregar_curso)
         messagebox.showinfo("Éxito", f"{email} ha sido agregado al curso.", parent=self.master)
         self.view_course_content(course)
 
     def remove_student_from_course(self, course, email):
         # Quita al alumno del curso y el curso del alumno
-        course.miembros = [m for m in course.miembros if m['email'] != email]
-        from data import gestion_usuarios as user_dao
-        usuarios = user_dao.cargar_usuarios()
-        if email in usuarios:
-            alumno = User.from_dict(email, usuarios[email])
-            alumno.cursos = [c for c in alumno.cursos if c['id_curso'] != course.id_curso]
-            user_dao.actualizar_datos_usuario(email, alumno.to_dict())
-        from data import gestion_cursos as course_dao
-        course_dao.actualizar_curso(course.to_dict())
+        course.quitar_miembro(email)
+        def _quitar_curso(datos):
+            datos['cursos'] = [c for c in datos.get('cursos', []) if c['id_curso'] != course.id_curso]
+        self.user_dao.modificar_usuario(email, _quitar_curso)
+        self.course_dao.quitar_miembro(course.id_curso, email)
         messagebox.showinfo("Eliminado", f"{email} ha sido eliminado del curso.", parent=self.master)
         self.view_course_content(course)
 
     def edit_module_title(self, course, modulo):
-        new_title = simpledialog.askstring("Editar Módulo", "Nuevo título del módulo:", initialvalue=modulo.get('titulo', ''), parent=self.master)
+        new_title = simpledialog.askstring("Editar Módulo", "Nuevo título del módulo:", initialvalue=modulo.titulo or '', parent=self.master)
         if new_title and new_title.strip():
-            modulo['titulo'] = new_title.strip()
-            from data import gestion_cursos as course_dao
-            course_dao.actualizar_curso(course.to_dict())
+            def _cambiar_titulo(curso):
+                modulo_actual = curso.encontrar_modulo(modulo.id_modulo)
+                if modulo_actual is not None:
+                    modulo_actual.titulo = new_title.strip()
+            course = self._modificar_curso(course, _cambiar_titulo)
+            if course is None:
+                messagebox.showerror("Error", "El curso ya no existe.", parent=self.master)
+                return
             messagebox.showinfo("Éxito", "Título del módulo actualizado.", parent=self.master)
             self.view_course_content(course)
 
@@ -506,7 +536,7 @@ class TeacherDashboardView(ctk.CTkFrame):
         textbox = ctk.CTkTextbox(edit_win, wrap="word")
         textbox.pack(fill="both", expand=True, padx=10, pady=10)
 
-        teoria_actual = modulo.get('teoria_generada', {}).get(subtema, "")
+        teoria_actual = modulo.teoria_generada.get(subtema, "")
         textbox.insert("1.0", teoria_actual)
 
         def generar_con_ia():
@@ -520,14 +550,17 @@ class TeacherDashboardView(ctk.CTkFrame):
             if not nueva_teoria:
                 messagebox.showerror("Error", "La teoría no puede estar vacía.", parent=edit_win)
                 return
-            if 'teoria_generada' not in modulo:
-                modulo['teoria_generada'] = {}
-            modulo['teoria_generada'][subtema] = nueva_teoria
-            from data import gestion_cursos as course_dao
-            course_dao.actualizar_curso(course.to_dict())
+            def _cambiar_teoria(curso):
+                modulo_actual = curso.encontrar_modulo(modulo.id_modulo)
+                if modulo_actual is not None:
+                    modulo_actual.teoria_generada[subtema] = nueva_teoria
+            actualizado = self._modificar_curso(course, _cambiar_teoria)
+            if actualizado is None:
+                messagebox.showerror("Error", "El curso ya no existe.", parent=edit_win)
+                return
             messagebox.showinfo("Éxito", "Teoría actualizada correctamente. Todos los alumnos verán esta versión.", parent=edit_win)
             edit_win.destroy()
-            self.view_course_content(course)
+            self.view_course_content(actualizado)
 
         ctk.CTkButton(edit_win, text="Generar con IA", command=generar_con_ia).pack(pady=5)
         ctk.CTkButton(edit_win, text="Guardar Teoría", command=guardar_teoria).pack(pady=10)
@@ -552,8 +585,22 @@ class TeacherDashboardView(ctk.CTkFrame):
     def edit_course_title(self, course):
         new_title = simpledialog.askstring("Editar Curso", "Nuevo título del curso:", initialvalue=course.tema_general, parent=self.master)
         if new_title and new_title.strip():
-            course.tema_general = new_title.strip()
-            from data import gestion_cursos as course_dao
-            course_dao.actualizar_curso(course.to_dict())
+            def _cambiar_tema(curso):
+                curso.tema_general = new_title.strip()
+            if self._modificar_curso(course, _cambiar_tema) is None:
+                messagebox.showerror("Error", "El curso ya no existe.", parent=self.master)
+                return
             messagebox.showinfo("Éxito", "Título del curso actualizado.", parent=self.master)
-            self.show_teacher_courses_view()
\ No newline at end of file
+            self.show_teacher_courses_view()
+
+    def _modificar_curso(self, course, funcion):
+        """
+        Aplica funcion(curso) al curso guardado, no a la copia que la vista cargó al abrirse (que no tiene
+        los miembros ni la teoría añadidos después). Retorna el curso actualizado, o None si ya no existe.
+        """
+        def _aplicar(curso_dict):
+            curso = Course.from_dict(curso_dict)
+            funcion(curso)
+            return curso.to_dict()
+        actualizado = self.course_dao.modificar_curso(course.id_curso, _aplicar)
+        return Course.from_dict(actualizado) if actualizado is not None else None
\ No newline at end of file